@@ -1,8 +1,13 @@
 import asyncio
+import collections
+import concurrent.futures
 import functools
+import mmap
 import os
+import struct
 import typing
 import zipfile
+import zlib
 from abc import ABC
 import aiofiles
 
@@ -14,11 +19,196 @@ class IClassAccessor(ABC):
     async def try_access_resource(self, path: str) -> typing.Optional[bytes]:
         pass
 
+    async def try_access_many(self, paths: typing.Iterable[str]) -> typing.Dict[str, bytes]:
+        """
+        Batch variant of try_access_resource(), returning the data of all paths found
+        Sources able to read a lot of entries in one go should override this
+        """
+
+        result = {}
+        for path in paths:
+            data = await self.try_access_resource(path)
+            if data is not None:
+                result[path] = data
+        return result
+
+    async def prefetch(self, cls_names: typing.Iterable[str]) -> typing.Dict[str, bytes]:
+        """
+        Batch variant of try_access_class_file(), returning the data of all classes found by class name
+        """
+
+        paths = {cls_name.replace(".", "/") + ".class": cls_name for cls_name in cls_names}
+        return {paths[path]: data for path, data in (await self.try_access_many(paths.keys())).items()}
+
+    def list_resources(self) -> typing.Optional[typing.Iterable[str]]:
+        """
+        Lists all resource paths this accessor can provide, for building an index (see IndexedAccessorDict)
+        Returns None when the accessor cannot list its content
+        """
+
+
+_io_pool: typing.Optional[concurrent.futures.ThreadPoolExecutor] = None
+
+
+def get_io_pool() -> concurrent.futures.ThreadPoolExecutor:
+    """
+    Thread pool shared by the directory sources for reading a lot of files at once
+    """
+
+    global _io_pool
+
+    if _io_pool is None:
+        _io_pool = concurrent.futures.ThreadPoolExecutor(thread_name_prefix="jvm-io")
+
+    return _io_pool
+
+
+def read_file(path: str) -> typing.Optional[bytes]:
+    try:
+        with open(path, mode="rb") as f:
+            return f.read()
+    except OSError:
+        pass
+
+
+async def read_files_threaded(files: typing.Dict[str, str]) -> typing.Dict[str, bytes]:
+    """
+    Reads the files (key -> file path) in the io thread pool
+    :return: key -> data for all files which could be read
+    """
+
+    loop = asyncio.get_running_loop()
+    keys = list(files.keys())
+
+    data = await asyncio.gather(*[
+        loop.run_in_executor(get_io_pool(), read_file, files[key]) for key in keys
+    ])
+
+    return {key: d for key, d in zip(keys, data) if d is not None}
+
+
+def read_archive_entries(data_file: zipfile.ZipFile, paths: typing.Iterable[str]) -> typing.Dict[str, bytes]:
+    """
+    Reads the given entries in order of their position in the archive, skipping missing ones
+    """
+
+    infos = []
+    for path in paths:
+        try:
+            infos.append(data_file.getinfo(path))
+        except KeyError:
+            pass
+
+    infos.sort(key=lambda info: info.header_offset)
+    return {info.filename: data_file.read(info) for info in infos}
+
+
+class LRUDataCache:
+    """
+    Resource data cache with a size budget in bytes, evicting the least recently used entries first
+
+    One instance can be shared by multiple caching accessors; they use (accessor, path) as keys,
+    so their entries don't collide
+    """
+
+    def __init__(self, max_size: int = 64 * 1024 * 1024):
+        self.max_size = max_size
+        self.size = 0
+        self.entries: typing.OrderedDict[typing.Hashable, bytes] = collections.OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, key: typing.Hashable):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key: typing.Hashable) -> typing.Optional[bytes]:
+        data = self.entries.get(key)
+
+        if data is None:
+            self.misses += 1
+            return
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return data
+
+    def put(self, key: typing.Hashable, data: bytes):
+        size = len(data)
+
+        if key in self.entries:
+            self.size -= len(self.entries.pop(key))
+
+        # Entries bigger than the whole budget would evict everything else, so they are not stored at all
+        if size > self.max_size:
+            return
+
+        self.entries[key] = data
+        self.size += size
+
+        while self.size > self.max_size:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+            self.evictions += 1
+
+    def remove(self, key: typing.Hashable):
+        if key in self.entries:
+            self.size -= len(self.entries.pop(key))
+
+    def clear(self, owner: typing.Any = None):
+        """
+        Clears all entries, or only the ones of the given owner (the first element of the key)
+        """
+
+        if owner is None:
+            self.entries.clear()
+            self.size = 0
+            return
+
+        for key in [key for key in self.entries.keys() if isinstance(key, tuple) and key[0] is owner]:
+            self.remove(key)
+
+    def get_stats(self) -> typing.Dict[str, int]:
+        return {
+            "entries": len(self.entries),
+            "size": self.size,
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def __repr__(self):
+        return f"LRUDataCache(size={self.size},max_size={self.max_size},hits={self.hits},misses={self.misses},evictions={self.evictions})"
+
+
+# The cache used by the caching accessors when not given another one
+DEFAULT_DATA_CACHE = LRUDataCache()
+
+
+def list_directory(directory: str) -> typing.List[str]:
+    """
+    Lists all files in the directory, as '/' separated paths relative to it
+    """
+
+    return [
+        os.path.relpath(os.path.join(root, file), directory).replace(os.sep, "/")
+        for root, _, files in os.walk(directory)
+        for file in files
+    ]
+
 
 class AccessorDict(IClassAccessor):
     def __init__(self):
         self.items: typing.List[IClassAccessor] = []
 
+        # Count of class lookups not found in any accessor
+        self.misses = 0
+
     def add_accessor(self, accessor: IClassAccessor):
         self.items.append(accessor)
         return self
@@ -29,7 +219,7 @@ class AccessorDict(IClassAccessor):
             if data is not None:
                 return data
 
-        print(cls_name)
+        self.misses += 1
 
     async def try_access_resource(self, path: str) -> typing.Optional[bytes]:
         for item in self.items:
@@ -37,6 +227,230 @@ class AccessorDict(IClassAccessor):
             if data is not None:
                 return data
 
+    async def try_access_many(self, paths: typing.Iterable[str]) -> typing.Dict[str, bytes]:
+        result = {}
+        pending = set(paths)
+
+        for item in self.items:
+            if not pending:
+                break
+
+            found = await item.try_access_many(pending)
+            result.update(found)
+            pending.difference_update(found.keys())
+
+        return result
+
+    async def prefetch(self, cls_names: typing.Iterable[str]) -> typing.Dict[str, bytes]:
+        result = {}
+        pending = set(cls_names)
+
+        for item in self.items:
+            if not pending:
+                break
+
+            found = await item.prefetch(pending)
+            result.update(found)
+            pending.difference_update(found.keys())
+
+        return result
+
+
+class IndexedAccessorDict(IClassAccessor):
+    """
+    Accessor dict keeping one index of path -> accessor over all accessors able to list their content
+    (see IClassAccessor.list_resources()), so lookups don't need to probe every accessor
+
+    Accessors not able to list their content are probed in order for paths not in the index.
+    Paths not found in any indexed accessor are remembered, so repeated misses are answered without any probing;
+    misses involving unindexed accessors are never remembered, as their content may change at any time.
+
+    The lookup order is the same as for AccessorDict.
+    Use invalidate() when the content of an accessor changed.
+    """
+
+    def __init__(self):
+        self.items: typing.List[IClassAccessor] = []
+
+        # path -> position of the first indexed accessor providing it
+        self.index: typing.Dict[str, int] = {}
+
+        # position -> the paths listed by the accessor at this position
+        self.listed: typing.Dict[int, typing.Set[str]] = {}
+
+        # positions of the accessors which could not be indexed
+        self.unindexed: typing.List[int] = []
+
+        self.negative_cache: typing.Set[str] = set()
+
+        self.hits = 0
+        self.misses = 0
+
+    def add_accessor(self, accessor: IClassAccessor):
+        position = len(self.items)
+        self.items.append(accessor)
+
+        resources = accessor.list_resources()
+
+        if resources is None:
+            self.unindexed.append(position)
+
+            # The accessor may provide anything
+            self.negative_cache.clear()
+        else:
+            resources = self.listed[position] = set(resources)
+
+            for path in resources:
+                self.index.setdefault(path, position)
+
+            self.negative_cache.difference_update(resources)
+
+        return self
+
+    def invalidate(self, accessor: IClassAccessor = None):
+        """
+        Re-reads the content list of the given accessor (or all accessors) and forgets about the cached misses
+        """
+
+        self.negative_cache.clear()
+
+        if accessor is None:
+            self.index.clear()
+
+            for position in list(self.listed.keys()):
+                self.update_listing(position)
+
+            return
+
+        position = self.items.index(accessor)
+        if position in self.listed:
+            self.update_listing(position)
+
+    def update_listing(self, position: int):
+        previous = self.listed.get(position, set())
+        resources = self.listed[position] = set(self.items[position].list_resources() or ())
+
+        for path in previous - resources:
+            if self.index.get(path) != position:
+                continue
+
+            del self.index[path]
+
+            # Some later accessor may provide the path as well
+            for other in sorted(self.listed.keys()):
+                if other > position and path in self.listed[other]:
+                    self.index[path] = other
+                    break
+
+        for path in resources:
+            if self.index.get(path, position) >= position:
+                self.index[path] = position
+
+    def get_candidates(self, path: str) -> typing.Sequence[int]:
+        """
+        Returns the positions of the accessors which may provide the path, in lookup order
+        """
+
+        position = self.index.get(path)
+
+        if position is None:
+            return self.unindexed
+
+        if not self.unindexed or self.unindexed[0] > position:
+            return position,
+
+        return [other for other in self.unindexed if other < position] + [position]
+
+    def may_cache_miss(self, candidates: typing.Sequence[int]) -> bool:
+        """
+        Checks if a miss on the given candidates can be remembered, which is only the case
+        when all of them are indexed accessors
+        """
+
+        return not self.unindexed or all(position in self.listed for position in candidates)
+
+    async def access_indexed(self, path: str, getter: typing.Callable[[IClassAccessor], typing.Awaitable]):
+        if path not in self.negative_cache:
+            candidates = self.get_candidates(path)
+
+            for position in candidates:
+                data = await getter(self.items[position])
+
+                if data is not None:
+                    self.hits += 1
+                    return data
+
+            if self.may_cache_miss(candidates):
+                self.negative_cache.add(path)
+
+        self.misses += 1
+
+    async def access_many_indexed(
+        self,
+        keys: typing.Dict[str, str],
+        getter: typing.Callable[[IClassAccessor, typing.List[str]], typing.Awaitable[typing.Dict[str, bytes]]],
+    ) -> typing.Dict[str, bytes]:
+        """
+        Batch variant of access_indexed()
+        :param keys: key -> path
+        :param getter: the function looking up a list of keys on an accessor
+        """
+
+        by_position: typing.Dict[int, typing.List[str]] = {}
+        cacheable_misses: typing.Set[str] = set()
+
+        for key, path in keys.items():
+            if path in self.negative_cache:
+                continue
+
+            candidates = self.get_candidates(path)
+
+            for position in candidates:
+                by_position.setdefault(position, []).append(key)
+
+            if self.may_cache_miss(candidates):
+                cacheable_misses.add(key)
+
+        result = {}
+
+        for position in sorted(by_position.keys()):
+            batch = [key for key in by_position[position] if key not in result]
+
+            if batch:
+                result.update(await getter(self.items[position], batch))
+
+        for key in cacheable_misses:
+            if key not in result:
+                self.negative_cache.add(keys[key])
+
+        self.hits += len(result)
+        self.misses += len(keys) - len(result)
+
+        return result
+
+    async def try_access_class_file(self, cls_name: str) -> typing.Optional[bytes]:
+        return await self.access_indexed(
+            cls_name.replace(".", "/") + ".class", lambda item: item.try_access_class_file(cls_name)
+        )
+
+    async def try_access_resource(self, path: str) -> typing.Optional[bytes]:
+        return await self.access_indexed(path, lambda item: item.try_access_resource(path))
+
+    async def try_access_many(self, paths: typing.Iterable[str]) -> typing.Dict[str, bytes]:
+        return await self.access_many_indexed({path: path for path in paths}, lambda item, batch: item.try_access_many(batch))
+
+    async def prefetch(self, cls_names: typing.Iterable[str]) -> typing.Dict[str, bytes]:
+        return await self.access_many_indexed(
+            {cls_name: cls_name.replace(".", "/") + ".class" for cls_name in cls_names},
+            lambda item, batch: item.prefetch(batch),
+        )
+
+    def list_resources(self) -> typing.Optional[typing.Iterable[str]]:
+        if self.unindexed:
+            return
+
+        return self.index.keys()
+
 
 class LookupCachedAccessorDict(IClassAccessor):
     def __init__(self):
@@ -58,32 +472,84 @@ class LookupCachedAccessorDict(IClassAccessor):
 
                 return data
 
+    async def try_access_many(self, paths: typing.Iterable[str]) -> typing.Dict[str, bytes]:
+        result = {}
+        pending = set()
+        cached: typing.Dict[IClassAccessor, typing.List[str]] = {}
+
+        for path in paths:
+            if path in self.lookup_cache:
+                cached.setdefault(self.lookup_cache[path], []).append(path)
+            else:
+                pending.add(path)
+
+        for item, item_paths in cached.items():
+            result.update(await item.try_access_many(item_paths))
+
+        for item in self.items:
+            if not pending:
+                break
+
+            found = await item.try_access_many(pending)
+            for path in found.keys():
+                self.lookup_cache[path] = item
+
+            result.update(found)
+            pending.difference_update(found.keys())
+
+        return result
+
     def clear_lookup_cache(self):
         self.lookup_cache.clear()
 
 
 class DataCachedAccessorDict(IClassAccessor):
-    def __init__(self):
+    def __init__(self, cache: LRUDataCache = None):
         self.items: typing.List[IClassAccessor] = []
-        self.lookup_cache: typing.Dict[str, bytes] = {}
+        self.lookup_cache = cache if cache is not None else DEFAULT_DATA_CACHE
 
     def add_accessor(self, accessor: IClassAccessor):
         self.items.append(accessor)
         return self
 
     async def try_access_resource(self, path: str) -> typing.Optional[bytes]:
-        if path in self.lookup_cache:
-            return self.lookup_cache[path]
+        data = self.lookup_cache.get((self, path))
+        if data is not None:
+            return data
 
         for item in self.items:
             data = await item.try_access_resource(path)
             if data is not None:
-                self.lookup_cache[path] = data
+                self.lookup_cache.put((self, path), data)
 
                 return data
 
+    async def try_access_many(self, paths: typing.Iterable[str]) -> typing.Dict[str, bytes]:
+        result = {}
+        pending = set()
+
+        for path in paths:
+            data = self.lookup_cache.get((self, path))
+            if data is not None:
+                result[path] = data
+            else:
+                pending.add(path)
+
+        for item in self.items:
+            if not pending:
+                break
+
+            found = await item.try_access_many(pending)
+            for path, data in found.items():
+                self.lookup_cache.put((self, path), data)
+
+            result.update(found)
+            pending.difference_update(found.keys())
+
+        return result
+
     def clear_data_cache(self):
-        self.lookup_cache.clear()
+        self.lookup_cache.clear(self)
 
 
 class MemoryFileSource(IClassAccessor):
@@ -106,6 +572,12 @@ class MemoryFileSource(IClassAccessor):
     async def try_access_resource(self, path: str) -> typing.Optional[bytes]:
         return self.files[path] if path in self.files else None
 
+    async def try_access_many(self, paths: typing.Iterable[str]) -> typing.Dict[str, bytes]:
+        return {path: self.files[path] for path in paths if path in self.files}
+
+    def list_resources(self) -> typing.Optional[typing.Iterable[str]]:
+        return self.files.keys()
+
 
 class SingleClassFileSource(IClassAccessor):
     def __init__(self, name: str, file: str | bytes):
@@ -125,6 +597,12 @@ class SingleClassFileSource(IClassAccessor):
         if path == self.name.replace(".", "/"):
             return self.data
 
+    async def prefetch(self, cls_names: typing.Iterable[str]) -> typing.Dict[str, bytes]:
+        return {self.name: self.data} if self.name in cls_names else {}
+
+    def list_resources(self) -> typing.Optional[typing.Iterable[str]]:
+        return self.name.replace(".", "/") + ".class",
+
 
 class DirectoryFileSource(IClassAccessor):
     def __init__(self, directory: str):
@@ -136,6 +614,12 @@ class DirectoryFileSource(IClassAccessor):
             async with aiofiles.open(path, mode="rb") as f:
                 return await f.read()
 
+    async def try_access_many(self, paths: typing.Iterable[str]) -> typing.Dict[str, bytes]:
+        return await read_files_threaded({path: os.path.join(self.directory, path) for path in paths})
+
+    def list_resources(self) -> typing.Optional[typing.Iterable[str]]:
+        return list_directory(self.directory)
+
 
 class CachedFilelistDirectorySource(IClassAccessor):
     """
@@ -156,16 +640,26 @@ class CachedFilelistDirectorySource(IClassAccessor):
             async with aiofiles.open(path, mode="rb") as f:
                 return await f.read()
 
+    async def try_access_many(self, paths: typing.Iterable[str]) -> typing.Dict[str, bytes]:
+        files = {path: os.path.join(self.directory, path) for path in paths}
+        return await read_files_threaded({path: file for path, file in files.items() if file in self.cache})
+
     def do_lookup(self):
         self.cache.clear()
         for root, _, files in os.walk(self.directory):
             self.cache |= {os.path.join(root, file) for file in files}
 
+    def list_resources(self) -> typing.Optional[typing.Iterable[str]]:
+        return [
+            os.path.relpath(file, self.directory).replace(os.sep, "/") for file in self.cache
+        ]
+
 
 class CachedDataDirectorySource(IClassAccessor):
     """
     Should be even faster than CachedFilelistDirectorySource, but stores the data in memory,
     so it consumes more of it.
+    The data is stored in a LRUDataCache, by default the shared DEFAULT_DATA_CACHE
 
     Use clean() to clear the internal cache
 
@@ -173,9 +667,9 @@ class CachedDataDirectorySource(IClassAccessor):
     WARNING: access times will go up if you do this!
     """
 
-    def __init__(self, directory: str):
+    def __init__(self, directory: str, cache: LRUDataCache = None):
         self.directory = directory
-        self.data_cache = {}
+        self.data_cache = cache if cache is not None else DEFAULT_DATA_CACHE
 
     async def try_access_class_file(self, cls_name: str, write_to_cache=True, read_from_cache=None) -> typing.Optional[bytes]:
         return await self.try_access_resource(cls_name.replace(".", "/") + ".class", write_to_cache, read_from_cache)
@@ -184,21 +678,45 @@ class CachedDataDirectorySource(IClassAccessor):
         if read_from_cache is None:
             read_from_cache = write_to_cache
 
-        if path in self.data_cache and read_from_cache:
-            return self.data_cache[path]
+        if read_from_cache:
+            data = self.data_cache.get((self, path))
+            if data is not None:
+                return data
 
-        path = os.path.join(self.directory, path)
-        if os.path.exists(path):
-            async with aiofiles.open(path, mode="rb") as f:
+        file = os.path.join(self.directory, path)
+        if os.path.exists(file):
+            async with aiofiles.open(file, mode="rb") as f:
                 data = await f.read()
 
                 if write_to_cache:
-                    self.data_cache[path] = data
+                    self.data_cache.put((self, path), data)
 
                 return data
 
+    async def try_access_many(self, paths: typing.Iterable[str]) -> typing.Dict[str, bytes]:
+        result = {}
+        pending = {}
+
+        for path in paths:
+            data = self.data_cache.get((self, path))
+            if data is not None:
+                result[path] = data
+            else:
+                pending[path] = os.path.join(self.directory, path)
+
+        found = await read_files_threaded(pending)
+        for path, data in found.items():
+            self.data_cache.put((self, path), data)
+
+        result.update(found)
+
+        return result
+
+    def list_resources(self) -> typing.Optional[typing.Iterable[str]]:
+        return list_directory(self.directory)
+
     def clean(self):
-        self.data_cache.clear()
+        self.data_cache.clear(self)
 
 
 class ArchiveFileSource(IClassAccessor):
@@ -217,6 +735,13 @@ class ArchiveFileSource(IClassAccessor):
         finally:
             self.access_lock.release()
 
+    async def try_access_many(self, paths: typing.Iterable[str]) -> typing.Dict[str, bytes]:
+        async with self.access_lock:
+            return await asyncio.to_thread(read_archive_entries, self.data_file, list(paths))
+
+    def list_resources(self) -> typing.Optional[typing.Iterable[str]]:
+        return [name for name in self.data_file.namelist() if not name.endswith("/")]
+
 
 class CachedNamelistArchiveSource(IClassAccessor):
     def __init__(self, file: str):
@@ -235,12 +760,21 @@ class CachedNamelistArchiveSource(IClassAccessor):
 
         return data
 
+    async def try_access_many(self, paths: typing.Iterable[str]) -> typing.Dict[str, bytes]:
+        paths = [path for path in paths if path in self.namelist]
+
+        async with self.access_lock:
+            return await asyncio.to_thread(read_archive_entries, self.data_file, paths)
+
+    def list_resources(self) -> typing.Optional[typing.Iterable[str]]:
+        return [name for name in self.namelist if not name.endswith("/")]
+
 
 class CachedDataArchiveSource(IClassAccessor):
-    def __init__(self, file: str):
+    def __init__(self, file: str, cache: LRUDataCache = None):
         self.file = file
         self.data_file = zipfile.ZipFile(file)
-        self.cache = {}
+        self.cache = cache if cache is not None else DEFAULT_DATA_CACHE
 
         self.access_lock = asyncio.Lock()
 
@@ -251,23 +785,244 @@ class CachedDataArchiveSource(IClassAccessor):
         if read_from_cache is None:
             read_from_cache = write_to_cache
 
-        if path in self.cache and read_from_cache:
-            return self.cache[path]
+        if read_from_cache:
+            data = self.cache.get((self, path))
+            if data is not None:
+                return data
 
         await self.access_lock.acquire()
         data = self.data_file.read(path)
         self.access_lock.release()
 
         if write_to_cache:
-            self.cache[path] = data
+            self.cache.put((self, path), data)
 
         return data
 
+    async def try_access_many(self, paths: typing.Iterable[str]) -> typing.Dict[str, bytes]:
+        result = {}
+        pending = []
+
+        for path in paths:
+            data = self.cache.get((self, path))
+            if data is not None:
+                result[path] = data
+            else:
+                pending.append(path)
+
+        async with self.access_lock:
+            found = await asyncio.to_thread(read_archive_entries, self.data_file, pending)
+
+        for path, data in found.items():
+            self.cache.put((self, path), data)
+
+        result.update(found)
+
+        return result
+
+    def list_resources(self) -> typing.Optional[typing.Iterable[str]]:
+        return [name for name in self.data_file.namelist() if not name.endswith("/")]
+
+    def clean(self):
+        self.cache.clear(self)
+
+
+class MemoryMappedArchiveSource(IClassAccessor):
+    """
+    Archive source mapping the whole archive into memory
+
+    The central directory is parsed once into a dict, so lookups are O(1).
+    Stored (uncompressed) entries are returned as memoryview slices into the mapping without copying,
+    deflated entries are inflated without any lock (big ones in a worker thread),
+    so concurrent class loads don't serialize on this source.
+
+    Entries using other compression methods or encryption are read via zipfile
+    """
+
+    END_OF_CENTRAL_DIRECTORY = struct.Struct("<4s4H2LH")
+    ZIP64_END_OF_CENTRAL_DIRECTORY_LOCATOR = struct.Struct("<4sLQL")
+    ZIP64_END_OF_CENTRAL_DIRECTORY = struct.Struct("<4sQ2H2L4Q")
+    CENTRAL_DIRECTORY_ENTRY = struct.Struct("<4s4B4HL2L5H2L")
+    LOCAL_FILE_HEADER = struct.Struct("<4s2B4HL2L2H")
+
+    # Deflated entries bigger than this are inflated in a worker thread
+    THREADED_INFLATE_SIZE = 64 * 1024
+
+    def __init__(self, file: str):
+        self.file = file
+
+        with open(file, "rb") as f:
+            self.mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self.view = memoryview(self.mapping)
+
+        # path -> (compression method, flags, local header offset, compressed size, size)
+        self.index: typing.Dict[str, typing.Tuple[int, int, int, int, int]] = {}
+        self.zip_file: typing.Optional[zipfile.ZipFile] = None
+
+        self.read_central_directory()
+
+    def read_central_directory(self):
+        mapping = self.mapping
+
+        # The end of central directory record is followed by a comment of up to 65535 bytes
+        search_start = max(0, len(mapping) - self.END_OF_CENTRAL_DIRECTORY.size - 0xFFFF)
+        end_offset = mapping.rfind(b"PK\x05\x06", search_start)
+        if end_offset == -1:
+            raise IOError(f"file {self.file} is not an archive!")
+
+        _, _, _, _, count, size, offset, _ = self.END_OF_CENTRAL_DIRECTORY.unpack_from(mapping, end_offset)
+
+        locator_offset = end_offset - self.ZIP64_END_OF_CENTRAL_DIRECTORY_LOCATOR.size
+        if locator_offset >= 0 and mapping[locator_offset: locator_offset + 4] == b"PK\x06\x07":
+            _, _, zip64_offset, _ = self.ZIP64_END_OF_CENTRAL_DIRECTORY_LOCATOR.unpack_from(mapping, locator_offset)
+            (
+                _, _, _, _, _, _, _, count, size, offset
+            ) = self.ZIP64_END_OF_CENTRAL_DIRECTORY.unpack_from(mapping, zip64_offset)
+
+        entry_struct = self.CENTRAL_DIRECTORY_ENTRY
+        index = self.index
+
+        for _ in range(count):
+            (
+                signature, _, _, _, _, flags, method, _, _, _, compressed_size, file_size,
+                name_length, extra_length, comment_length, _, _, _, header_offset,
+            ) = entry_struct.unpack_from(mapping, offset)
+
+            if signature != b"PK\x01\x02":
+                raise IOError(f"archive {self.file} has a corrupted central directory")
+
+            name_start = offset + entry_struct.size
+            name = mapping[name_start: name_start + name_length].decode("utf-8" if flags & 0x800 else "cp437")
+
+            if 0xFFFFFFFF in (compressed_size, file_size, header_offset):
+                file_size, compressed_size, header_offset = self.read_zip64_extra(
+                    name_start + name_length, extra_length, file_size, compressed_size, header_offset
+                )
+
+            if not name.endswith("/"):
+                index[name] = method, flags, header_offset, compressed_size, file_size
+
+            offset = name_start + name_length + extra_length + comment_length
+
+    def read_zip64_extra(self, offset: int, length: int, file_size: int, compressed_size: int, header_offset: int):
+        end = offset + length
+
+        while offset + 4 <= end:
+            tag, size = struct.unpack_from("<2H", self.mapping, offset)
+            offset += 4
+
+            if tag == 0x0001:
+                # Only the fields overflowing in the central directory entry are present, in this order
+                if file_size == 0xFFFFFFFF:
+                    file_size = struct.unpack_from("<Q", self.mapping, offset)[0]
+                    offset += 8
+                if compressed_size == 0xFFFFFFFF:
+                    compressed_size = struct.unpack_from("<Q", self.mapping, offset)[0]
+                    offset += 8
+                if header_offset == 0xFFFFFFFF:
+                    header_offset = struct.unpack_from("<Q", self.mapping, offset)[0]
+                break
+
+            offset += size
+
+        return file_size, compressed_size, header_offset
+
+    def __contains__(self, path: str):
+        return path in self.index
+
+    def namelist(self) -> typing.List[str]:
+        return list(self.index.keys())
+
+    def list_resources(self) -> typing.Optional[typing.Iterable[str]]:
+        return self.index.keys()
+
+    def get_raw_entry(self, path: str) -> memoryview:
+        """
+        Returns the (possibly compressed) data of the entry, without copying
+        """
+
+        _, _, header_offset, compressed_size, _ = self.index[path]
+
+        # The local header may have different extra data than the central directory entry
+        (
+            signature, _, _, _, _, _, _, _, _, _, name_length, extra_length
+        ) = self.LOCAL_FILE_HEADER.unpack_from(self.mapping, header_offset)
+
+        if signature != b"PK\x03\x04":
+            raise IOError(f"archive {self.file} has a corrupted local header for {path}")
+
+        start = header_offset + self.LOCAL_FILE_HEADER.size + name_length + extra_length
+        return self.view[start: start + compressed_size]
+
+    async def try_access_resource(self, path: str) -> typing.Optional[typing.Union[bytes, memoryview]]:
+        if path not in self.index:
+            return
+
+        method, flags, _, _, size = self.index[path]
+
+        # Encrypted entries
+        if flags & 0x1:
+            return await asyncio.to_thread(self.get_zip_file().read, path)
+
+        if method == zipfile.ZIP_STORED:
+            return self.get_raw_entry(path)
+
+        if method == zipfile.ZIP_DEFLATED:
+            if size > self.THREADED_INFLATE_SIZE:
+                return await asyncio.to_thread(self.inflate, path)
+            return self.inflate(path)
+
+        return await asyncio.to_thread(self.get_zip_file().read, path)
+
+    async def try_access_many(self, paths: typing.Iterable[str]) -> typing.Dict[str, typing.Union[bytes, memoryview]]:
+        # Read in central directory order, so the mapping is walked front to back
+        paths = sorted((path for path in set(paths) if path in self.index), key=lambda path: self.index[path][2])
+
+        result = {}
+        pending = []
+
+        for path in paths:
+            method, flags, _, _, _ = self.index[path]
+
+            if method == zipfile.ZIP_STORED and not flags & 0x1:
+                result[path] = self.get_raw_entry(path)
+            else:
+                pending.append(path)
+
+        # All the entries needing decompression are handled in one worker thread
+        if pending:
+            result.update(await asyncio.to_thread(self.read_entries, pending))
+
+        return result
+
+    def read_entries(self, paths: typing.List[str]) -> typing.Dict[str, bytes]:
+        result = {}
+
+        for path in paths:
+            method, flags, _, _, _ = self.index[path]
+
+            if method == zipfile.ZIP_DEFLATED and not flags & 0x1:
+                result[path] = self.inflate(path)
+            else:
+                result[path] = self.get_zip_file().read(path)
+
+        return result
+
+    def inflate(self, path: str) -> bytes:
+        size = self.index[path][4]
+        return zlib.decompress(self.get_raw_entry(path), -15, max(size, 1))
+
+    def get_zip_file(self) -> zipfile.ZipFile:
+        if self.zip_file is None:
+            self.zip_file = zipfile.ZipFile(self.file)
+        return self.zip_file
+
 
 def decide_simple(file: str) -> IClassAccessor:
     if os.path.isfile(file):
         if not zipfile.is_zipfile(file): raise IOError("file is not an archive!")
-        return ArchiveFileSource(file)
+        return MemoryMappedArchiveSource(file)
 
     elif os.path.isdir(file):
         return DirectoryFileSource(file)
@@ -0,0 +1,143 @@
+import mmap
+import os
+import pickle
+import typing
+
+from jvm.DecodedClassFile import DecodedClassFile
+import jvm.logging
+
+
+# Bump when the layout of DecodedClassFile or ConstantPool changes; entries of other versions are never read
+CACHE_FORMAT_VERSION = 1
+
+
+class ClassFileCache:
+    """
+    On-disk cache of decoded class files (see DecodedClassFile), keyed by the hash of the class file bytes
+
+    Each entry is a pickle file in a sub-directory for the current cache format version.
+    Entries are read via mmap and their modification time is bumped on each read,
+    so eviction (once the cache grows over 'max_size' bytes) can drop the least recently used entries first.
+    """
+
+    ENTRY_SUFFIX = ".class.pickle"
+
+    def __init__(self, directory: str, max_size: int = 256 * 1024 * 1024):
+        self.directory = os.path.join(directory, f"v{CACHE_FORMAT_VERSION}")
+        self.max_size = max_size
+
+        # calculated on first write
+        self.size: typing.Optional[int] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(self.directory, exist_ok=True)
+
+    def get_path(self, key: bytes) -> str:
+        return os.path.join(self.directory, key.hex() + self.ENTRY_SUFFIX)
+
+    def __contains__(self, key: bytes):
+        return os.path.exists(self.get_path(key))
+
+    def get(self, key: bytes) -> typing.Optional[DecodedClassFile]:
+        path = self.get_path(key)
+
+        try:
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                decoded = pickle.loads(m)
+
+        except FileNotFoundError:
+            self.misses += 1
+            return
+
+        # Corrupted or not-loadable entry (e.g. empty file), drop it
+        except (OSError, ValueError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            jvm.logging.warn(f"dropping invalid class cache entry {path}")
+            self.remove(path)
+            self.misses += 1
+            return
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        self.hits += 1
+        return decoded
+
+    def put(self, key: bytes, decoded: DecodedClassFile):
+        path = self.get_path(key)
+        data = pickle.dumps(decoded, protocol=pickle.HIGHEST_PROTOCOL)
+
+        # Write to a temporary file and move it over, so concurrent readers never see partial entries
+        temp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temp, "wb") as f:
+                f.write(data)
+            os.replace(temp, path)
+        except OSError:
+            jvm.logging.warn(f"failed to write class cache entry {path}")
+            self.remove(temp)
+            return
+
+        if self.size is None:
+            self.size = sum(size for _, size, _ in self.scan())
+        else:
+            self.size += len(data)
+
+        if self.size > self.max_size:
+            self.evict()
+
+    def scan(self) -> typing.Iterator[typing.Tuple[str, int, float]]:
+        """
+        Yields (path, size, last use) of all entries
+        """
+
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith(self.ENTRY_SUFFIX):
+                    continue
+
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+
+                yield entry.path, stat.st_size, stat.st_mtime
+
+    def evict(self, target: float = 0.75):
+        """
+        Removes the least recently used entries until the cache is below 'target' * max_size bytes
+        """
+
+        entries = sorted(self.scan(), key=lambda e: e[2])
+        size = sum(e[1] for e in entries)
+
+        for path, entry_size, _ in entries:
+            if size <= self.max_size * target:
+                break
+
+            if self.remove(path):
+                size -= entry_size
+                self.evictions += 1
+
+        self.size = size
+
+    def clear(self):
+        for path, _, _ in list(self.scan()):
+            self.remove(path)
+
+        self.size = 0
+
+    @staticmethod
+    def remove(path: str) -> bool:
+        try:
+            os.remove(path)
+        except OSError:
+            return False
+        return True
+
+    def __repr__(self):
+        return f"ClassFileCache(directory='{self.directory}',hits={self.hits},misses={self.misses},evictions={self.evictions})"
@@ -0,0 +1,206 @@
+import array
+import sys
+import typing
+
+from jvm.util import ClassFileReader
+from jvm.util import DOUBLE
+from jvm.util import FLOAT
+from jvm.util import INT
+from jvm.util import LONG
+
+
+class ConstantPool:
+    """
+    Compact representation of the constant pool of a class file
+
+    The pool is stored as parallel arrays of tags and raw indices, together with a list of the primitive values
+    (UTF-8 strings are interned, so they are shared across all loaded classes).
+    Entries are resolved lazily into the nested tuple structure used all over the vm, e.g.
+        (10, (7, (1, "java/lang/Object")), (12, (1, "<init>"), (1, "()V")))
+    Resolved entries are cached, so all entries referencing the same class or name-and-type share the same tuple.
+
+    Indexing is 0-based (cp[index - 1] for a class file index), like the list structure used before.
+    Index slots following long and double entries are None.
+    """
+
+    # tags with one reference to another entry
+    SINGLE_REFERENCE = frozenset((7, 8, 16, 19, 20))
+
+    # tags with two references to other entries
+    DOUBLE_REFERENCE = frozenset((9, 10, 11, 12))
+
+    # tags with a raw value and one reference to another entry (MethodHandle, Dynamic, InvokeDynamic)
+    VALUE_REFERENCE = frozenset((15, 17, 18))
+
+    __slots__ = ("tags", "first", "second", "values", "resolved")
+
+    def __init__(self, size: int = 0):
+        self.tags = bytearray(size)
+        self.first = array.array("H", bytes(2 * size))
+        self.second = array.array("H", bytes(2 * size))
+        self.values: typing.List[typing.Any] = [None] * size
+        self.resolved: typing.List[typing.Optional[tuple]] = [None] * size
+
+    @classmethod
+    def from_reader(cls, data: ClassFileReader) -> "ConstantPool":
+        """
+        Reads the constant pool (including its size) from the given reader
+        """
+
+        size = data.read_u2() - 1
+        pool = cls(size)
+        tags, first, second, values = pool.tags, pool.first, pool.second, pool.values
+
+        i = 0
+        while i < size:
+            tag = data.read_u1()
+            tags[i] = tag
+
+            match tag:
+                case 7 | 8 | 16 | 19 | 20:
+                    first[i] = data.read_u2()
+                case 9 | 10 | 11 | 12 | 17 | 18:
+                    first[i] = data.read_u2()
+                    second[i] = data.read_u2()
+                case 3:
+                    values[i] = data.read_struct(INT)[0]
+                case 4:
+                    values[i] = data.read_struct(FLOAT)[0]
+                case 5:
+                    values[i] = data.read_struct(LONG)[0]
+                    i += 1
+                case 6:
+                    values[i] = data.read_struct(DOUBLE)[0]
+                    i += 1
+                case 1:
+                    values[i] = sys.intern(data.read_utf8(data.read_u2()))
+                case 15:
+                    first[i] = data.read_u1()
+                    second[i] = data.read_u2()
+                case _:
+                    raise ValueError(tag)
+
+            i += 1
+
+        return pool
+
+    def __len__(self):
+        return len(self.tags)
+
+    def __getitem__(self, index: int):
+        if index < 0:
+            index += len(self.tags)
+
+        entry = self.resolved[index]
+        if entry is None and self.tags[index] != 0:
+            entry = self.resolved[index] = self.resolve(index)
+
+        return entry
+
+    def __iter__(self):
+        for i in range(len(self.tags)):
+            yield self[i]
+
+    def resolve(self, index: int) -> tuple:
+        """
+        Creates the nested tuple structure for the entry at the given index
+        Use cp[index] for the cached variant
+        """
+
+        tag = self.tags[index]
+
+        if tag in self.SINGLE_REFERENCE:
+            return tag, self[self.first[index] - 1]
+
+        if tag in self.DOUBLE_REFERENCE:
+            return tag, self[self.first[index] - 1], self[self.second[index] - 1]
+
+        if tag in self.VALUE_REFERENCE:
+            return tag, self.first[index], self[self.second[index] - 1]
+
+        return tag, self.values[index]
+
+    def get_tag(self, index: int) -> int:
+        return self.tags[index]
+
+    def get_utf8(self, index: int) -> str:
+        return self.values[index]
+
+    def get_class_name(self, index: int) -> str:
+        """
+        Looks up the name of the Class entry at the given index, without building the entry tuple
+        """
+
+        return self.values[self.first[index] - 1]
+
+    def get_name_and_type(self, index: int) -> typing.Tuple[str, str]:
+        """
+        Looks up name and descriptor of the NameAndType entry at the given index
+        """
+
+        return self.values[self.first[index] - 1], self.values[self.second[index] - 1]
+
+    def get_member_ref(self, index: int) -> typing.Tuple[str, str, str]:
+        """
+        Looks up class name, member name and descriptor of a Fieldref, Methodref or InterfaceMethodref entry
+        """
+
+        if self.tags[index] not in self.DOUBLE_REFERENCE:
+            raise ValueError(f"constant pool entry {index} is no member reference (tag {self.tags[index]})")
+
+        name_and_type = self.second[index] - 1
+        return (
+            self.get_class_name(self.first[index] - 1),
+            self.values[self.first[name_and_type] - 1],
+            self.values[self.second[name_and_type] - 1],
+        )
+
+    def append(self, entry):
+        """
+        Appends an already resolved entry, e.g. when extending the pool for dumping the class
+        """
+
+        entry = freeze_entry(entry)
+
+        self.tags.append(entry[0] if entry is not None else 0)
+        self.first.append(0)
+        self.second.append(0)
+        self.values.append(entry[1] if entry is not None and not isinstance(entry[1], tuple) else None)
+        self.resolved.append(entry)
+
+    def index(self, entry) -> int:
+        entry = freeze_entry(entry)
+
+        for i, e in enumerate(self):
+            if e == entry:
+                return i
+
+        raise ValueError(f"{entry} is not in the constant pool")
+
+    def __contains__(self, entry):
+        try:
+            self.index(entry)
+        except ValueError:
+            return False
+        return True
+
+    def __getstate__(self):
+        # the resolved entries are only a cache, they are re-created on demand
+        return self.tags, self.first, self.second, self.values
+
+    def __setstate__(self, state):
+        self.tags, self.first, self.second, self.values = state
+        self.resolved = [None] * len(self.tags)
+
+    def __repr__(self):
+        return f"ConstantPool(size={len(self.tags)})"
+
+
+def freeze_entry(entry):
+    """
+    Converts a constant pool entry given as (nested) lists into the tuple structure used by the ConstantPool
+    """
+
+    if isinstance(entry, (list, tuple)):
+        return tuple(freeze_entry(e) for e in entry)
+    return entry
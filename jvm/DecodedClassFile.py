@@ -0,0 +1,167 @@
+import typing
+
+from jvm.ConstantPool import ConstantPool
+from jvm.util import ClassFileReader
+
+
+# Raw attribute entries as (name, body)
+RawAttributes = typing.List[typing.Tuple[str, typing.Union[memoryview, bytes]]]
+
+
+class DecodedMember:
+    """
+    Field or method structure of a class file, with the attributes still in raw form
+    """
+
+    __slots__ = ("access", "name", "descriptor", "attributes")
+
+    def __init__(self, access: int, name: str, descriptor: str, attributes: RawAttributes):
+        self.access = access
+        self.name = name
+        self.descriptor = descriptor
+        self.attributes = attributes
+
+    @classmethod
+    def from_reader(cls, cp: ConstantPool, data: ClassFileReader) -> "DecodedMember":
+        access = data.read_u2()
+        name = cp.get_utf8(data.read_u2() - 1)
+        descriptor = cp.get_utf8(data.read_u2() - 1)
+        return cls(access, name, descriptor, read_raw_attributes(cp, data))
+
+    def __getstate__(self):
+        return self.access, self.name, self.descriptor, freeze_raw_attributes(self.attributes)
+
+    def __setstate__(self, state):
+        self.access, self.name, self.descriptor, self.attributes = state
+
+
+class DecodedClassFile:
+    """
+    Intermediate form of a class file, containing everything which can be decoded without a vm:
+    the constant pool, the class header, and fields & methods with their attributes in raw form
+
+    Instances are picklable, so the decoding can happen in another process (see decode_class_files()).
+    JavaBytecodeClass.from_decoded() creates the real class structure from it.
+
+    When created in the current process, the raw attributes are memoryview slices into the class file data;
+    they are only copied when pickling.
+    """
+
+    __slots__ = (
+        "version",
+        "cp",
+        "access",
+        "name",
+        "parent",
+        "interfaces",
+        "fields",
+        "methods",
+        "attributes",
+    )
+
+    def __init__(self):
+        self.version: typing.Tuple[int, int] = -1, -1
+        self.cp: ConstantPool = None
+        self.access = 0
+        self.name: str = None
+        self.parent: typing.Optional[str] = None
+        self.interfaces: typing.List[str] = []
+        self.fields: typing.List[DecodedMember] = []
+        self.methods: typing.List[DecodedMember] = []
+        self.attributes: RawAttributes = []
+
+    @classmethod
+    def from_bytes(cls, data: typing.Union[bytes, bytearray, memoryview, ClassFileReader]) -> "DecodedClassFile":
+        if not isinstance(data, ClassFileReader):
+            data = ClassFileReader(data)
+
+        magic = data.read_u4()
+        assert magic == 0xCAFEBABE, f"magic {magic} is invalid!"
+
+        obj = cls()
+
+        minor, major = data.read_u2(), data.read_u2()
+        obj.version = major, minor
+
+        cp = obj.cp = ConstantPool.from_reader(data)
+
+        obj.access = data.read_u2()
+        obj.name = cp.get_class_name(data.read_u2() - 1)
+
+        # java/lang/Object has no super class
+        parent = data.read_u2()
+        obj.parent = cp.get_class_name(parent - 1) if parent != 0 else None
+
+        obj.interfaces = [
+            cp.get_class_name(data.read_u2() - 1) for _ in range(data.read_u2())
+        ]
+
+        obj.fields = [DecodedMember.from_reader(cp, data) for _ in range(data.read_u2())]
+        obj.methods = [DecodedMember.from_reader(cp, data) for _ in range(data.read_u2())]
+        obj.attributes = read_raw_attributes(cp, data)
+
+        return obj
+
+    def __getstate__(self):
+        return (
+            self.version,
+            self.cp,
+            self.access,
+            self.name,
+            self.parent,
+            self.interfaces,
+            self.fields,
+            self.methods,
+            freeze_raw_attributes(self.attributes),
+        )
+
+    def __setstate__(self, state):
+        (
+            self.version,
+            self.cp,
+            self.access,
+            self.name,
+            self.parent,
+            self.interfaces,
+            self.fields,
+            self.methods,
+            self.attributes,
+        ) = state
+
+    def __repr__(self):
+        return f"DecodedClassFile(name='{self.name}',fields={len(self.fields)},methods={len(self.methods)})"
+
+
+def read_raw_attributes(cp: ConstantPool, data: ClassFileReader) -> RawAttributes:
+    attributes = []
+
+    for _ in range(data.read_u2()):
+        name = cp.get_utf8(data.read_u2() - 1)
+        attributes.append((name, data.read_sized(data.read_u4())))
+
+    return attributes
+
+
+def freeze_raw_attributes(attributes: RawAttributes) -> RawAttributes:
+    # memoryview objects cannot be pickled
+    return [(name, bytes(body)) for name, body in attributes]
+
+
+def decode_class_files(
+    data: typing.Iterable[bytes],
+) -> typing.List[typing.Optional[DecodedClassFile]]:
+    """
+    Decodes a batch of class files; entry point for the worker processes of the vm
+    Class files failing to decode are returned as None, so the vm decodes them again on the main loop,
+    where the error can be reported with the full context
+    """
+
+    result = []
+
+    for bytecode in data:
+        try:
+            result.append(DecodedClassFile.from_bytes(bytecode))
+        except Exception:
+            result.append(None)
+
+    return result
@@ -1,16 +1,18 @@
 import array
-import copy
 import dis
+import functools
+import operator
 import typing
 from abc import ABC
 
-from mcpython.mixin.util import PyOpcodes
-
+import jvm.api
 import jvm.Java
 import jvm.util
-from jvm.api import BaseInstruction, AbstractRuntime, AbstractBytecodeContainer, AbstractStack
+from jvm.Java import JavaClassInstance
+from jvm.api import BaseInstruction, AbstractBytecodeContainer, AbstractStack
 from jvm.api import PyBytecodeBuilder
 from jvm.JavaExceptionStack import StackCollectingException
+from jvm.PyBytecode import PyOpcodes
 
 
 class OpcodeInstruction(BaseInstruction, ABC):
@@ -27,6 +29,68 @@ class OpcodeInstruction(BaseInstruction, ABC):
         return None, 1
 
 
+class Superinstruction(BaseInstruction, ABC):
+    """
+    Base for instructions fused from a sequence of instructions by BytecodeRepr.fuse_instructions()
+
+    The superinstruction replaces the first instruction of the sequence and spans the whole sequence.
+    The other instructions stay in place, so jumps into the sequence still execute them one by one.
+    The data is a tuple whose first entry holds the replaced instruction entry and the offsets of the other
+    fused instructions, see get_fused_instructions()
+    """
+
+    # The instruction types of the sequence, each entry being one type or a tuple of types
+    PATTERN: typing.Tuple[typing.Union[type, typing.Tuple[type, ...]], ...] = ()
+
+    @classmethod
+    def fuse(cls, container: AbstractBytecodeContainer, indices: typing.List[int]) -> typing.Optional[tuple]:
+        """
+        Creates the data for fusing the instructions at the given indices, which match PATTERN
+        Returns None if this specific sequence can not be fused
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def validate_stack(cls, command_index, prepared_data: tuple, container: AbstractBytecodeContainer, stack: AbstractStack):
+        entry, offsets = prepared_data[0]
+        entry[0].validate_stack(command_index, entry[1], container, stack)
+
+        for offset in offsets:
+            entry = container.decoded_code[command_index + offset]
+            stack.cp = command_index + offset
+            entry[0].validate_stack(command_index + offset, entry[1], container, stack)
+
+        stack.cp = command_index
+
+    @classmethod
+    def prepare_python_bytecode_instructions(cls, command_index, prepared_data: tuple, container: AbstractBytecodeContainer, builder: PyBytecodeBuilder):
+        # The compilers emit the other instructions from their own slots
+        entry = prepared_data[0][0]
+        return entry[0].prepare_python_bytecode_instructions(command_index, entry[1], container, builder)
+
+
+class BranchingSuperinstruction(Superinstruction, ABC):
+    """
+    Base for superinstructions ending in a conditional jump, with the jump offset relative to the superinstruction
+    as last data entry
+    """
+
+    @classmethod
+    def code_reference_changer(
+        cls,
+        container: AbstractBytecodeContainer,
+        prepared_data: tuple,
+        instruction_index: int,
+        old_index: int,
+        checker: typing.Callable[[int], int],
+    ):
+        return prepared_data[:-1] + (checker(prepared_data[-1] + old_index) - instruction_index,)
+
+    @classmethod
+    def validate(cls, command_index, prepared_data: tuple, container: AbstractBytecodeContainer):
+        CompareHelper.validate(command_index, prepared_data[-1], container)
+
+
 class CPLinkedInstruction(OpcodeInstruction, ABC):
     """
     Base class for instructions containing one single constant pool reference
@@ -37,7 +101,7 @@ class CPLinkedInstruction(OpcodeInstruction, ABC):
     def decode(
             cls, data: bytearray, index, class_file
     ) -> typing.Tuple[typing.Any, int]:
-        pointer = jvm.util.U2.unpack(data[index: index + 2])[0] - 1
+        pointer = jvm.util.U2.unpack_from(data, index)[0] - 1
         try:
             return (
                 class_file.cp[pointer],
@@ -48,6 +112,23 @@ class CPLinkedInstruction(OpcodeInstruction, ABC):
                 f"during decoding instruction {cls.__name__} pointing to {pointer}"
             ).add_trace(f"current parsing index: {index}, class: {class_file.name}")
 
+    @classmethod
+    def decode_member_ref(
+            cls, data: bytearray, index, class_file
+    ) -> typing.Tuple[str, str, str]:
+        """
+        Decodes the constant pool pointer as a field or method reference into (class name, name, descriptor),
+        reading directly from the constant pool arrays
+        """
+
+        pointer = jvm.util.U2.unpack_from(data, index)[0] - 1
+        try:
+            return class_file.cp.get_member_ref(pointer)
+        except (IndexError, ValueError):
+            raise StackCollectingException(
+                f"during decoding instruction {cls.__name__} pointing to {pointer}"
+            ).add_trace(f"current parsing index: {index}, class: {class_file.name}")
+
 
 @AbstractBytecodeContainer.register_instruction
 class NoOp(OpcodeInstruction):
@@ -55,7 +136,7 @@ class NoOp(OpcodeInstruction):
     OPCODES = {0x00}
 
     @classmethod
-    async def invoke(cls, data: typing.Any, stack: AbstractStack) -> bool:
+    def invoke(cls, data: typing.Any, stack: AbstractStack) -> bool:
         pass
 
     @classmethod
@@ -69,7 +150,7 @@ class NoOpPop(OpcodeInstruction):
     OPCODES = {0xC2, 0xC3}
 
     @classmethod
-    async def invoke(cls, data: typing.Any, stack: AbstractStack):
+    def invoke(cls, data: typing.Any, stack: AbstractStack):
         stack.pop()
 
     @classmethod
@@ -87,10 +168,14 @@ class Any2Byte(OpcodeInstruction):
     OPCODES = {0x91}
 
     @classmethod
-    async def invoke(cls, data: typing.Any, stack: AbstractStack):
+    def invoke(cls, data: typing.Any, stack: AbstractStack):
         v = stack.pop()
         stack.push(int(v) if v is not None else v)
 
+    @staticmethod
+    def convert(v):
+        return int(v) if v is not None else v
+
     @classmethod
     def validate_stack(cls, command_index, prepared_data: typing.Any, container: AbstractBytecodeContainer, stack: AbstractStack):
         stack.pop()
@@ -98,10 +183,7 @@ class Any2Byte(OpcodeInstruction):
 
     @classmethod
     def prepare_python_bytecode_instructions(cls, command_index, prepared_data: typing.Any, container: AbstractBytecodeContainer, builder: PyBytecodeBuilder):
-        builder.add_instruction(PyOpcodes.LOAD_NAME, builder.add_name("bytes"))
-        builder.add_instruction(PyOpcodes.ROT_TWO)
-        builder.add_instruction(PyOpcodes.BUILD_LIST, 1)
-        builder.add_instruction(PyOpcodes.CALL_FUNCTION, 1)
+        builder.add_call(cls.convert, 1)
 
 
 @AbstractBytecodeContainer.register_instruction
@@ -110,10 +192,14 @@ class Any2Float(OpcodeInstruction):
     OPCODES = {0x86, 0x90}
 
     @classmethod
-    async def invoke(cls, data: typing.Any, stack: AbstractStack):
+    def invoke(cls, data: typing.Any, stack: AbstractStack):
         v = stack.pop()
         stack.push(float(v) if v is not None else v)
 
+    @staticmethod
+    def convert(v):
+        return float(v) if v is not None else v
+
     @classmethod
     def validate_stack(cls, command_index, prepared_data: typing.Any, container: AbstractBytecodeContainer, stack: AbstractStack):
         stack.pop()
@@ -121,9 +207,7 @@ class Any2Float(OpcodeInstruction):
 
     @classmethod
     def prepare_python_bytecode_instructions(cls, command_index, prepared_data: typing.Any, container: AbstractBytecodeContainer, builder: PyBytecodeBuilder):
-        builder.add_instruction(PyOpcodes.LOAD_NAME, builder.add_name("float"))
-        builder.add_instruction(PyOpcodes.ROT_TWO)
-        builder.add_instruction(PyOpcodes.CALL_FUNCTION, 1)
+        builder.add_call(cls.convert, 1)
 
 
 @AbstractBytecodeContainer.register_instruction
@@ -136,13 +220,6 @@ class Any2Double(Any2Float):
         stack.pop()
         stack.push("D")
 
-    @classmethod
-    def prepare_python_bytecode_instructions(cls, command_index, prepared_data: typing.Any,
-                                             container: AbstractBytecodeContainer, builder: PyBytecodeBuilder):
-        builder.add_instruction(PyOpcodes.LOAD_NAME, builder.add_name("float"))
-        builder.add_instruction(PyOpcodes.ROT_TWO)
-        builder.add_instruction(PyOpcodes.CALL_FUNCTION, 1)
-
 
 @AbstractBytecodeContainer.register_instruction
 class Any2Int(OpcodeInstruction):
@@ -150,10 +227,14 @@ class Any2Int(OpcodeInstruction):
     OPCODES = {0x8E, 0x8B, 0x88}
 
     @classmethod
-    async def invoke(cls, data: typing.Any, stack: AbstractStack):
+    def invoke(cls, data: typing.Any, stack: AbstractStack):
         v = stack.pop()
         stack.push(int(v) if v is not None else v)
 
+    @staticmethod
+    def convert(v):
+        return int(v) if v is not None else v
+
     @classmethod
     def validate_stack(cls, command_index, prepared_data: typing.Any, container: AbstractBytecodeContainer, stack: AbstractStack):
         stack.pop()
@@ -161,9 +242,7 @@ class Any2Int(OpcodeInstruction):
 
     @classmethod
     def prepare_python_bytecode_instructions(cls, command_index, prepared_data: typing.Any, container: AbstractBytecodeContainer, builder: PyBytecodeBuilder):
-        builder.add_instruction(PyOpcodes.LOAD_NAME, builder.add_name("int"))
-        builder.add_instruction(PyOpcodes.ROT_TWO)
-        builder.add_instruction(PyOpcodes.CALL_FUNCTION, 1)
+        builder.add_call(cls.convert, 1)
 
 
 @AbstractBytecodeContainer.register_instruction
@@ -176,13 +255,6 @@ class Any2Long(Any2Int):
         stack.pop()
         stack.push("J")
 
-    @classmethod
-    def prepare_python_bytecode_instructions(cls, command_index, prepared_data: typing.Any,
-                                             container: AbstractBytecodeContainer, builder: PyBytecodeBuilder):
-        builder.add_instruction(PyOpcodes.LOAD_NAME, builder.add_name("int"))
-        builder.add_instruction(PyOpcodes.ROT_TWO)
-        builder.add_instruction(PyOpcodes.CALL_FUNCTION, 1)
-
 
 class ConstPush(OpcodeInstruction, ABC):
     """
@@ -193,7 +265,7 @@ class ConstPush(OpcodeInstruction, ABC):
     PUSH_TYPE = None
 
     @classmethod
-    async def invoke(cls, data: typing.Any, stack: AbstractStack):
+    def invoke(cls, data: typing.Any, stack: AbstractStack):
         stack.push(cls.PUSHES)
 
     @classmethod
@@ -320,7 +392,7 @@ class BiPush(OpcodeInstruction):
         return jvm.util.U1_S.unpack(data[index: index + 1])[0], 2
 
     @classmethod
-    async def invoke(cls, data: typing.Any, stack: AbstractStack):
+    def invoke(cls, data: typing.Any, stack: AbstractStack):
         stack.push(data)
 
     @classmethod
@@ -329,7 +401,7 @@ class BiPush(OpcodeInstruction):
 
     @classmethod
     def prepare_python_bytecode_instructions(cls, command_index, prepared_data: typing.Any, container: AbstractBytecodeContainer, builder: PyBytecodeBuilder):
-        builder.add_instruction(PyOpcodes.LOAD_CONST, builder.add_const(bytes([prepared_data])))
+        builder.add_instruction(PyOpcodes.LOAD_CONST, builder.add_const(prepared_data))
 
 
 @AbstractBytecodeContainer.register_instruction
@@ -343,7 +415,7 @@ class SiPush(OpcodeInstruction):
         return jvm.util.U2_S.unpack(data[index: index + 2])[0], 3
 
     @classmethod
-    async def invoke(cls, data: typing.Any, stack: AbstractStack):
+    def invoke(cls, data: typing.Any, stack: AbstractStack):
         stack.push(data)
 
     @classmethod
@@ -404,10 +476,11 @@ class LDC_W(LDC):
 
 @AbstractBytecodeContainer.register_instruction
 class ArrayLoad(OpcodeInstruction):
-    OPCODES = {0x32, 0x2E, 0x33, 0x31}
+    # aaload, iaload, laload, faload, daload, baload, caload, saload
+    OPCODES = {0x32, 0x2E, 0x2F, 0x30, 0x31, 0x33, 0x34, 0x35}
 
     @classmethod
-    async def invoke(cls, data: typing.Any, stack: AbstractStack):
+    def invoke(cls, data: typing.Any, stack: AbstractStack):
         index = stack.pop()
         array = stack.pop()
 
@@ -433,14 +506,18 @@ class ArrayLoad(OpcodeInstruction):
 
 @AbstractBytecodeContainer.register_instruction
 class ArrayStore(OpcodeInstruction):
-    OPCODES = {0x53, 0x4F, 0x50, 0x54, 0x52, 0x51, 0x55}
+    # aastore, iastore, lastore, fastore, dastore, bastore, castore, sastore
+    OPCODES = {0x53, 0x4F, 0x50, 0x51, 0x52, 0x54, 0x55, 0x56}
 
     @classmethod
-    async def invoke(cls, data: typing.Any, stack: AbstractStack):
+    def invoke(cls, data: typing.Any, stack: AbstractStack):
         value = stack.pop()
         index = stack.pop()
         array = stack.pop()
+        cls.store(array, index, value)
 
+    @staticmethod
+    def store(array, index, value):
         if index is None:
             raise StackCollectingException("NullPointerException: index is null")
 
@@ -453,7 +530,36 @@ class ArrayStore(OpcodeInstruction):
         if index >= len(array):
             raise StackCollectingException(f"Array index out of range: {index} >= {len(array)}")
 
-        array[index] = value
+        try:
+            array[index] = value
+        except (OverflowError, TypeError):
+            # Primitive arrays (see NewArray) only take values in range of their element type
+            if not hasattr(array, "typecode"):
+                raise
+
+            array[index] = ArrayStore.convert_to_array_type(array, value)
+
+    @staticmethod
+    def convert_to_array_type(array, value):
+        """
+        Narrows the value to the element type of a primitive array, wrapping around like the jvm does
+        """
+
+        # chars may still be python strings here
+        if isinstance(value, str):
+            value = ord(value)
+
+        if array.typecode in "fd":
+            return float(value)
+
+        bits = array.itemsize * 8
+        value = int(value) & ((1 << bits) - 1)
+
+        # lower case type codes are signed
+        if array.typecode.islower() and value >= 1 << (bits - 1):
+            value -= 1 << bits
+
+        return value
 
     @classmethod
     def validate_stack(cls, command_index, prepared_data: typing.Any, container: AbstractBytecodeContainer,
@@ -464,8 +570,9 @@ class ArrayStore(OpcodeInstruction):
 
     @classmethod
     def prepare_python_bytecode_instructions(cls, command_index, prepared_data: typing.Any, container: AbstractBytecodeContainer, builder: PyBytecodeBuilder):
-        builder.add_instruction(PyOpcodes.ROT_THREE)
-        builder.add_instruction(PyOpcodes.STORE_SUBSCR)
+        # Not via STORE_SUBSCR, as negative indices must not wrap around
+        builder.add_call(cls.store, 3)
+        builder.add_instruction(PyOpcodes.POP_TOP)
 
 
 @AbstractBytecodeContainer.register_instruction
@@ -479,7 +586,7 @@ class Load(OpcodeInstruction):
         return jvm.util.U1.unpack(data[index: index + 1])[0], 2
 
     @classmethod
-    async def invoke(cls, data: typing.Any, stack: AbstractStack):
+    def invoke(cls, data: typing.Any, stack: AbstractStack):
         stack.push(stack.local_vars[data])
 
     @classmethod
@@ -503,7 +610,7 @@ class Load0(OpcodeInstruction):
     OPCODES = {0x2A, 0x1A, 0x22, 0x26, 0x1E}
 
     @classmethod
-    async def invoke(cls, data: typing.Any, stack: AbstractStack):
+    def invoke(cls, data: typing.Any, stack: AbstractStack):
         stack.push(stack.local_vars[0])
 
     @classmethod
@@ -529,7 +636,7 @@ class Load1(OpcodeInstruction):
     OPCODES = {0x2B, 0x1B, 0x23, 0x27, 0x1F}
 
     @classmethod
-    async def invoke(cls, data: typing.Any, stack: AbstractStack):
+    def invoke(cls, data: typing.Any, stack: AbstractStack):
         stack.push(stack.local_vars[1])
 
     @classmethod
@@ -555,7 +662,7 @@ class Load2(OpcodeInstruction):
     OPCODES = {0x2C, 0x1C, 0x24, 0x28, 0x20}
 
     @classmethod
-    async def invoke(cls, data: typing.Any, stack: AbstractStack):
+    def invoke(cls, data: typing.Any, stack: AbstractStack):
         stack.push(stack.local_vars[2])
 
     @classmethod
@@ -581,7 +688,7 @@ class Load3(OpcodeInstruction):
     OPCODES = {0x2D, 0x1D, 0x25, 0x29, 0x21}
 
     @classmethod
-    async def invoke(cls, data: typing.Any, stack: AbstractStack):
+    def invoke(cls, data: typing.Any, stack: AbstractStack):
         stack.push(stack.local_vars[3])
 
     @classmethod
@@ -613,7 +720,7 @@ class Store(OpcodeInstruction):
         return jvm.util.U1.unpack(data[index: index + 1])[0], 2
 
     @classmethod
-    async def invoke(cls, data: typing.Any, stack: AbstractStack):
+    def invoke(cls, data: typing.Any, stack: AbstractStack):
         stack.local_vars[data] = stack.pop()
 
     @classmethod
@@ -639,7 +746,7 @@ class Store0(OpcodeInstruction):
     OPCODES = {0x4B, 0x3B, 0x47, 0x43, 0x3F}
 
     @classmethod
-    async def invoke(cls, data: typing.Any, stack: AbstractStack):
+    def invoke(cls, data: typing.Any, stack: AbstractStack):
         stack.local_vars[0] = stack.pop()
 
     @classmethod
@@ -665,7 +772,7 @@ class Store1(OpcodeInstruction):
     OPCODES = {0x4C, 0x3C, 0x48, 0x44, 0x40}
 
     @classmethod
-    async def invoke(cls, data: typing.Any, stack: AbstractStack):
+    def invoke(cls, data: typing.Any, stack: AbstractStack):
         stack.local_vars[1] = stack.pop()
 
     @classmethod
@@ -691,7 +798,7 @@ class Store2(OpcodeInstruction):
     OPCODES = {0x4D, 0x3D, 0x49, 0x45, 0x41}
 
     @classmethod
-    async def invoke(cls, data: typing.Any, stack: AbstractStack):
+    def invoke(cls, data: typing.Any, stack: AbstractStack):
         stack.local_vars[2] = stack.pop()
 
     @classmethod
@@ -717,7 +824,7 @@ class Store3(OpcodeInstruction):
     OPCODES = {0x4E, 0x3E, 0x4A, 0x46, 0x42}
 
     @classmethod
-    async def invoke(cls, data: typing.Any, stack: AbstractStack):
+    def invoke(cls, data: typing.Any, stack: AbstractStack):
         stack.local_vars[3] = stack.pop()
 
     @classmethod
@@ -743,7 +850,7 @@ class POP(OpcodeInstruction):
     OPCODES = {0x57}
 
     @classmethod
-    async def invoke(cls, data: typing.Any, stack: AbstractStack):
+    def invoke(cls, data: typing.Any, stack: AbstractStack):
         stack.pop()
 
     @classmethod
@@ -761,7 +868,7 @@ class POP2(OpcodeInstruction):
     OPCODES = {0x58}
 
     @classmethod
-    async def invoke(cls, data: typing.Any, stack: AbstractStack):
+    def invoke(cls, data: typing.Any, stack: AbstractStack):
         # todo: check computation type
         stack.pop()
         stack.pop()
@@ -784,7 +891,7 @@ class DUP(OpcodeInstruction):
     OPCODES = {0x59}
 
     @classmethod
-    async def invoke(cls, data: typing.Any, stack: AbstractStack):
+    def invoke(cls, data: typing.Any, stack: AbstractStack):
         v = stack.pop()
         stack.push(v)
         stack.push(v)
@@ -807,7 +914,7 @@ class DUP2(OpcodeInstruction):
     # todo: check for double & long!
 
     @classmethod
-    async def invoke(cls, data: typing.Any, stack: AbstractStack):
+    def invoke(cls, data: typing.Any, stack: AbstractStack):
         v1 = stack.pop()
         v2 = stack.pop()
         stack.push(v2)
@@ -827,7 +934,7 @@ class DUP2(OpcodeInstruction):
     @classmethod
     def prepare_python_bytecode_instructions(cls, command_index, prepared_data: typing.Any,
                                              container: AbstractBytecodeContainer, builder: PyBytecodeBuilder):
-        builder.add_instruction(PyOpcodes.DUP_TOP)  # todo: do real opcode here!
+        builder.add_instruction(PyOpcodes.DUP_TOP_TWO)
 
 
 @AbstractBytecodeContainer.register_instruction
@@ -835,7 +942,7 @@ class DUP_X1(OpcodeInstruction):
     OPCODES = {0x5A}
 
     @classmethod
-    async def invoke(cls, data: typing.Any, stack: AbstractStack):
+    def invoke(cls, data: typing.Any, stack: AbstractStack):
         a, b = stack.pop(), stack.pop()
         stack.push(a)
         stack.push(b)
@@ -860,7 +967,7 @@ class ADD(OpcodeInstruction):
     OPCODES = {0x60, 0x63, 0x62}
 
     @classmethod
-    async def invoke(cls, data: typing.Any, stack: AbstractStack):
+    def invoke(cls, data: typing.Any, stack: AbstractStack):
         b, a = stack.pop(), stack.pop()
         try:
             stack.push(a + b)
@@ -883,9 +990,9 @@ class SUB(OpcodeInstruction):
     OPCODES = {0x66, 0x64, 0x67, 0x65}
 
     @classmethod
-    async def invoke(cls, data: typing.Any, stack: AbstractStack):
+    def invoke(cls, data: typing.Any, stack: AbstractStack):
         b, a = stack.pop(), stack.pop()
-        stack.push(b - a)
+        stack.push(a - b)
 
     @classmethod
     def validate_stack(cls, command_index, prepared_data: typing.Any, container: AbstractBytecodeContainer, stack: AbstractStack):
@@ -904,7 +1011,7 @@ class IDIV(OpcodeInstruction):
     OPCODES = {0x6C}
 
     @classmethod
-    async def invoke(cls, data: typing.Any, stack: AbstractStack):
+    def invoke(cls, data: typing.Any, stack: AbstractStack):
         b, a = stack.pop(), stack.pop()
         stack.push(a // b)
 
@@ -925,7 +1032,7 @@ class FDIV(OpcodeInstruction):
     OPCODES = {0x6E, 0x6F}
 
     @classmethod
-    async def invoke(cls, data: typing.Any, stack: AbstractStack):
+    def invoke(cls, data: typing.Any, stack: AbstractStack):
         b, a = stack.pop(), stack.pop()
         stack.push(a / b)
 
@@ -946,9 +1053,15 @@ class Rem(OpcodeInstruction):
     OPCODES = {0x70, 0x71}
 
     @classmethod
-    async def invoke(cls, data: typing.Any, stack: AbstractStack):
+    def invoke(cls, data: typing.Any, stack: AbstractStack):
         b, a = stack.pop(), stack.pop()
-        stack.push(int(a - (a / b) * b))
+        stack.push(cls.remainder(a, b))
+
+    @staticmethod
+    def remainder(a: int, b: int) -> int:
+        # The result has the sign of the dividend, unlike python's %
+        r = abs(a) % abs(b)
+        return r if a >= 0 else -r
 
     @classmethod
     def validate_stack(cls, command_index, prepared_data: typing.Any, container: AbstractBytecodeContainer, stack: AbstractStack):
@@ -956,13 +1069,18 @@ class Rem(OpcodeInstruction):
         stack.pop_expect_type(a)
         stack.push(a)
 
+    @classmethod
+    def prepare_python_bytecode_instructions(cls, command_index, prepared_data: typing.Any,
+                                             container: AbstractBytecodeContainer, builder: PyBytecodeBuilder):
+        builder.add_call(cls.remainder, 2)
+
 
 @AbstractBytecodeContainer.register_instruction
 class SHL(OpcodeInstruction):
     OPCODES = {0x78}
 
     @classmethod
-    async def invoke(cls, data: typing.Any, stack: AbstractStack):
+    def invoke(cls, data: typing.Any, stack: AbstractStack):
         b, a = stack.pop(), stack.pop()
         stack.push(a << b)
 
@@ -983,7 +1101,7 @@ class SHR(OpcodeInstruction):
     OPCODES = {0x7A}
 
     @classmethod
-    async def invoke(cls, data: typing.Any, stack: AbstractStack):
+    def invoke(cls, data: typing.Any, stack: AbstractStack):
         b, a = stack.pop(), stack.pop()
         stack.push(a >> b)
 
@@ -1004,7 +1122,7 @@ class AND(OpcodeInstruction):
     OPCODES = {0x7E}
 
     @classmethod
-    async def invoke(cls, data: typing.Any, stack: AbstractStack):
+    def invoke(cls, data: typing.Any, stack: AbstractStack):
         b, a = stack.pop(), stack.pop()
         stack.push(a & b)
 
@@ -1025,7 +1143,7 @@ class OR(OpcodeInstruction):
     OPCODES = {0x80}
 
     @classmethod
-    async def invoke(cls, data: typing.Any, stack: AbstractStack):
+    def invoke(cls, data: typing.Any, stack: AbstractStack):
         b, a = stack.pop(), stack.pop()
         stack.push(a | b)
 
@@ -1055,7 +1173,7 @@ class IINC(OpcodeInstruction):
         ), 3
 
     @classmethod
-    async def invoke(cls, data: typing.Tuple[int, int], stack: AbstractStack):
+    def invoke(cls, data: typing.Tuple[int, int], stack: AbstractStack):
         stack.local_vars[data[0]] += data[1]
 
     @classmethod
@@ -1077,7 +1195,7 @@ class CompareTwo(OpcodeInstruction):
     OPCODES = {0x94, 0x95, 0x96, 0x97, 0x98}
 
     @classmethod
-    async def invoke(cls, data: typing.Any, stack: AbstractStack):
+    def invoke(cls, data: typing.Any, stack: AbstractStack):
         b, a = stack.pop(), stack.pop()
 
         if a == b:
@@ -1096,21 +1214,27 @@ class CompareTwo(OpcodeInstruction):
     @classmethod
     def prepare_python_bytecode_instructions(cls, command_index, prepared_data: typing.Any,
                                              container: AbstractBytecodeContainer, builder: PyBytecodeBuilder):
+        not_equal = builder.new_label()
+        less = builder.new_label()
+        end = builder.new_label()
+
         builder.add_instruction(PyOpcodes.DUP_TOP_TWO)
         builder.add_instruction(PyOpcodes.COMPARE_OP, builder.add_comparator("=="))
-        builder.add_instruction(PyOpcodes.POP_JUMP_IF_FALSE, builder.real_from_offset(6))
-
+        builder.add_instruction(PyOpcodes.POP_JUMP_IF_FALSE, not_equal)
+        builder.add_instruction(PyOpcodes.POP_TOP)
+        builder.add_instruction(PyOpcodes.POP_TOP)
         builder.add_instruction(PyOpcodes.LOAD_CONST, builder.add_const(0))
-        builder.add_instruction(PyOpcodes.JUMP_ABSOLUTE, builder.real_from_offset(16))
+        builder.add_instruction(PyOpcodes.JUMP_ABSOLUTE, end)
 
-        builder.add_instruction(PyOpcodes.DUP_TOP_TWO)
+        builder.place_label(not_equal)
         builder.add_instruction(PyOpcodes.COMPARE_OP, builder.add_comparator(">"))
-        builder.add_instruction(PyOpcodes.POP_JUMP_IF_FALSE, builder.real_from_offset(6))
-
+        builder.add_instruction(PyOpcodes.POP_JUMP_IF_FALSE, less)
         builder.add_instruction(PyOpcodes.LOAD_CONST, builder.add_const(1))
-        builder.add_instruction(PyOpcodes.JUMP_ABSOLUTE, builder.real_from_offset(4))
+        builder.add_instruction(PyOpcodes.JUMP_ABSOLUTE, end)
 
+        builder.place_label(less)
         builder.add_instruction(PyOpcodes.LOAD_CONST, builder.add_const(-1))
+        builder.place_label(end)
 
 
 class CompareHelper(OpcodeInstruction, ABC):
@@ -1144,26 +1268,46 @@ class CompareHelper(OpcodeInstruction, ABC):
 
 
 class SingleCompare(CompareHelper, ABC):
+    # The python comparator equal to the check in invoke(), comparing the value against 0
+    COMPARATOR: str = None
+
     @classmethod
     def validate_stack(cls, command_index, prepared_data: int, container: AbstractBytecodeContainer, stack: AbstractStack):
         stack.pop()
         stack.branch(prepared_data)
 
+    @classmethod
+    def prepare_python_bytecode_instructions(cls, command_index, prepared_data: int,
+                                             container: AbstractBytecodeContainer, builder: PyBytecodeBuilder):
+        builder.add_instruction(PyOpcodes.LOAD_CONST, builder.add_const(0))
+        builder.add_instruction(PyOpcodes.COMPARE_OP, builder.add_comparator(cls.COMPARATOR))
+        builder.add_instruction(PyOpcodes.POP_JUMP_IF_TRUE, builder.real_from_offset(prepared_data))
+
 
 class DoubleCompare(CompareHelper, ABC):
+    # The python comparator equal to the check in invoke(), as "<value 1> COMPARATOR <value 2>"
+    COMPARATOR: str = None
+
     @classmethod
     def validate_stack(cls, command_index, prepared_data: int, container: AbstractBytecodeContainer, stack: AbstractStack):
         stack.pop()
         stack.pop()
         stack.branch(prepared_data)
 
+    @classmethod
+    def prepare_python_bytecode_instructions(cls, command_index, prepared_data: int,
+                                             container: AbstractBytecodeContainer, builder: PyBytecodeBuilder):
+        builder.add_instruction(PyOpcodes.COMPARE_OP, builder.add_comparator(cls.COMPARATOR))
+        builder.add_instruction(PyOpcodes.POP_JUMP_IF_TRUE, builder.real_from_offset(prepared_data))
+
 
 @AbstractBytecodeContainer.register_instruction
 class IfLT(DoubleCompare):
     OPCODES = {0x97}
+    COMPARATOR = "<"
 
     @classmethod
-    async def invoke(cls, data: int, stack: AbstractStack) -> bool:
+    def invoke(cls, data: int, stack: AbstractStack) -> bool:
         if stack.pop() > stack.pop():
             stack.cp += data
             return True
@@ -1172,9 +1316,10 @@ class IfLT(DoubleCompare):
 @AbstractBytecodeContainer.register_instruction
 class IfGT(DoubleCompare):
     OPCODES = {0xA3}
+    COMPARATOR = ">"
 
     @classmethod
-    async def invoke(cls, data: int, stack: AbstractStack) -> bool:
+    def invoke(cls, data: int, stack: AbstractStack) -> bool:
         if stack.pop() < stack.pop():
             stack.cp += data
             return True
@@ -1183,9 +1328,10 @@ class IfGT(DoubleCompare):
 @AbstractBytecodeContainer.register_instruction
 class IfEq0(SingleCompare):
     OPCODES = {0x99}
+    COMPARATOR = "=="
 
     @classmethod
-    async def invoke(cls, data: int, stack: AbstractStack) -> bool:
+    def invoke(cls, data: int, stack: AbstractStack) -> bool:
         if stack.pop() == 0:
             stack.cp += data
             return True
@@ -1194,9 +1340,10 @@ class IfEq0(SingleCompare):
 @AbstractBytecodeContainer.register_instruction
 class IfNEq0(SingleCompare):
     OPCODES = {0x9A}
+    COMPARATOR = "!="
 
     @classmethod
-    async def invoke(cls, data: int, stack: AbstractStack) -> bool:
+    def invoke(cls, data: int, stack: AbstractStack) -> bool:
         if stack.pop() != 0:
             stack.cp += data
             return True
@@ -1205,9 +1352,10 @@ class IfNEq0(SingleCompare):
 @AbstractBytecodeContainer.register_instruction
 class IfLT0(SingleCompare):
     OPCODES = {0x9B}
+    COMPARATOR = "<"
 
     @classmethod
-    async def invoke(cls, data: int, stack: AbstractStack) -> bool:
+    def invoke(cls, data: int, stack: AbstractStack) -> bool:
         if stack.pop() < 0:
             stack.cp += data
             return True
@@ -1216,9 +1364,10 @@ class IfLT0(SingleCompare):
 @AbstractBytecodeContainer.register_instruction
 class IfGE0(SingleCompare):
     OPCODES = {0x9C}
+    COMPARATOR = ">="
 
     @classmethod
-    async def invoke(cls, data: int, stack: AbstractStack) -> bool:
+    def invoke(cls, data: int, stack: AbstractStack) -> bool:
         if stack.pop() >= 0:
             stack.cp += data
             return True
@@ -1227,9 +1376,10 @@ class IfGE0(SingleCompare):
 @AbstractBytecodeContainer.register_instruction
 class IfGT0(SingleCompare):
     OPCODES = {0x9D}
+    COMPARATOR = ">"
 
     @classmethod
-    async def invoke(cls, data: int, stack: AbstractStack) -> bool:
+    def invoke(cls, data: int, stack: AbstractStack) -> bool:
         if stack.pop() > 0:
             stack.cp += data
             return True
@@ -1238,9 +1388,10 @@ class IfGT0(SingleCompare):
 @AbstractBytecodeContainer.register_instruction
 class IfLE0(SingleCompare):
     OPCODES = {0x9E}
+    COMPARATOR = "<="
 
     @classmethod
-    async def invoke(cls, data: int, stack: AbstractStack) -> bool:
+    def invoke(cls, data: int, stack: AbstractStack) -> bool:
         if stack.pop() <= 0:
             stack.cp += data
             return True
@@ -1249,9 +1400,10 @@ class IfLE0(SingleCompare):
 @AbstractBytecodeContainer.register_instruction
 class IfEq(DoubleCompare):
     OPCODES = {0x9F, 0xA5}
+    COMPARATOR = "=="
 
     @classmethod
-    async def invoke(cls, data: int, stack: AbstractStack) -> bool:
+    def invoke(cls, data: int, stack: AbstractStack) -> bool:
         if stack.pop() == stack.pop():
             stack.cp += data
             return True
@@ -1260,9 +1412,10 @@ class IfEq(DoubleCompare):
 @AbstractBytecodeContainer.register_instruction
 class IfNE(DoubleCompare):
     OPCODES = {0xA0, 0xA6}
+    COMPARATOR = "!="
 
     @classmethod
-    async def invoke(cls, data: int, stack: AbstractStack) -> bool:
+    def invoke(cls, data: int, stack: AbstractStack) -> bool:
         if stack.pop() != stack.pop():
             stack.cp += data
             return True
@@ -1271,9 +1424,10 @@ class IfNE(DoubleCompare):
 @AbstractBytecodeContainer.register_instruction
 class IfLt(DoubleCompare):
     OPCODES = {0xA1}
+    COMPARATOR = "<"
 
     @classmethod
-    async def invoke(cls, data: int, stack: AbstractStack) -> bool:
+    def invoke(cls, data: int, stack: AbstractStack) -> bool:
         if stack.pop() > stack.pop():
             stack.cp += data
             return True
@@ -1282,9 +1436,10 @@ class IfLt(DoubleCompare):
 @AbstractBytecodeContainer.register_instruction
 class IfGe(DoubleCompare):
     OPCODES = {0xA2}
+    COMPARATOR = ">="
 
     @classmethod
-    async def invoke(cls, data: int, stack: AbstractStack) -> bool:
+    def invoke(cls, data: int, stack: AbstractStack) -> bool:
         if stack.pop() <= stack.pop():
             stack.cp += data
             return True
@@ -1293,9 +1448,10 @@ class IfGe(DoubleCompare):
 @AbstractBytecodeContainer.register_instruction
 class IfLe(DoubleCompare):
     OPCODES = {0xA4}
+    COMPARATOR = "<="
 
     @classmethod
-    async def invoke(cls, data: int, stack: AbstractStack) -> bool:
+    def invoke(cls, data: int, stack: AbstractStack) -> bool:
         if stack.pop() >= stack.pop():
             stack.cp += data
             return True
@@ -1306,7 +1462,7 @@ class Goto(CompareHelper):
     OPCODES = {0xA7}
 
     @classmethod
-    async def invoke(cls, data: int, stack: AbstractStack):
+    def invoke(cls, data: int, stack: AbstractStack):
         stack.cp += data
         return True
 
@@ -1314,13 +1470,18 @@ class Goto(CompareHelper):
     def validate_stack(cls, command_index, prepared_data: int, container: AbstractBytecodeContainer, stack: AbstractStack):
         stack.cp += prepared_data
 
+    @classmethod
+    def prepare_python_bytecode_instructions(cls, command_index, prepared_data: int,
+                                             container: AbstractBytecodeContainer, builder: PyBytecodeBuilder):
+        builder.add_instruction(PyOpcodes.JUMP_ABSOLUTE, builder.real_from_offset(prepared_data))
+
 
 @AbstractBytecodeContainer.register_instruction
 class AReturn(OpcodeInstruction):
     OPCODES = {0xB0, 0xAC, 0xAE}
 
     @classmethod
-    async def invoke(cls, data: typing.Any, stack: AbstractStack):
+    def invoke(cls, data: typing.Any, stack: AbstractStack):
         stack.end(stack.pop())
 
     @classmethod
@@ -1328,19 +1489,30 @@ class AReturn(OpcodeInstruction):
         stack.pop()
         stack.cp = -1
 
+    @classmethod
+    def prepare_python_bytecode_instructions(cls, command_index, prepared_data: typing.Any,
+                                             container: AbstractBytecodeContainer, builder: PyBytecodeBuilder):
+        builder.add_instruction(PyOpcodes.RETURN_VALUE)
+
 
 @AbstractBytecodeContainer.register_instruction
 class Return(OpcodeInstruction):
     OPCODES = {0xB1}
 
     @classmethod
-    async def invoke(cls, data: typing.Any, stack: AbstractStack):
+    def invoke(cls, data: typing.Any, stack: AbstractStack):
         stack.end()
 
     @classmethod
     def validate_stack(cls, command_index, prepared_data: typing.Any, container: AbstractBytecodeContainer, stack: AbstractStack):
         stack.cp = -1
 
+    @classmethod
+    def prepare_python_bytecode_instructions(cls, command_index, prepared_data: typing.Any,
+                                             container: AbstractBytecodeContainer, builder: PyBytecodeBuilder):
+        builder.add_instruction(PyOpcodes.LOAD_CONST, builder.add_const(None))
+        builder.add_instruction(PyOpcodes.RETURN_VALUE)
+
 
 @AbstractBytecodeContainer.register_instruction
 class GetStatic(CPLinkedInstruction):
@@ -1350,20 +1522,21 @@ class GetStatic(CPLinkedInstruction):
     def decode(
         cls, data: bytearray, index, class_file
     ) -> typing.Tuple[typing.Any, int]:
-        d, i = super().decode(data, index, class_file)
-        return (d[1][1][1], d[2][1][1], d[2][2][1]), i
+        return StaticFieldReference(*cls.decode_member_ref(data, index, class_file)), 3
 
     @classmethod
-    async def invoke(cls, data: typing.Tuple[str, str, str], stack: AbstractStack):
-        cls_name, name, T = data
-        java_class = await stack.vm.get_class(
-            cls_name, version=stack.method.class_file.internal_version
-        )
-        stack.push(await java_class.get_static_attribute(name, expected_type=T))
+    async def invoke(cls, field: "StaticFieldReference", stack: AbstractStack):
+        if field.epoch != stack.vm.method_epoch:
+            await field.bind(stack)
+
+        if field.cell is not None:
+            stack.push(field.cell.value)
+        else:
+            stack.push(await field.owner.get_static_attribute(field.name, expected_type=field.descriptor))
 
     @classmethod
-    def validate_stack(cls, command_index, prepared_data: typing.Tuple[str, str, str], container: AbstractBytecodeContainer, stack: AbstractStack):
-        stack.push(prepared_data[2])
+    def validate_stack(cls, command_index, prepared_data: "StaticFieldReference", container: AbstractBytecodeContainer, stack: AbstractStack):
+        stack.push(prepared_data.descriptor)
 
 
 @AbstractBytecodeContainer.register_instruction
@@ -1374,24 +1547,94 @@ class PutStatic(CPLinkedInstruction):
     def decode(
             cls, data: bytearray, index, class_file
     ) -> typing.Tuple[typing.Any, int]:
-        d, i = super().decode(data, index, class_file)
-        return (d[1][1][1], d[2][1][1]), i
+        return StaticFieldReference(*cls.decode_member_ref(data, index, class_file)), 3
 
     @classmethod
-    async def invoke(cls, data: typing.Tuple[str, str], stack: AbstractStack):
-        cls_name, name = data
-        java_class = await stack.vm.get_class(
-            cls_name, version=stack.method.class_file.internal_version
-        )
+    async def invoke(cls, field: "StaticFieldReference", stack: AbstractStack):
+        if field.epoch != stack.vm.method_epoch:
+            await field.bind(stack, create=True)
 
         value = stack.pop()
-        java_class.set_static_attribute(name, value)
+
+        if field.cell is not None:
+            field.cell.value = value
+        else:
+            field.owner.set_static_attribute(field.name, value)
 
     @classmethod
     def validate_stack(cls, command_index, prepared_data: typing.Any, container: AbstractBytecodeContainer, stack: AbstractStack):
         stack.pop()
 
 
+class StaticFieldReference:
+    """
+    Decoded operand of GetStatic and PutStatic
+
+    Binds on first execution to the storage cell of the attribute in the declaring class
+    (see JavaBytecodeClass.get_static_field_cell()), or to the referenced class itself when no bytecode class declares it
+    Bound again when the method epoch of the vm changes (see JavaVM.invalidate_method_caches())
+    """
+
+    __slots__ = ("class_name", "name", "descriptor", "epoch", "owner", "cell")
+
+    def __init__(self, class_name: str, name: str, descriptor: str):
+        self.class_name = class_name
+        self.name = name
+        self.descriptor = descriptor
+        self.epoch = -1
+        self.owner = None
+        self.cell = None
+
+    async def bind(self, stack: AbstractStack, create=False):
+        """
+        :param create: if the attribute should be created in the referenced class when no bytecode class declares it
+        """
+
+        java_class = await stack.vm.get_class(
+            self.class_name, version=stack.method.class_file.internal_version
+        )
+
+        # Class init may have changed the epoch, so read it afterwards
+        self.epoch = stack.vm.method_epoch
+        self.owner = java_class
+        self.cell = None
+
+        if isinstance(java_class, jvm.Java.JavaBytecodeClass):
+            self.cell = await java_class.get_static_field_cell(self.name)
+
+            if self.cell is None and create:
+                java_class.set_static_attribute(self.name, None)
+                self.epoch = stack.vm.method_epoch
+                self.cell = java_class.static_field_cells[self.name]
+
+    def __repr__(self):
+        return f"StaticFieldReference({self.class_name}.{self.name}:{self.descriptor})"
+
+
+class FieldReference:
+    """
+    Decoded operand of GetField and PutField
+
+    Binds on execution to the slot index of the field in the layout of the receiver's class
+    (see JavaBytecodeClass.get_field_layout()), and is bound again when a receiver of another class comes along
+    """
+
+    __slots__ = ("name", "class_name", "owner", "index")
+
+    def __init__(self, name: str, class_name: str):
+        self.name = name
+        self.class_name = class_name
+        self.owner = None
+        self.index = None
+
+    def bind(self, owner: "jvm.Java.JavaBytecodeClass"):
+        self.owner = owner
+        self.index = owner.field_layout.get(self.name)
+
+    def __repr__(self):
+        return f"FieldReference({self.class_name}.{self.name})"
+
+
 @AbstractBytecodeContainer.register_instruction
 class GetField(CPLinkedInstruction):
     OPCODES = {0xB4}
@@ -1400,20 +1643,33 @@ class GetField(CPLinkedInstruction):
     def decode(
             cls, data: bytearray, index, class_file
     ) -> typing.Tuple[typing.Any, int]:
-        d, i = super().decode(data, index, class_file)
-        return d[2][1][1], i
+        cls_name, name, _ = cls.decode_member_ref(data, index, class_file)
+        return FieldReference(name, cls_name), 3
 
     @classmethod
-    async def invoke(cls, name: str, stack: AbstractStack):
+    def invoke(cls, field: FieldReference, stack: AbstractStack):
         obj = stack.pop()
 
         if obj is None:
-            raise StackCollectingException(f"NullPointerException: object is None; Cannot get attribute '{name}'")
+            raise StackCollectingException(f"NullPointerException: object is None; Cannot get attribute '{field.name}'")
+
+        if type(obj) is JavaClassInstance:
+            if obj.class_file is not field.owner:
+                field.bind(obj.class_file)
+
+            if field.index is not None:
+                stack.push(obj.field_values[field.index])
+                return
+
+        name = field.name
 
         try:
             stack.push(obj.get_field(name))
         except (KeyError, AttributeError):
-            if hasattr(obj, "get_class") and isinstance(await obj.get_class(), jvm.Java.JavaBytecodeClass):
+            # Resolved without awaiting get_class(), so this instruction does not need to suspend
+            if isinstance(obj, jvm.api.AbstractJavaClassInstance) and isinstance(
+                obj.rebound_type or obj.get_real_class(), jvm.Java.JavaBytecodeClass
+            ):
                 raise StackCollectingException(
                     f"AttributeError: object {obj} (type {type(obj)}) has no attribute '{name}'"
                 ) from None
@@ -1438,47 +1694,115 @@ class PutField(CPLinkedInstruction):
     @classmethod
     def decode(
             cls, data: bytearray, index, class_file
-    ) -> typing.Tuple[typing.Tuple[str, str], int]:
-        d, i = super().decode(data, index, class_file)
-        return (d[2][1][1], d[1][1][1]), i
+    ) -> typing.Tuple[FieldReference, int]:
+        cls_name, name, _ = cls.decode_member_ref(data, index, class_file)
+        return FieldReference(name, cls_name), 3
 
     @classmethod
-    async def invoke(cls, d, stack: AbstractStack):
-        name, target_type = d
+    def invoke(cls, field: FieldReference, stack: AbstractStack):
         value = stack.pop()
         obj = stack.pop()
 
         if obj is None:
-            raise StackCollectingException(f"NullPointerException: obj is null; Cannot set field '{name}' to {value}").add_trace(target_type)
+            raise StackCollectingException(f"NullPointerException: obj is null; Cannot set field '{field.name}' to {value}").add_trace(field.class_name)
+
+        if type(obj) is JavaClassInstance:
+            if obj.class_file is not field.owner:
+                field.bind(obj.class_file)
+
+            if field.index is not None:
+                obj.field_values[field.index] = value
+                return
 
         if not hasattr(obj, "set_field"):
-            setattr(obj, name, value)
+            setattr(obj, field.name, value)
         else:
-            obj.set_field(name, value)
+            obj.set_field(field.name, value)
 
     @classmethod
-    def validate_stack(cls, command_index, name: str, container: AbstractBytecodeContainer, stack: AbstractStack):
+    def validate_stack(cls, command_index, prepared_data: FieldReference, container: AbstractBytecodeContainer, stack: AbstractStack):
         stack.pop()
         stack.pop()
 
 
+class CallSiteCache:
+    """
+    Inline cache of a single invoke instruction, stored as fourth entry in its decoded instruction slot
+
+    Holds the method resolved from the constant pool, and for virtual dispatch the methods resolved per
+    receiver class (up to MAX_RECEIVERS, call sites seeing more classes resolve the rest each time)
+    Outdated when the method epoch of the vm changes, see JavaVM.invalidate_method_caches()
+    """
+
+    __slots__ = ("epoch", "method", "receivers")
+
+    MAX_RECEIVERS = 8
+
+    def __init__(self, epoch: int):
+        self.epoch = epoch
+        self.method = None
+        self.receivers = {}
+
+    @classmethod
+    def get(cls, data: typing.Any, stack: AbstractStack) -> typing.Optional["CallSiteCache"]:
+        """
+        Returns the cache of the instruction currently executed by the stack, creating a new one if there is none
+        or the existing one is outdated
+        Returns None when the instruction is invoked outside its bytecode container
+        """
+
+        if stack.code is None:
+            return
+
+        code = stack.code.decoded_code
+        entry = code[stack.cp]
+
+        if entry is None or entry[1] is not data:
+            return
+
+        epoch = stack.vm.method_epoch
+
+        if len(entry) > 3 and entry[3].epoch == epoch:
+            return entry[3]
+
+        cache = cls(epoch)
+        code[stack.cp] = entry[:3] + (cache,)
+        return cache
+
+    def reset(self, epoch: int):
+        self.epoch = epoch
+        self.method = None
+        self.receivers.clear()
+
+    def add_receiver(self, cls, method):
+        if len(self.receivers) < self.MAX_RECEIVERS:
+            self.receivers[cls] = method
+
+
 @AbstractBytecodeContainer.register_instruction
 class InvokeVirtual(CPLinkedInstruction):
     OPCODES = {0xB6}
 
     @classmethod
     def validate_stack(cls, command_index, prepared_data: typing.Any, container: AbstractBytecodeContainer, stack: AbstractStack):
-        # todo: lookup signature and insert here
-        args = len(tuple(AbstractRuntime.get_arg_parts_of(prepared_data[2][2][1])))
-        [stack.pop() for _ in range(args + 1)]
+        descriptor = jvm.util.MethodDescriptor.get(prepared_data[2][2][1])
+        [stack.pop() for _ in range(descriptor.pop_count + 1)]
         stack.push(None)
 
     @classmethod
     async def invoke(cls, data: typing.Any, stack: AbstractStack):
-        # print(data)
-        method = await stack.vm.get_method_of_nat(
-            data, version=stack.method.class_file.internal_version
-        )
+        cache = CallSiteCache.get(data, stack)
+
+        if cache is None or cache.method is None:
+            method = await stack.vm.get_method_of_nat(
+                data, version=stack.method.class_file.internal_version
+            )
+
+            if cache is not None:
+                cache.method = method
+        else:
+            method = cache.method
+
         args = stack.runtime.parse_args_from_stack(method, stack, False)
 
         obj = args[0]
@@ -1493,24 +1817,32 @@ class InvokeVirtual(CPLinkedInstruction):
 
             else:
                 try:
-                    cls = await obj.get_class()
+                    obj_cls = await obj.get_class()
                 except TypeError:
                     pass
                 else:
-                    method_before = method
+                    target = cache.receivers.get(obj_cls) if cache is not None else None
 
-                    method = await cls.get_method(
-                        method.name if hasattr(method, "name") else method.native_name,
-                        method.signature
-                        if hasattr(method, "signature")
-                        else method.native_signature,
-                    )
+                    if target is None:
+                        method_before = method
 
-                    # dynamic methods need to be skipped here...
-                    # Abstract methods as outer cannot be used, as dynamic is still better than abstract
-                    # todo: add some better indicator here
-                    if hasattr(method, "__name__") and method.__name__ == "dynamic" and (not method_before.access & 0x0400 if hasattr(method_before, "access") else True):
-                        method = method_before
+                        method = await obj_cls.get_method(
+                            method.name if hasattr(method, "name") else method.native_name,
+                            method.signature
+                            if hasattr(method, "signature")
+                            else method.native_signature,
+                        )
+
+                        # dynamic methods need to be skipped here...
+                        # Abstract methods as outer cannot be used, as dynamic is still better than abstract
+                        # todo: add some better indicator here
+                        if hasattr(method, "__name__") and method.__name__ == "dynamic" and (not method_before.access & 0x0400 if hasattr(method_before, "access") else True):
+                            method = method_before
+
+                        if cache is not None:
+                            cache.add_receiver(obj_cls, method)
+                    else:
+                        method = target
 
         stack.push(await stack.runtime.run_method(method, *args, stack=stack))
 
@@ -1521,9 +1853,8 @@ class InvokeSpecial(CPLinkedInstruction):
 
     @classmethod
     def validate_stack(cls, command_index, prepared_data: typing.Any, container: AbstractBytecodeContainer, stack: AbstractStack):
-        arg_types = tuple(AbstractRuntime.get_arg_parts_of(prepared_data[2][2][1]))
-        args = len(arg_types)
-        [stack.pop()] + [stack.pop_expect_type(arg_types[i]) for i in range(args)]
+        arg_types = jvm.util.MethodDescriptor.get(prepared_data[2][2][1]).arg_types
+        [stack.pop()] + [stack.pop_expect_type(arg_type) for arg_type in arg_types]
 
         if prepared_data[2][1][1] not in (
             "<init>",
@@ -1533,9 +1864,7 @@ class InvokeSpecial(CPLinkedInstruction):
 
     @classmethod
     async def invoke(cls, data: typing.Any, stack: AbstractStack):
-        method = await stack.vm.get_method_of_nat(
-            data, version=stack.method.class_file.internal_version
-        )
+        method = await cls.resolve_method(data, stack)
         result = await stack.runtime.run_method(
             method, *stack.runtime.parse_args_from_stack(method, stack, False), stack=stack,
         )
@@ -1546,6 +1875,28 @@ class InvokeSpecial(CPLinkedInstruction):
         ):
             stack.push(result)
 
+    @staticmethod
+    async def resolve_method(data: typing.Any, stack: AbstractStack, cache: "CallSiteCache" = None):
+        """
+        Resolves the statically bound method referenced by the instruction, cached at the call site
+        :param cache: the cache to use instead of the one of the call site
+        """
+
+        if cache is None:
+            cache = CallSiteCache.get(data, stack)
+
+        if cache is not None and cache.method is not None:
+            return cache.method
+
+        method = await stack.vm.get_method_of_nat(
+            data, version=stack.method.class_file.internal_version
+        )
+
+        if cache is not None:
+            cache.method = method
+
+        return method
+
 
 @AbstractBytecodeContainer.register_instruction
 class InvokeStatic(CPLinkedInstruction):
@@ -1553,17 +1904,13 @@ class InvokeStatic(CPLinkedInstruction):
 
     @classmethod
     def validate_stack(cls, command_index, prepared_data: typing.Any, container: AbstractBytecodeContainer, stack: AbstractStack):
-        from jvm.Runtime import Runtime
-
-        args = tuple(Runtime.get_arg_parts_of(prepared_data[2][2][1]))
-        [stack.pop_expect_type(arg) for arg in args]
-        stack.push(prepared_data[2][2][1].split(")")[-1])
+        descriptor = jvm.util.MethodDescriptor.get(prepared_data[2][2][1])
+        [stack.pop_expect_type(arg) for arg in descriptor.arg_parts]
+        stack.push(descriptor.return_type)
 
     @classmethod
     async def invoke(cls, data: typing.Any, stack: AbstractStack):
-        method = await stack.vm.get_method_of_nat(
-            data, version=stack.method.class_file.internal_version
-        )
+        method = await InvokeSpecial.resolve_method(data, stack)
         stack.push(
             await stack.runtime.run_method(
                 method, *stack.runtime.parse_args_from_stack(method, stack, static=True), stack=stack,
@@ -1585,26 +1932,44 @@ class InvokeInterface(CPLinkedInstruction):
     ) -> typing.Tuple[typing.Any, int]:
         return (
             class_file.cp[
-                jvm.util.U2.unpack(data[index: index + 2])[0] - 1
+                jvm.util.U2.unpack_from(data, index)[0] - 1
                 ],
             data[index + 2],
         ), 5
 
     @classmethod
     async def invoke(cls, data: typing.Any, stack: AbstractStack):
-        method = await stack.vm.get_method_of_nat(
-            data[0], version=stack.method.class_file.internal_version
-        )
+        cache = CallSiteCache.get(data, stack)
+
+        if cache is None or cache.method is None:
+            method = await stack.vm.get_method_of_nat(
+                data[0], version=stack.method.class_file.internal_version
+            )
+
+            if cache is not None:
+                cache.method = method
+        else:
+            method = cache.method
+
         args = stack.runtime.parse_args_from_stack(method, stack, False)
         obj = args[0]
 
         try:
-            method = await (await obj.get_class()).get_method(
-                method.name if hasattr(method, "name") else method.native_name,
-                method.signature
-                if hasattr(method, "signature")
-                else method.native_signature,
-            )
+            obj_cls = await obj.get_class()
+            target = cache.receivers.get(obj_cls) if cache is not None else None
+
+            if target is None:
+                target = await obj_cls.get_method(
+                    method.name if hasattr(method, "name") else method.native_name,
+                    method.signature
+                    if hasattr(method, "signature")
+                    else method.native_signature,
+                )
+
+                if cache is not None:
+                    cache.add_receiver(obj_cls, target)
+
+            method = target
 
         except StackCollectingException as e:
             e.add_trace(f"during resolving interface method for parent {method}")
@@ -1658,7 +2023,7 @@ class InvokeDynamic(CPLinkedInstruction):
         cls, data: bytearray, index, class_file
     ) -> typing.Tuple[typing.Any, int]:
         cp = class_file.cp[
-            jvm.util.U2.unpack(data[index: index + 2])[0] - 1
+            jvm.util.U2.unpack_from(data, index)[0] - 1
             ]
         boostrap = class_file.attributes["BootstrapMethods"][0].entries[cp[1]]
 
@@ -1670,7 +2035,7 @@ class InvokeDynamic(CPLinkedInstruction):
         )
 
     @classmethod
-    async def invoke(cls, data: typing.Any, stack: AbstractStack):
+    def invoke(cls, data: typing.Any, stack: AbstractStack):
         if isinstance(data, typing.Awaitable):
             raise StackCollectingException(str(data))
 
@@ -1792,16 +2157,8 @@ class LambdaInvokeDynamic(BaseInstruction):
 
             extra_args = []
 
-            inner_args = len(
-                list(
-                    stack.runtime.get_arg_parts_of(
-                        method.signature
-                        if hasattr(method, "signature")
-                        else method.native_signature
-                    )
-                )
-            )
-            outer_args = len(list(stack.runtime.get_arg_parts_of(outer_signature)))
+            inner_args = jvm.util.get_method_descriptor(method).arg_count
+            outer_args = jvm.util.MethodDescriptor.get(outer_signature).arg_count
 
             # have we args to give from the current runtime?
             if inner_args > outer_args:
@@ -1929,6 +2286,17 @@ class New(CPLinkedInstruction):
         stack.push(await c.create_instance())
 
 
+# The array.array type codes of the primitive array types in the atype operand of newarray
+# (boolean, char, float, double, byte, short, int, long)
+PRIMITIVE_ARRAY_TYPES = {4: "b", 5: "H", 6: "f", 7: "d", 8: "b", 9: "h", 10: "i", 11: "q"}
+
+# One-element arrays of the default value per atype, repeated for allocating new arrays
+PRIMITIVE_ARRAY_ZEROS = {atype: array.ArrayType(typecode, [0]) for atype, typecode in PRIMITIVE_ARRAY_TYPES.items()}
+
+# The atype values of the primitive type descriptors
+DESCRIPTOR_ARRAY_TYPES = {"Z": 4, "C": 5, "F": 6, "D": 7, "B": 8, "S": 9, "I": 10, "J": 11}
+
+
 @AbstractBytecodeContainer.register_instruction
 class NewArray(CPLinkedInstruction):
     OPCODES = {0xBC}
@@ -1946,7 +2314,23 @@ class NewArray(CPLinkedInstruction):
 
     @classmethod
     def invoke(cls, data: typing.Any, stack: AbstractStack):
-        stack.push([None] * stack.pop())
+        stack.push(cls.create(stack.pop(), data))
+
+    @staticmethod
+    def create(size: int, atype: int) -> array.ArrayType:
+        """
+        Creates a zero-filled primitive array of the given size for the type in the atype operand
+        """
+
+        if size < 0:
+            raise StackCollectingException(f"NegativeArraySizeException: {size}")
+
+        return PRIMITIVE_ARRAY_ZEROS[atype] * size
+
+    @classmethod
+    def prepare_python_bytecode_instructions(cls, command_index, prepared_data: typing.Any, container: AbstractBytecodeContainer, builder: PyBytecodeBuilder):
+        builder.add_instruction(PyOpcodes.LOAD_CONST, builder.add_const(prepared_data))
+        builder.add_call(cls.create, 2)
 
 
 @AbstractBytecodeContainer.register_instruction
@@ -1988,6 +2372,11 @@ class ArrayLength(OpcodeInstruction):
         stack.pop()
         stack.push("i")
 
+    @classmethod
+    def prepare_python_bytecode_instructions(cls, command_index, prepared_data: typing.Any,
+                                             container: AbstractBytecodeContainer, builder: PyBytecodeBuilder):
+        builder.add_call(len, 1)
+
 
 @AbstractBytecodeContainer.register_instruction
 class AThrow(OpcodeInstruction):
@@ -2000,8 +2389,13 @@ class AThrow(OpcodeInstruction):
     OPCODES = {0xBF}
 
     @classmethod
-    def invoke(cls, data: typing.Any, stack: AbstractStack):
+    async def invoke(cls, data: typing.Any, stack: AbstractStack):
         exception = stack.pop()
+
+        # Caught in the same method, so no need to raise
+        if exception is not None and stack.code is not None and await stack.jump_to_exception_handler(exception):
+            return True
+
         stack.stack.clear()
         stack.push(exception)
         raise StackCollectingException("User raised exception: "+str(exception), base=exception).add_trace(exception)
@@ -2043,23 +2437,50 @@ class InstanceOf(CPLinkedInstruction):
 
 @AbstractBytecodeContainer.register_instruction
 class MultiANewArray(OpcodeInstruction):
+    """
+    Creates a multidimensional array of the given class, with the sizes of the first dimensions on the stack
+    (outermost first)
+    Dimensions without size are left as null entries, primitive innermost arrays are typed (see NewArray)
+    """
+
     OPCODES = {0xC5}
 
     @classmethod
     def decode(
         cls, data: bytearray, index, class_file
     ) -> typing.Tuple[typing.Any, int]:
-        return (data[index:index+2], data[index+2]), 4
+        pointer = jvm.util.U2.unpack_from(data, index)[0] - 1
+        return (class_file.cp[pointer][1][1], data[index+2]), 4
 
     @classmethod
     def invoke(cls, data: typing.Any, stack: AbstractStack):
-        dimensions = [stack.pop() for _ in range(data[1])]
-        data = [None] * dimensions.pop(0)
+        sizes = [stack.pop() for _ in range(data[1])]
+        sizes.reverse()
+        stack.push(cls.create(data[0], *sizes))
 
-        for e in dimensions:
-            data = [copy.deepcopy(data) for _ in range(e)]
+    @staticmethod
+    def create(class_name: str, *sizes: int):
+        """
+        Allocates the array of the given array class name (e.g. "[[[I") with the given dimension sizes, outermost first
+        """
 
-        stack.push(data)
+        for size in sizes:
+            if size < 0:
+                raise StackCollectingException(f"NegativeArraySizeException: {size}")
+
+        # The innermost allocated arrays hold primitive values only when all dimensions are given
+        component_type = class_name[len(sizes):]
+        zero = PRIMITIVE_ARRAY_ZEROS[DESCRIPTOR_ARRAY_TYPES[component_type]] if component_type in DESCRIPTOR_ARRAY_TYPES else None
+
+        def allocate(depth: int):
+            size = sizes[depth]
+
+            if depth == len(sizes) - 1:
+                return zero * size if zero is not None else [None] * size
+
+            return [allocate(depth + 1) for _ in range(size)]
+
+        return allocate(0)
 
     @classmethod
     def validate_stack(cls, command_index, prepared_data: typing.Any, container: AbstractBytecodeContainer, stack: AbstractStack):
@@ -2067,6 +2488,10 @@ class MultiANewArray(OpcodeInstruction):
             stack.pop_expect_type("i", "j")
         stack.push(None)
 
+    @classmethod
+    def prepare_python_bytecode_instructions(cls, command_index, prepared_data: typing.Any, container: AbstractBytecodeContainer, builder: PyBytecodeBuilder):
+        builder.add_call(functools.partial(cls.create, prepared_data[0]), prepared_data[1])
+
 
 @AbstractBytecodeContainer.register_instruction
 class IfNull(SingleCompare):
@@ -2078,6 +2503,13 @@ class IfNull(SingleCompare):
             stack.cp += data
             return True
 
+    @classmethod
+    def prepare_python_bytecode_instructions(cls, command_index, prepared_data: int,
+                                             container: AbstractBytecodeContainer, builder: PyBytecodeBuilder):
+        builder.add_instruction(PyOpcodes.LOAD_CONST, builder.add_const(None))
+        builder.add_instruction(PyOpcodes.IS_OP, 0)
+        builder.add_instruction(PyOpcodes.POP_JUMP_IF_TRUE, builder.real_from_offset(prepared_data))
+
 
 @AbstractBytecodeContainer.register_instruction
 class IfNonNull(SingleCompare):
@@ -2089,6 +2521,13 @@ class IfNonNull(SingleCompare):
             stack.cp += data
             return True
 
+    @classmethod
+    def prepare_python_bytecode_instructions(cls, command_index, prepared_data: int,
+                                             container: AbstractBytecodeContainer, builder: PyBytecodeBuilder):
+        builder.add_instruction(PyOpcodes.LOAD_CONST, builder.add_const(None))
+        builder.add_instruction(PyOpcodes.IS_OP, 1)
+        builder.add_instruction(PyOpcodes.POP_JUMP_IF_TRUE, builder.real_from_offset(prepared_data))
+
 
 @AbstractBytecodeContainer.register_instruction
 class Mul(OpcodeInstruction):
@@ -2104,6 +2543,11 @@ class Mul(OpcodeInstruction):
         stack.pop_expect_type(t)
         stack.push(t)
 
+    @classmethod
+    def prepare_python_bytecode_instructions(cls, command_index, prepared_data: typing.Any,
+                                             container: AbstractBytecodeContainer, builder: PyBytecodeBuilder):
+        builder.add_instruction(PyOpcodes.BINARY_MULTIPLY)
+
 
 @AbstractBytecodeContainer.register_instruction
 class NEG(OpcodeInstruction):
@@ -2118,6 +2562,11 @@ class NEG(OpcodeInstruction):
         t = stack.pop()
         stack.push(t)
 
+    @classmethod
+    def prepare_python_bytecode_instructions(cls, command_index, prepared_data: typing.Any,
+                                             container: AbstractBytecodeContainer, builder: PyBytecodeBuilder):
+        builder.add_instruction(PyOpcodes.UNARY_NEGATIVE)
+
 
 @AbstractBytecodeContainer.register_instruction
 class TableSwitch(OpcodeInstruction):
@@ -2238,11 +2687,17 @@ class LookupSwitch(OpcodeInstruction):
         StackCollectingException(StackUnderflowException): when no key is on the stack
         <some error during wrong offsets>
 
-    todo: somehow, this does not 100% work...
+    Decoded data: (default offset, key -> offset dict, lowest key, dense table or None, string switch or None)
+        The dense table holds the offsets of all keys from the lowest one to the highest one (see DENSE_TABLE_FILL),
+        filled up with the default offset
+        The string switch replaces the javac string switch idiom, see optimiser_iteration()
     """
 
     OPCODES = {0xAB}
 
+    # The minimum share of keys in the range between the lowest and highest key for using a dense table
+    DENSE_TABLE_FILL = 0.5
+
     @classmethod
     def decode(
         cls, data: bytearray, index, class_file
@@ -2254,17 +2709,13 @@ class LookupSwitch(OpcodeInstruction):
             index += 1
 
         # the static HEAD
-        default = jvm.util.pop_u4_s(data[index:])
-        index += 4
-        npairs = jvm.util.pop_u4_s(data[index:])
-        index += 4
+        default, npairs = jvm.util.U4_S.unpack_from(data, index)[0], jvm.util.U4_S.unpack_from(data, index + 4)[0]
+        index += 8
 
         # And now, the key-value pairs
         try:
             pairs = {
-                jvm.util.pop_u4_s(
-                    data[index + i * 8:]
-                ): jvm.util.pop_u4_s(data[index + i * 8 + 4:])
+                jvm.util.U4_S.unpack_from(data, index + i * 8)[0]: jvm.util.U4_S.unpack_from(data, index + i * 8 + 4)[0]
                 for i in range(npairs)
             }
             index += npairs * 8
@@ -2273,20 +2724,119 @@ class LookupSwitch(OpcodeInstruction):
                 f"during decoding lookupswitch of {npairs} entries, defaulting to {default}"
             )
 
-        return (default, pairs), index - before + 1
+        return cls.create_data(default, pairs), index - before + 1
+
+    @classmethod
+    def create_data(cls, default: int, pairs: typing.Dict[int, int], string_switch=None) -> tuple:
+        if pairs and len(pairs) >= (max(pairs) - min(pairs) + 1) * cls.DENSE_TABLE_FILL:
+            low = min(pairs)
+            table = array.ArrayType("l", [pairs.get(key, default) for key in range(low, max(pairs) + 1)])
+            return default, pairs, low, table, string_switch
+
+        return default, pairs, 0, None, string_switch
 
     @classmethod
     def invoke(cls, data: typing.Any, stack: AbstractStack) -> bool:
         key = stack.pop()
 
-        # todo: do some clever checks here...
-        if key not in data[1]:
-            stack.cp += data[0]
+        if data[4] is not None:
+            value = stack.local_vars[data[4][0]]
+
+            if type(value) is str:
+                stack.cp += data[4][1].get(value, data[0])
+                return True
+
+        if data[3] is not None:
+            index = key - data[2]
+            stack.cp += data[3][index] if 0 <= index < len(data[3]) else data[0]
         else:
-            stack.cp += data[1][key]
+            stack.cp += data[1].get(key, data[0])
 
         return True
 
+    @classmethod
+    async def optimiser_iteration(
+        cls,
+        container: AbstractBytecodeContainer,
+        prepared_data: typing.Any,
+        instruction_index: int,
+    ):
+        """
+        Recognises the string switch compiled by javac:
+
+            aload <tmp>; invokevirtual String.hashCode(); lookupswitch {hash: block...}
+            block: aload <tmp>; ldc "case"; invokevirtual String.equals(); ifeq <next block with same hash or default>
+                   <case code>
+
+        and adds a string switch jumping directly to the case code of the string in <tmp>
+        """
+
+        if prepared_data[4] is not None:
+            return
+
+        heads = [i for i in range(max(0, instruction_index - 5), instruction_index) if container.decoded_code[i] is not None]
+        if len(heads) < 2:
+            return
+
+        load, hash_code = container.decoded_code[heads[-2]], container.decoded_code[heads[-1]]
+        if not issubclass(load[0], LOAD_INSTRUCTIONS) or not cls.is_string_method(hash_code, InvokeVirtual, "hashCode", "()I"):
+            return
+
+        local = get_local_variable_index(load)
+        default = instruction_index + prepared_data[0]
+        cases = {}
+
+        for offset in prepared_data[1].values():
+            index = instruction_index + offset
+
+            # blocks of strings with the same hash are chained via the ifeq
+            while index != default:
+                case = await cls.match_equals_block(container, index, local)
+                if case is None or case[0] in cases:
+                    return
+
+                cases[case[0]] = case[1] - instruction_index
+                index = case[2]
+
+        return cls.create_data(prepared_data[0], prepared_data[1], (local, cases))
+
+    @classmethod
+    async def match_equals_block(cls, container: AbstractBytecodeContainer, index: int, local: int) -> typing.Optional[typing.Tuple[str, int, int]]:
+        """
+        Matches "aload <local>; ldc <string>; invokevirtual String.equals(); ifeq <target>" at the index
+        Returns the string, the index of the following instruction and the ifeq target
+        """
+
+        entries = []
+        while len(entries) < 4:
+            if index >= len(container.decoded_code) or container.decoded_code[index] is None:
+                return
+
+            entries.append((index, container.decoded_code[index]))
+            index += container.decoded_code[index][2]
+
+        (_, load), (_, ldc), (_, equals), (if_index, if_eq) = entries
+
+        if not issubclass(load[0], LOAD_INSTRUCTIONS) or get_local_variable_index(load) != local:
+            return
+
+        if not issubclass(ldc[0], LDC) or not cls.is_string_method(equals, InvokeVirtual, "equals", "(Ljava/lang/Object;)Z") or if_eq[0] is not IfEq0:
+            return
+
+        constant = container.method.class_file.cp[ldc[1] - 1]
+        if constant[0] != 8:
+            return
+
+        return await jvm.util.decode_cp_constant(constant), index, if_index + if_eq[1]
+
+    @staticmethod
+    def is_string_method(entry, instruction: typing.Type[BaseInstruction], name: str, signature: str) -> bool:
+        if entry[0] is not instruction:
+            return False
+
+        method = entry[1]
+        return method[1][1][1] == "java/lang/String" and method[2][1][1] == name and method[2][2][1] == signature
+
     @classmethod
     def code_reference_changer(
         cls,
@@ -2296,14 +2846,26 @@ class LookupSwitch(OpcodeInstruction):
         old_index: int,
         checker: typing.Callable[[int], int],
     ):
-        default, pairs = prepared_data
-        return checker(default + old_index) - instruction_index, {e[0]: checker(e[1] + old_index) - instruction_index for e in pairs.items()}
+        default, pairs, _, _, string_switch = prepared_data
+
+        if string_switch is not None:
+            string_switch = string_switch[0], {key: checker(offset + old_index) - instruction_index for key, offset in string_switch[1].items()}
+
+        return cls.create_data(
+            checker(default + old_index) - instruction_index,
+            {key: checker(offset + old_index) - instruction_index for key, offset in pairs.items()},
+            string_switch,
+        )
 
     @classmethod
     def validate(cls, command_index, prepared_data: typing.Any, container: AbstractBytecodeContainer):
         for offset in prepared_data[1].values():
             CompareHelper.validate(command_index, offset, container)
 
+        if prepared_data[4] is not None:
+            for offset in prepared_data[4][1].values():
+                CompareHelper.validate(command_index, offset, container)
+
         CompareHelper.validate(command_index, prepared_data[0], container)
 
     @classmethod
@@ -2313,5 +2875,222 @@ class LookupSwitch(OpcodeInstruction):
         for offset in prepared_data[1].values():
             stack.branch(offset)
 
+        if prepared_data[4] is not None:
+            for offset in prepared_data[4][1].values():
+                stack.branch(offset)
+
         # the default offset goes here...
-        stack.cp += prepared_data[0]
\ No newline at end of file
+        stack.cp += prepared_data[0]
+
+
+LOAD_INSTRUCTIONS = (Load, Load0, Load1, Load2, Load3)
+STORE_INSTRUCTIONS = (Store, Store0, Store1, Store2, Store3)
+LOCAL_VARIABLE_INDICES = {
+    Load0: 0, Load1: 1, Load2: 2, Load3: 3,
+    Store0: 0, Store1: 1, Store2: 2, Store3: 3,
+}
+
+# The comparators of the compare instructions (see CompareHelper.COMPARATOR) as functions
+COMPARATOR_FUNCTIONS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+def get_local_variable_index(entry: typing.Tuple[typing.Type[BaseInstruction], typing.Any, int]) -> int:
+    """
+    Returns the local variable index accessed by a Load* or Store* instruction entry
+    """
+
+    if entry[0] is Load or entry[0] is Store:
+        return entry[1]
+
+    return LOCAL_VARIABLE_INDICES[entry[0]]
+
+
+def get_fused_instructions(container: AbstractBytecodeContainer, indices: typing.List[int]) -> tuple:
+    """
+    The first data entry of a superinstruction fused from the instructions at the given indices:
+    the entry of the first instruction (replaced by the superinstruction) and the offsets of the others
+    """
+
+    return container.decoded_code[indices[0]], tuple(index - indices[0] for index in indices[1:])
+
+
+@AbstractBytecodeContainer.register_instruction
+class LoadGetField(Superinstruction):
+    """
+    <load>; getfield
+    Mostly aload_0; getfield, reading a field of "this"
+    """
+
+    PATTERN = (LOAD_INSTRUCTIONS, GetField)
+
+    @classmethod
+    def fuse(cls, container: AbstractBytecodeContainer, indices: typing.List[int]) -> typing.Optional[tuple]:
+        load, get_field = (container.decoded_code[index] for index in indices)
+        return get_fused_instructions(container, indices), get_local_variable_index(load), get_field[1]
+
+    @classmethod
+    def invoke(cls, data: tuple, stack: AbstractStack):
+        obj = stack.local_vars[data[1]]
+        field = data[2]
+
+        if type(obj) is JavaClassInstance:
+            if obj.class_file is not field.owner:
+                field.bind(obj.class_file)
+
+            if field.index is not None:
+                stack.push(obj.field_values[field.index])
+                return
+
+        stack.push(obj)
+        GetField.invoke(field, stack)
+
+
+@AbstractBytecodeContainer.register_instruction
+class LoadLoadAddStore(Superinstruction):
+    """
+    <load>; <load>; <add>; <store>
+    """
+
+    PATTERN = (LOAD_INSTRUCTIONS, LOAD_INSTRUCTIONS, ADD, STORE_INSTRUCTIONS)
+
+    @classmethod
+    def fuse(cls, container: AbstractBytecodeContainer, indices: typing.List[int]) -> typing.Optional[tuple]:
+        a, b, _, target = (container.decoded_code[index] for index in indices)
+        return get_fused_instructions(container, indices), get_local_variable_index(a), get_local_variable_index(b), get_local_variable_index(target)
+
+    @classmethod
+    def invoke(cls, data: tuple, stack: AbstractStack):
+        local_vars = stack.local_vars
+        local_vars[data[3]] = local_vars[data[1]] + local_vars[data[2]]
+
+
+@AbstractBytecodeContainer.register_instruction
+class LoadCompareBranch(BranchingSuperinstruction):
+    """
+    <load>; if<cond> (comparing against 0)
+    """
+
+    PATTERN = (LOAD_INSTRUCTIONS, SingleCompare)
+
+    @classmethod
+    def fuse(cls, container: AbstractBytecodeContainer, indices: typing.List[int]) -> typing.Optional[tuple]:
+        load, compare = (container.decoded_code[index] for index in indices)
+
+        if compare[0].COMPARATOR not in COMPARATOR_FUNCTIONS:
+            return
+
+        return (
+            get_fused_instructions(container, indices),
+            get_local_variable_index(load),
+            COMPARATOR_FUNCTIONS[compare[0].COMPARATOR],
+            indices[1] + compare[1] - indices[0],
+        )
+
+    @classmethod
+    def invoke(cls, data: tuple, stack: AbstractStack) -> bool:
+        if data[2](stack.local_vars[data[1]], 0):
+            stack.cp += data[3]
+            return True
+
+
+@AbstractBytecodeContainer.register_instruction
+class LoadLoadCompareBranch(BranchingSuperinstruction):
+    """
+    <load>; <load>; if_<type>cmp<cond>
+    """
+
+    PATTERN = (LOAD_INSTRUCTIONS, LOAD_INSTRUCTIONS, DoubleCompare)
+
+    @classmethod
+    def fuse(cls, container: AbstractBytecodeContainer, indices: typing.List[int]) -> typing.Optional[tuple]:
+        a, b, compare = (container.decoded_code[index] for index in indices)
+
+        if compare[0].COMPARATOR not in COMPARATOR_FUNCTIONS:
+            return
+
+        return (
+            get_fused_instructions(container, indices),
+            get_local_variable_index(a),
+            get_local_variable_index(b),
+            COMPARATOR_FUNCTIONS[compare[0].COMPARATOR],
+            indices[2] + compare[1] - indices[0],
+        )
+
+    @classmethod
+    def invoke(cls, data: tuple, stack: AbstractStack) -> bool:
+        local_vars = stack.local_vars
+
+        if data[3](local_vars[data[1]], local_vars[data[2]]):
+            stack.cp += data[4]
+            return True
+
+
+@AbstractBytecodeContainer.register_instruction
+class CompareBranch(BranchingSuperinstruction):
+    """
+    <type>cmp<op>; if<cond>
+    """
+
+    PATTERN = (CompareTwo, SingleCompare)
+
+    @classmethod
+    def fuse(cls, container: AbstractBytecodeContainer, indices: typing.List[int]) -> typing.Optional[tuple]:
+        _, compare = (container.decoded_code[index] for index in indices)
+
+        if compare[0].COMPARATOR not in COMPARATOR_FUNCTIONS:
+            return
+
+        return (
+            get_fused_instructions(container, indices),
+            COMPARATOR_FUNCTIONS[compare[0].COMPARATOR],
+            indices[1] + compare[1] - indices[0],
+        )
+
+    @classmethod
+    def invoke(cls, data: tuple, stack: AbstractStack) -> bool:
+        b, a = stack.pop(), stack.pop()
+
+        # Same result as CompareTwo, so NaN compares as less
+        if data[1](0 if a == b else (1 if a > b else -1), 0):
+            stack.cp += data[2]
+            return True
+
+
+@AbstractBytecodeContainer.register_instruction
+class NewDupInit(Superinstruction):
+    """
+    new; dup; invokespecial <init>()V
+    Creating an object with the no-args constructor
+    """
+
+    PATTERN = (New, DUP, InvokeSpecial)
+
+    @classmethod
+    def fuse(cls, container: AbstractBytecodeContainer, indices: typing.List[int]) -> typing.Optional[tuple]:
+        new, _, init = (container.decoded_code[index] for index in indices)
+
+        if init[1][2][1][1] != "<init>" or init[1][2][2][1] != "()V":
+            return
+
+        return get_fused_instructions(container, indices), new[1], init[1], CallSiteCache(-1)
+
+    @classmethod
+    async def invoke(cls, data: tuple, stack: AbstractStack):
+        await New.invoke(data[1], stack)
+
+        cache = data[3]
+        if cache.epoch != stack.vm.method_epoch:
+            cache.reset(stack.vm.method_epoch)
+
+        method = await InvokeSpecial.resolve_method(data[2], stack, cache)
+        stack.push(stack.seek())
+        await stack.runtime.run_method(
+            method, *stack.runtime.parse_args_from_stack(method, stack, False), stack=stack,
+        )
@@ -16,6 +16,7 @@ This project is not official by mojang and does not relate to it.
 # Mainly independent from mcpython's source
 # See Runtime.py for a system for executing the bytecode
 # See builtin folder for python implementations for java internals
+import collections.abc
 import traceback
 import typing
 import weakref
@@ -23,18 +24,18 @@ import weakref
 from jvm.api import AbstractJavaClass
 from jvm.api import AbstractJavaClassInstance
 from jvm.api import AbstractMethod
+from jvm.ConstantPool import ConstantPool
+from jvm.DecodedClassFile import DecodedClassFile
+from jvm.DecodedClassFile import DecodedMember
 from jvm.natives import NativeMethod
 from jvm.JavaAttributes import JavaAttributeTable
 from jvm.logging import info
+from jvm.util import ClassFileReader
 from jvm.util import DOUBLE
 from jvm.util import FLOAT
 from jvm.util import INT
 from jvm.util import LONG
-from jvm.util import pop_sized
-from jvm.util import pop_struct
-from jvm.util import pop_u1
-from jvm.util import pop_u2
-from jvm.util import pop_u4
+from jvm.util import MethodDescriptor
 from jvm.util import U2
 from jvm.util import U4
 import jvm.api
@@ -71,6 +72,9 @@ class ArrayBase(jvm.api.AbstractJavaClass):
     def inject_method(self, name: str, signature: str, method, force=True):
         self.methods[(name, signature)] = method
 
+        if self.vm is not None:
+            self.vm.invalidate_method_caches()
+
     def is_subclass_of(self, class_name: str) -> bool:
         return False
 
@@ -78,7 +82,8 @@ class ArrayBase(jvm.api.AbstractJavaClass):
         return []
 
     def clone(self, method, stack, instance):
-        return instance.copy() if instance is not None else instance
+        # slicing copies lists and primitive arrays (array.array) alike
+        return instance[:] if instance is not None else instance
 
 
 class JavaArrayManager:
@@ -100,6 +105,7 @@ class JavaArrayManager:
         )
 
         instance = ArrayBase(depth, class_text, cls)
+        instance.vm = self.vm
 
         self.vm.shared_classes[class_text] = instance
         return instance
@@ -115,12 +121,12 @@ class JavaField:
         self.access = 0
         self.attributes = JavaAttributeTable(self)
 
-    async def from_data(self, class_file: "JavaBytecodeClass", data: bytearray):
+    async def from_decoded(self, class_file: "JavaBytecodeClass", decoded: DecodedMember):
         self.class_file = weakref.proxy(class_file)
-        self.access = pop_u2(data)
-        self.name = class_file.cp[pop_u2(data) - 1][1]
-        self.descriptor = class_file.cp[pop_u2(data) - 1][1]
-        await self.attributes.from_data(class_file, data)
+        self.access = decoded.access
+        self.name = decoded.name
+        self.descriptor = decoded.descriptor
+        await self.attributes.from_raw(class_file, decoded.attributes)
 
     def __repr__(self):
         return f"JavaField(name='{self.name}',descriptor='{self.descriptor}',access='{bin(self.access)}',class='{self.class_file.name}')"
@@ -157,12 +163,13 @@ class JavaMethod(AbstractMethod):
         self.code_repr = BytecodeRepr(code)
         await self.code_repr.optimiser_iteration()
 
-    async def from_data(self, class_file: "JavaBytecodeClass", data: bytearray):
+    async def from_decoded(self, class_file: "JavaBytecodeClass", decoded: DecodedMember):
         self.class_file = weakref.proxy(class_file)
-        self.access = pop_u2(data)
-        self.name = class_file.cp[pop_u2(data) - 1][1]
-        self.signature = class_file.cp[pop_u2(data) - 1][1]
-        await self.attributes.from_data(class_file, data)
+        self.access = decoded.access
+        self.name = decoded.name
+        self.signature = decoded.descriptor
+        self.method_descriptor = MethodDescriptor.get(self.signature)
+        await self.attributes.from_raw(class_file, decoded.attributes)
 
     def __repr__(self):
         return f"JavaMethod(name='{self.name}',signature='{self.signature}',access='{bin(self.access)}',class='{self.class_file.name}')"
@@ -170,7 +177,7 @@ class JavaMethod(AbstractMethod):
     async def invoke(self, args, stack=None):
         import jvm.Runtime
 
-        runtime = jvm.Runtime.Runtime()
+        runtime = stack.runtime if stack is not None and stack.runtime is not None else jvm.Runtime.Runtime.get_current()
         return await runtime.run_method(self, *args, stack=stack)
 
     def get_parent_class(self):
@@ -202,26 +209,18 @@ class JavaMethod(AbstractMethod):
             self.code_repr.print_stats(current=current)
 
 
-def makeStatic(obj):
-    if isinstance(obj, list):
-        return tuple(makeStatic(e) for e in obj)
-    elif isinstance(obj, dict):
-        return {key: makeStatic(value) for key, value in obj.items()}
-    return obj
-
-
 class JavaBytecodeClass(AbstractJavaClass):
     def __init__(self):
         super().__init__()
         self.class_file_version = -1, -1
 
-        self.cp: typing.List[typing.Any] = []
+        self.cp = ConstantPool()
         self.access = 0
         self.methods = {}
         self.fields = {}
 
         self.dynamic_field_keys = set()
-        self.static_field_values = {}
+        self.static_field_cells: typing.Dict[str, StaticFieldCell] = {}
         self.attributes = JavaAttributeTable(self)
 
         self.on_bake = []
@@ -229,79 +228,40 @@ class JavaBytecodeClass(AbstractJavaClass):
 
         self.class_init_complete = False
 
+        # Memoized lookups through the class hierarchy, dropped when the method epoch of the vm changes
+        # (see JavaVM.invalidate_method_caches())
+        self.resolution_epoch = -1
+        self.resolved_methods: typing.Dict[typing.Tuple[str, str], AbstractMethod] = {}
+        self.static_attribute_owners: typing.Dict[str, AbstractJavaClass] = {}
+        self.resolved_dynamic_field_keys: typing.Optional[typing.Set[str]] = None
+
+        # Field name -> slot index in JavaClassInstance.field_values, see get_field_layout()
+        self.field_layout: typing.Optional[typing.Dict[str, int]] = None
+
     # todo: add to that object a marker!
     async def on_annotate(self, obj, args):
         pass
 
-    async def from_bytes(self, data: bytearray):
-        magic = pop_u4(data)
-        assert magic == 0xCAFEBABE, f"magic {magic} is invalid!"
+    async def from_bytes(self, data: typing.Union[bytes, bytearray, memoryview, ClassFileReader]):
+        await self.from_decoded(DecodedClassFile.from_bytes(data))
 
-        minor, major = pop_u2(data), pop_u2(data)
-        self.class_file_version = major, minor
+    async def from_decoded(self, decoded: DecodedClassFile):
+        """
+        Creates the class structure from the vm-independent decoded form
+        See JavaVM.pre_decode_classes() for decoding it ahead of time in other processes
+        """
+
+        major, minor = self.class_file_version = decoded.version
 
         info(
             f"class file version: {major}.{minor} (Java {major-44 if major > 45 else '1.0.2 or 1.1'}"
             f"{' preview features enabled' if major > 56 and minor == 65535 else ''})"
         )
 
-        cp_size = pop_u2(data) - 1
-        self.cp += [None] * cp_size
-        i = 0
-        while i < cp_size:
-            j = i
-            i += 1
-
-            tag = pop_u1(data)
-
-            match tag:
-                case 7 | 8 | 16 | 19 | 20:
-                    d = tag, pop_u2(data)
-                case 9 | 10 | 11 | 12 | 17 | 18:
-                    d = tag, pop_u2(data), pop_u2(data)
-                case 3:
-                    d = tag, pop_struct(INT, data)[0]
-                case 4:
-                    d = tag, pop_struct(FLOAT, data)[0]
-                case 5:
-                    d = tag, pop_struct(LONG, data)[0]
-                    i += 1
-                case 6:
-                    d = tag, pop_struct(DOUBLE, data)[0]
-                    i += 1
-                case 1:
-                    size = pop_u2(data)
-                    e = pop_sized(size, data)
-                    d = tag, e.decode("utf-8", errors="ignore")
-                case 15:
-                    d = tag, pop_u1(data), pop_u2(data)
-                case _:
-                    raise ValueError(tag)
-
-            self.cp[j] = list(d)
-
-        for i, e in enumerate(self.cp):
-            if e is None:
-                continue
-
-            tag = e[0]
-
-            if tag in (7, 9, 10, 11, 8, 12, 16, 19, 20):
-                e = e[1:]
-                self.cp[i].clear()
-                try:
-                    self.cp[i] += [tag] + [self.cp[x - 1] for x in e]
-                except TypeError:
-                    print(tag, e, self.cp)
-                    raise
-
-            elif tag in (15, 17, 18):
-                self.cp[i] = self.cp[i][:2] + [self.cp[self.cp[i][-1] - 1]]
-
-        self.cp = [makeStatic(e) for e in self.cp]
+        self.cp = decoded.cp
 
         # As by https://docs.oracle.com/javase/specs/jvms/se16/html/jvms-4.html#jvms-4.1-200-E.1
-        self.access |= pop_u2(data)
+        self.access |= decoded.access
         self.is_public = bool(self.access & 0x0001)
         self.is_final = bool(self.access & 0x0010)
         self.is_special_super = bool(self.access & 0x0020)
@@ -312,23 +272,21 @@ class JavaBytecodeClass(AbstractJavaClass):
         self.is_enum = bool(self.access & 0x4000)
         self.is_module = bool(self.access & 0x8000)
 
-        self.name: str = self.cp[pop_u2(data) - 1][1][1]
+        self.name: str = decoded.name
         self.parent: typing.Callable[
             [], typing.Coroutine[typing.Optional[AbstractJavaClass]]
         ] = await self.vm.get_lazy_class(
-            self.cp[pop_u2(data) - 1][1][1], version=self.internal_version
-        )
+            decoded.parent, version=self.internal_version
+        ) if decoded.parent is not None else None
 
         self.interfaces += [
-            await self.vm.get_lazy_class(
-                self.cp[pop_u2(data) - 1][1][1], version=self.internal_version
-            )
-            for _ in range(pop_u2(data))
+            await self.vm.get_lazy_class(interface, version=self.internal_version)
+            for interface in decoded.interfaces
         ]
 
-        for _ in range(pop_u2(data)):
+        for decoded_field in decoded.fields:
             field = JavaField()
-            await field.from_data(self, data)
+            await field.from_decoded(self, decoded_field)
 
             if field.access & 0x4000:
                 self.enum_fields.append(field.name)
@@ -336,23 +294,45 @@ class JavaBytecodeClass(AbstractJavaClass):
             self.fields[field.name] = field
 
             if field.access & 0x0008:
-                self.static_field_values[field.name] = None
+                self.static_field_cells[field.name] = StaticFieldCell()
             else:
                 self.dynamic_field_keys.add(field.name)
 
-        for _ in range(pop_u2(data)):
+        for decoded_method in decoded.methods:
             method = JavaMethod()
-            await method.from_data(self, data)
+            await method.from_decoded(self, decoded_method)
 
             self.methods[(method.name, method.signature)] = method
 
-        await self.attributes.from_data(self, data)
+        await self.attributes.from_raw(self, decoded.attributes)
+
+    def check_resolution_epoch(self):
+        """
+        Drops the memoized lookups when they may be outdated
+        """
+
+        if self.resolution_epoch != self.vm.method_epoch:
+            self.resolution_epoch = self.vm.method_epoch
+            self.resolved_methods.clear()
+            self.static_attribute_owners.clear()
+            self.resolved_dynamic_field_keys = None
 
     async def get_method(self, name: str, signature: str, inner=False) -> JavaMethod:
         des = (name, signature)
         if des in self.methods:
             return self.methods[des]
 
+        self.check_resolution_epoch()
+
+        if des in self.resolved_methods:
+            return self.resolved_methods[des]
+
+        method = self.resolved_methods[des] = await self.resolve_inherited_method(name, signature)
+        return method
+
+    async def resolve_inherited_method(self, name: str, signature: str) -> AbstractMethod:
+        des = (name, signature)
+
         if self.parent is not None:
             parent = await self.parent()
             if isinstance(parent, typing.Awaitable):
@@ -379,29 +359,63 @@ class JavaBytecodeClass(AbstractJavaClass):
             f"class {self.name} has not method {name} with signature {signature}"
         )
 
+    @property
+    def static_field_values(self) -> "StaticFieldValues":
+        return StaticFieldValues(self)
+
     async def get_static_attribute(self, name: str, expected_type=None):
-        if name not in self.static_field_values:
-            if self.parent is not None:
-                parent = await self.parent()
-                if isinstance(parent, typing.Awaitable):
-                    parent = await parent
+        if name in self.static_field_cells:
+            return self.static_field_cells[name].value
 
-                try:
-                    return await parent.get_static_attribute(name)
-                except KeyError:
-                    pass
+        self.check_resolution_epoch()
+
+        if name in self.static_attribute_owners:
+            return await self.static_attribute_owners[name].get_static_attribute(name)
+
+        if self.parent is not None:
+            parent = await self.parent()
+            if isinstance(parent, typing.Awaitable):
+                parent = await parent
+
+            try:
+                value = await parent.get_static_attribute(name)
+            except KeyError:
+                pass
+            else:
+                self.static_attribute_owners[name] = parent
+                return value
 
             # interfaces do not provide fields, don't they?
 
-        try:
-            return self.static_field_values[name]
-        except KeyError:
-            raise StackCollectingException(
-                f"class {self.name} has no attribute '{name}' (class instance: {self})"
-            ) from None
+        raise StackCollectingException(
+            f"class {self.name} has no attribute '{name}' (class instance: {self})"
+        )
+
+    async def get_static_field_cell(self, name: str) -> typing.Optional["StaticFieldCell"]:
+        """
+        Returns the storage cell of a static attribute, looked up through the bytecode parent classes,
+        or None when no bytecode class declares it
+        Non-bytecode classes are not asked, as natives create missing attributes on lookup
+        """
+
+        if name in self.static_field_cells:
+            return self.static_field_cells[name]
+
+        if self.parent is not None:
+            parent = await self.parent()
+            if isinstance(parent, typing.Awaitable):
+                parent = await parent
+
+            if isinstance(parent, JavaBytecodeClass):
+                return await parent.get_static_field_cell(name)
 
     def set_static_attribute(self, name: str, value, descriptor=None):
-        self.static_field_values[name] = value
+        if name in self.static_field_cells:
+            self.static_field_cells[name].value = value
+        else:
+            # Shadows the attribute of a parent class, which subclasses may have memoized
+            self.vm.invalidate_method_caches()
+            self.static_field_cells[name] = StaticFieldCell(value)
 
     async def bake(self):
         """
@@ -471,11 +485,44 @@ class JavaBytecodeClass(AbstractJavaClass):
         return f"JavaBytecodeClass@{hex(id(self))[2:]}({self.name},access={bin(self.access)},parent=...,interfaces=...)"
 
     async def get_dynamic_field_keys(self):
-        parent = await self.parent()
-        if isinstance(parent, typing.Awaitable):
-            parent = await parent
+        self.check_resolution_epoch()
+
+        if self.resolved_dynamic_field_keys is None:
+            parent = await self.parent()
+            if isinstance(parent, typing.Awaitable):
+                parent = await parent
 
-        return self.dynamic_field_keys | await parent.get_dynamic_field_keys()
+            self.resolved_dynamic_field_keys = self.dynamic_field_keys | await parent.get_dynamic_field_keys()
+
+        return self.resolved_dynamic_field_keys
+
+    async def get_field_layout(self) -> typing.Dict[str, int]:
+        """
+        Returns the slot index of each dynamic field of instances of this class
+        The layout of the parent class is a prefix of it, so a field has the same index in all subclasses
+        It is computed once and stays fixed, as instances depend on it
+        """
+
+        if self.field_layout is None:
+            layout = {}
+
+            if self.parent is not None:
+                parent = await self.parent()
+                if isinstance(parent, typing.Awaitable):
+                    parent = await parent
+
+                if isinstance(parent, JavaBytecodeClass):
+                    layout.update(await parent.get_field_layout())
+                else:
+                    for name in sorted(await parent.get_dynamic_field_keys()):
+                        layout.setdefault(name, len(layout))
+
+            for name in [field.name for field in self.fields.values() if not field.access & 0x0008] + sorted(self.dynamic_field_keys):
+                layout.setdefault(name, len(layout))
+
+            self.field_layout = layout
+
+        return self.field_layout
 
     async def is_subclass_of(self, class_name: str):
         return (
@@ -508,7 +555,7 @@ class JavaBytecodeClass(AbstractJavaClass):
                     # If we have no way to invoke bytecode, don't do so
                     return
 
-                runtime = jvm.Runtime.Runtime()
+                runtime = jvm.Runtime.Runtime.get_current()
 
             try:
                 await runtime.run_method(await self.get_method("<clinit>", "()V", inner=True))
@@ -558,6 +605,7 @@ class JavaBytecodeClass(AbstractJavaClass):
             return
 
         self.methods[(name, signature)] = method
+        self.vm.invalidate_method_caches()
 
     async def dump(self) -> bytearray:
         """
@@ -643,23 +691,84 @@ class JavaBytecodeClass(AbstractJavaClass):
         return self.cp.index(data) + 1
 
 
+class StaticFieldCell:
+    """
+    Storage of a single static attribute of a JavaBytecodeClass, which GetStatic and PutStatic bind to
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self, value=None):
+        self.value = value
+
+    def __repr__(self):
+        return f"StaticFieldCell({self.value})"
+
+
+class StaticFieldValues(collections.abc.MutableMapping):
+    """
+    Mapping view on the static attribute values of a JavaBytecodeClass, for code working with them by name
+    """
+
+    __slots__ = ("cls",)
+
+    def __init__(self, cls: JavaBytecodeClass):
+        self.cls = cls
+
+    def __getitem__(self, name: str):
+        return self.cls.static_field_cells[name].value
+
+    def __setitem__(self, name: str, value):
+        self.cls.set_static_attribute(name, value)
+
+    def __delitem__(self, name: str):
+        del self.cls.static_field_cells[name]
+        self.cls.vm.invalidate_method_caches()
+
+    def __iter__(self):
+        return iter(self.cls.static_field_cells)
+
+    def __len__(self):
+        return len(self.cls.static_field_cells)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
 class JavaClassInstance(AbstractJavaClassInstance):
     """
     An instance of a java bytecode class
     Wires down some stuff to the underlying class and holds the dynamic field values
 
+    The field values are stored by slot index as given by the field layout of the class
+    (see JavaBytecodeClass.get_field_layout()), fields not in the layout are stored in an extra dict
+    The "fields" attribute is a mapping view on both
+    Natives of parent classes may store python attributes on the instance (e.g. "this.underlying"),
+    so instances keep a __dict__ besides the slots
+
     todo: add abstract base so natives can share the same layout
     todo: add set/get for fields & do type validation
     """
-    # __slots__ = AbstractJavaClassInstance.__slots__ + ("class_file", "fields")
+    __slots__ = ("class_file", "field_values", "extra_fields", "__dict__")
 
     def __init__(self, class_file: JavaBytecodeClass):
+        self.class_file = class_file
+        self.field_values: typing.List[typing.Any] = []
+        self.extra_fields: typing.Optional[typing.Dict[str, typing.Any]] = None
+
         super().__init__()
 
-        self.class_file = class_file
+    @property
+    def fields(self) -> "JavaClassInstanceFields":
+        return JavaClassInstanceFields(self)
+
+    @fields.setter
+    def fields(self, values: typing.Mapping[str, typing.Any]):
+        for name, value in values.items():
+            self.set_field(name, value)
 
     async def init_fields(self):
-        self.fields.update({name: None for name in await self.class_file.get_dynamic_field_keys()})
+        self.field_values = [None] * len(await self.class_file.get_field_layout())
 
     async def get_method(self, name: str, signature: str):
         return await self.class_file.get_method(name, signature)
@@ -671,9 +780,59 @@ class JavaClassInstance(AbstractJavaClassInstance):
         return self.class_file
 
     def get_field(self, name: str):
-        return self.fields[name]
+        index = self.class_file.field_layout.get(name) if self.class_file.field_layout is not None else None
+
+        if index is not None:
+            return self.field_values[index]
+
+        if self.extra_fields is None:
+            raise KeyError(name)
+
+        return self.extra_fields[name]
 
     def set_field(self, name: str, value):
-        self.fields[name] = value
+        index = self.class_file.field_layout.get(name) if self.class_file.field_layout is not None else None
 
+        if index is not None:
+            self.field_values[index] = value
+        else:
+            if self.extra_fields is None:
+                self.extra_fields = {}
+
+            self.extra_fields[name] = value
+
+
+class JavaClassInstanceFields(collections.abc.MutableMapping):
+    """
+    Mapping view on the fields of a JavaClassInstance, for code working with them by name
+    """
+
+    __slots__ = ("instance",)
+
+    def __init__(self, instance: JavaClassInstance):
+        self.instance = instance
 
+    def __getitem__(self, name: str):
+        return self.instance.get_field(name)
+
+    def __setitem__(self, name: str, value):
+        self.instance.set_field(name, value)
+
+    def __delitem__(self, name: str):
+        if self.instance.extra_fields is None:
+            raise KeyError(name)
+
+        del self.instance.extra_fields[name]
+
+    def __iter__(self):
+        if self.instance.field_values:
+            yield from self.instance.class_file.field_layout
+
+        if self.instance.extra_fields is not None:
+            yield from self.instance.extra_fields
+
+    def __len__(self):
+        return len(self.instance.field_values) + (len(self.instance.extra_fields) if self.instance.extra_fields is not None else 0)
+
+    def __repr__(self):
+        return repr(dict(self))
@@ -2,11 +2,8 @@ import typing
 import weakref
 from abc import ABC
 
+from jvm.util import ClassFileReader
 from jvm.util import decode_cp_constant
-from jvm.util import pop_sized
-from jvm.util import pop_u1
-from jvm.util import pop_u2
-from jvm.util import pop_u4
 from jvm.util import U2
 from jvm.util import U4
 from jvm.JavaExceptionStack import StackCollectingException
@@ -17,7 +14,7 @@ from jvm.api import AbstractJavaClass
 class AbstractAttributeParser(ABC):
     NAME: str = None
 
-    async def parse(self, table: "JavaAttributeTable", data: bytearray):
+    async def parse(self, table: "JavaAttributeTable", data: ClassFileReader):
         raise NotImplementedError
 
     def dump(self, table: "JavaAttributeTable") -> bytearray:
@@ -36,8 +33,8 @@ class ConstantValueParser(AbstractAttributeParser):
         self.field: "JavaField" = None
         self.data = None
 
-    async def parse(self, table: "JavaAttributeTable", data: bytearray):
-        self.value = table.class_file.cp[pop_u2(data)]
+    async def parse(self, table: "JavaAttributeTable", data: ClassFileReader):
+        self.value = table.class_file.cp[data.read_u2()]
         self.field = table.parent
 
         if self.field.access & 0x0008:
@@ -72,25 +69,26 @@ class CodeParser(AbstractAttributeParser):
         self.max_stacks = 0
         self.max_locals = 0
         self.code: bytes = None
-        self.exception_table = {}
+        # (start, end, handler, catch type pointer) in table order, see BytecodeRepr.get_exception_handlers()
+        self.exception_table: typing.List[typing.Tuple[int, int, int, int]] = []
         self.attributes = JavaAttributeTable(self)
 
-    async def parse(self, table: "JavaAttributeTable", data: bytearray):
+    async def parse(self, table: "JavaAttributeTable", data: ClassFileReader):
         self.table = table
         self.class_file = table.class_file
-        self.max_stacks = pop_u2(data)
-        self.max_locals = pop_u2(data)
-        size = pop_u4(data)
-        self.code = pop_sized(size, data)
+        self.max_stacks = data.read_u2()
+        self.max_locals = data.read_u2()
+        size = data.read_u4()
+        self.code = data.read_sized(size)
 
-        for _ in range(pop_u2(data)):
+        for _ in range(data.read_u2()):
             start, end, handler, catch = (
-                pop_u2(data),
-                pop_u2(data),
-                pop_u2(data),
-                pop_u2(data),
+                data.read_u2(),
+                data.read_u2(),
+                data.read_u2(),
+                data.read_u2(),
             )
-            self.exception_table.setdefault(start, []).append((end, handler, catch))
+            self.exception_table.append((start, end, handler, catch))
 
         await self.attributes.from_data(table.class_file, data)
 
@@ -103,7 +101,7 @@ class CodeParser(AbstractAttributeParser):
         data += self.code
 
         data += U2.pack(len(self.exception_table))
-        for start, (end, handler, catch) in self.exception_table.items():
+        for start, end, handler, catch in self.exception_table:
             data += U2.pack(start) + U2.pack(end) + U2.pack(handler) + U2.pack(catch)
 
         data += self.attributes.dump()
@@ -116,11 +114,11 @@ class BootstrapMethods(AbstractAttributeParser):
     def __init__(self):
         self.entries = []
 
-    async def parse(self, table: "JavaAttributeTable", data: bytearray):
-        for _ in range(pop_u2(data)):
-            method_ref = table.class_file.cp[pop_u2(data) - 1]
+    async def parse(self, table: "JavaAttributeTable", data: ClassFileReader):
+        for _ in range(data.read_u2()):
+            method_ref = table.class_file.cp[data.read_u2() - 1]
             arguments = [
-                table.class_file.cp[pop_u2(data) - 1] for _ in range(pop_u2(data))
+                table.class_file.cp[data.read_u2() - 1] for _ in range(data.read_u2())
             ]
             self.entries.append((method_ref, arguments))
 
@@ -138,8 +136,8 @@ class StackMapTableParser(AbstractAttributeParser):
     __slots__ = ("entries",)
 
     @classmethod
-    def parse_verification_type_info(cls, data: bytearray):
-        tag = pop_u1(data)
+    def parse_verification_type_info(cls, data: ClassFileReader):
+        tag = data.read_u1()
         # print(2, tag)
 
         match tag:
@@ -158,18 +156,18 @@ class StackMapTableParser(AbstractAttributeParser):
             case 6:  # UninitializedThis
                 return 4,
             case 7:  # Object_variable
-                return 7, pop_u2(data)
+                return 7, data.read_u2()
             case 8:  # Uninitialized_variable
-                return 8, pop_u2(data)
+                return 8, data.read_u2()
 
         # raise ValueError(tag)
 
     def __init__(self):
         self.entries = []
 
-    async def parse(self, table: "JavaAttributeTable", data: bytearray):
-        for _ in range(pop_u2(data)):
-            entry_type = pop_u1(data)
+    async def parse(self, table: "JavaAttributeTable", data: ClassFileReader):
+        for _ in range(data.read_u2()):
+            entry_type = data.read_u1()
             # print(1, entry_type)
 
             # same_frame
@@ -186,23 +184,23 @@ class StackMapTableParser(AbstractAttributeParser):
 
             # same_locals_1_stack_item_frame_extended
             elif entry_type == 247:
-                self.entries.append((entry_type, pop_u2(data), self.parse_verification_type_info(data)))
+                self.entries.append((entry_type, data.read_u2(), self.parse_verification_type_info(data)))
 
             # chop_frame
             elif entry_type < 251:
-                self.entries.append((entry_type, pop_u2(data), 251 - entry_type))
+                self.entries.append((entry_type, data.read_u2(), 251 - entry_type))
 
             # same_frame_extended
             elif entry_type == 251:
-                self.entries.append((entry_type, pop_u2(data)))
+                self.entries.append((entry_type, data.read_u2()))
 
             # append_frame
             elif entry_type < 255:
-                self.entries.append((entry_type, pop_u2(data), self.parse_verification_type_info(data)))
+                self.entries.append((entry_type, data.read_u2(), self.parse_verification_type_info(data)))
 
             # full_frame
             elif entry_type == 255:
-                self.entries.append((entry_type, pop_u2(data), [self.parse_verification_type_info(data) for _ in range(pop_u2(data))], [self.parse_verification_type_info(data) for _ in range(pop_u2(data))]))
+                self.entries.append((entry_type, data.read_u2(), [self.parse_verification_type_info(data) for _ in range(data.read_u2())], [self.parse_verification_type_info(data) for _ in range(data.read_u2())]))
 
     def dump(self, table: "JavaAttributeTable") -> bytearray:
         return bytearray()  # todo: implement
@@ -220,22 +218,22 @@ class ElementValue:
         self.data = None
         self.raw_data = None
 
-    async def parse(self, table: "JavaAttributeTable", data: bytearray):
+    async def parse(self, table: "JavaAttributeTable", data: ClassFileReader):
         # as by https://docs.oracle.com/javase/specs/jvms/se16/html/jvms-4.html#jvms-4.7.16
 
-        self.tag = tag = chr(pop_u1(data))
+        self.tag = tag = chr(data.read_u1())
 
         # these can be directly loaded from the constant pool
         if tag in "BCDFIJSZs":
-            self.data = await decode_cp_constant(table.class_file.cp[pop_u2(data) - 1], vm=table.class_file.vm)
+            self.data = await decode_cp_constant(table.class_file.cp[data.read_u2() - 1], vm=table.class_file.vm)
 
         elif tag == "e":
             cls_name = (
-                table.class_file.cp[pop_u2(data) - 1][1]
+                table.class_file.cp[data.read_u2() - 1][1]
                 .removeprefix("L")
                 .removesuffix(";")
             )
-            attr_name = table.class_file.cp[pop_u2(data) - 1][1]
+            attr_name = table.class_file.cp[data.read_u2() - 1][1]
             self.raw_data = cls_name, attr_name
 
             cls = await table.class_file.vm.get_class(cls_name, version=table.class_file.internal_version)
@@ -244,22 +242,22 @@ class ElementValue:
                 self.data = await cls.get_static_attribute(attr_name, "enum")
 
         elif tag == "c":
-            self.data = table.class_file.cp[pop_u2(data) - 1]
+            self.data = table.class_file.cp[data.read_u2() - 1]
 
         elif tag == "[":
-            self.data = [await ElementValue().parse(table, data) for _ in range(pop_u2(data))]
+            self.data = [await ElementValue().parse(table, data) for _ in range(data.read_u2())]
 
         elif tag == "@":
             annotation_type = (
-                table.class_file.cp[pop_u2(data) - 1][1]
+                table.class_file.cp[data.read_u2() - 1][1]
                 .removeprefix("L")
                 .removesuffix(";")
             )
 
             values = []
 
-            for _ in range(pop_u2(data)):
-                name = table.class_file.cp[pop_u2(data) - 1]
+            for _ in range(data.read_u2()):
+                name = table.class_file.cp[data.read_u2() - 1]
                 if name[0] != 1:
                     raise StackCollectingException("invalid entry: "+str(name))
 
@@ -300,18 +298,18 @@ class RuntimeAnnotationsParser(AbstractAttributeParser):
     def __init__(self):
         self.annotations = []
 
-    async def parse(self, table: "JavaAttributeTable", data: bytearray):
-        for _ in range(pop_u2(data)):
+    async def parse(self, table: "JavaAttributeTable", data: ClassFileReader):
+        for _ in range(data.read_u2()):
             annotation_type = (
-                table.class_file.cp[pop_u2(data) - 1][1]
+                table.class_file.cp[data.read_u2() - 1][1]
                 .removeprefix("L")
                 .removesuffix(";")
             )
 
             values = []
 
-            for _ in range(pop_u2(data)):
-                name = table.class_file.cp[pop_u2(data) - 1]
+            for _ in range(data.read_u2()):
+                name = table.class_file.cp[data.read_u2() - 1]
                 if name[0] != 1:
                     raise StackCollectingException(
                         f"invalid name @annotation head for ElementValue pair: {name}"
@@ -354,8 +352,8 @@ class NestHostParser(AbstractAttributeParser):
     def __init__(self):
         self.host = None
 
-    async def parse(self, table: "JavaAttributeTable", data: bytearray):
-        self.host = table.class_file.cp[pop_u2(data) - 1][1][1]
+    async def parse(self, table: "JavaAttributeTable", data: ClassFileReader):
+        self.host = table.class_file.cp[data.read_u2() - 1][1][1]
 
     def dump(self, table: "JavaAttributeTable") -> bytearray:
         return table.class_file.ensure_data([7, [1, self.host]])
@@ -367,10 +365,10 @@ class NestMembersParser(AbstractAttributeParser):
     def __init__(self):
         self.classes = []
 
-    async def parse(self, table: "JavaAttributeTable", data: bytearray):
+    async def parse(self, table: "JavaAttributeTable", data: ClassFileReader):
         self.classes += [
-            table.class_file.cp[pop_u2(data) - 1][1][1]
-            for _ in range(pop_u2(data))
+            table.class_file.cp[data.read_u2() - 1][1][1]
+            for _ in range(data.read_u2())
         ]
 
     def dump(self, table: "JavaAttributeTable") -> bytearray:
@@ -389,8 +387,8 @@ class SignatureParser(AbstractAttributeParser):
     def __init__(self):
         self.signature = None
 
-    async def parse(self, table: "JavaAttributeTable", data: bytearray):
-        self.signature = table.class_file.cp[pop_u2(data) - 1][1]
+    async def parse(self, table: "JavaAttributeTable", data: ClassFileReader):
+        self.signature = table.class_file.cp[data.read_u2() - 1][1]
 
     def dump(self, table: "JavaAttributeTable") -> bytearray:
         return table.class_file.ensure_data([1, self.signature])
@@ -402,10 +400,10 @@ class ExceptionsParser(AbstractAttributeParser):
     def __init__(self):
         self.exceptions = []
 
-    async def parse(self, table: "JavaAttributeTable", data: bytearray):
+    async def parse(self, table: "JavaAttributeTable", data: ClassFileReader):
         self.exceptions += [
-            table.class_file.cp[pop_u2(data) - 1][1][1]
-            for _ in range(pop_u2(data))
+            table.class_file.cp[data.read_u2() - 1][1][1]
+            for _ in range(data.read_u2())
         ]
 
     def dump(self, table: "JavaAttributeTable") -> bytearray:
@@ -424,12 +422,12 @@ class InnerClassesParser(AbstractAttributeParser):
     def __init__(self):
         self.inner_classes = []
 
-    async def parse(self, table: "JavaAttributeTable", data: bytearray):
-        for _ in range(pop_u2(data)):
-            inner_class_index = pop_u2(data)
-            outer_class_index = pop_u2(data)
-            inner_name_index = pop_u2(data)
-            inner_class_access = pop_u2(data)
+    async def parse(self, table: "JavaAttributeTable", data: ClassFileReader):
+        for _ in range(data.read_u2()):
+            inner_class_index = data.read_u2()
+            outer_class_index = data.read_u2()
+            inner_name_index = data.read_u2()
+            inner_class_access = data.read_u2()
             self.inner_classes.append((inner_class_index, outer_class_index, inner_name_index, inner_class_access))
 
     def dump(self, table: "JavaAttributeTable") -> bytearray:
@@ -442,8 +440,8 @@ class EnclosingMethodParser(AbstractAttributeParser):
     def __init__(self):
         self.class_index, self.method_index = -1, -1
 
-    async def parse(self, table: "JavaAttributeTable", data: bytearray):
-        self.class_index, self.method_index = pop_u2(data), pop_u2(data)
+    async def parse(self, table: "JavaAttributeTable", data: ClassFileReader):
+        self.class_index, self.method_index = data.read_u2(), data.read_u2()
 
     def dump(self, table: "JavaAttributeTable") -> bytearray:
         return U2.pack(self.class_index) + U2.pack(self.method_index)
@@ -488,6 +486,14 @@ class JavaAttributeTable:
         "StackMapTable": StackMapTableParser,
     }
 
+    # Attributes parsed directly in from_data(), as they have side effects during baking the class
+    # All other attributes are stored raw and parsed on first access
+    ATTRIBUTES_EAGER = {
+        "ConstantValue",
+        "RuntimeVisibleAnnotations",
+        "RuntimeInvisibleAnnotations",
+    }
+
     __slots__ = (
         "parent",
         "class_file",
@@ -498,43 +504,86 @@ class JavaAttributeTable:
     def __init__(self, parent):
         self.parent = parent
         self.class_file: AbstractJavaClass = None
-        self.attributes_unparsed = {}
-        self.attributes = {}
+        self.attributes_unparsed: typing.Dict[str, typing.List[typing.Union[memoryview, bytes]]] = {}
+        self.attributes: typing.Dict[str, typing.List[AbstractAttributeParser]] = {}
+
+    async def from_data(self, class_file: AbstractJavaClass, data: ClassFileReader):
+        attributes = []
+
+        for _ in range(data.read_u2()):
+            name = class_file.cp[data.read_u2() - 1][1]
+            data_size = data.read_u4()
+            attributes.append((name, data.read_sized(data_size)))
+
+        await self.from_raw(class_file, attributes)
+
+    async def from_raw(
+        self,
+        class_file: AbstractJavaClass,
+        attributes: typing.Iterable[typing.Tuple[str, typing.Union[memoryview, bytes]]],
+    ):
+        """
+        Fills the table from already split up (name, body) pairs, e.g. from a DecodedClassFile
+        """
 
-    async def from_data(self, class_file: AbstractJavaClass, data: bytearray):
         self.class_file = class_file
 
-        for _ in range(pop_u2(data)):
-            name = class_file.cp[pop_u2(data) - 1][1]
-            data_size = pop_u4(data)
-            d = pop_sized(data_size, data)
+        for name, d in attributes:
             self.attributes_unparsed.setdefault(name, []).append(d)
 
-        for key in list(self.attributes_unparsed.keys()):
-            if key in self.ATTRIBUTES:
-                self.attributes.setdefault(key, [])
+        for key in self.ATTRIBUTES_EAGER.intersection(self.attributes_unparsed.keys()):
+            await self.parse_attribute(key)
 
-                for data in self.attributes_unparsed[key]:
-                    instance = self.ATTRIBUTES[key]()
-                    await instance.parse(self, bytearray(data))
-                    self.attributes[key].append(instance)
+    async def parse_attribute(self, key: str):
+        """
+        Parses the raw data stored for the attribute 'key' and moves it over into the parsed attributes
+        """
 
-                del self.attributes_unparsed[key]
+        if key not in self.ATTRIBUTES:
+            if key in self.ATTRIBUTES_NEED_PARSING:
+                raise RuntimeError(
+                    f"The following attribute could not be parsed (attribute holder: {self.parent}): {key}"
+                )
 
-        keyset = set(self.attributes_unparsed.keys())
+            return
 
-        diff_need = self.ATTRIBUTES_NEED_PARSING.intersection(keyset)
-        if diff_need:
-            raise RuntimeError(
-                f"The following attribute(s) could not be parsed (attribute holder: {self.parent}): "
-                + ", ".join(diff_need)
-            )
+        # Parsed into a local list first, so a failing attribute is still unparsed afterwards
+        instances = []
+
+        for data in self.attributes_unparsed[key]:
+            instance = self.ATTRIBUTES[key]()
+
+            try:
+                await instance.parse(self, ClassFileReader(data))
+            except StackCollectingException as e:
+                raise e.add_trace(f"parsing attribute {key} (attribute holder: {self.parent})")
+            except Exception as e:
+                raise StackCollectingException(
+                    f"failed to parse attribute {key} (attribute holder: {self.parent}): {type(e).__name__}: {e}"
+                ) from e
 
-        diff_may = self.ATTRIBUTES_MAY_PARSING.intersection(keyset)
-        # if diff_may:
-        # info("missing attribute parsing for: " + ", ".join(diff_may))
+            instances.append(instance)
+
+        del self.attributes_unparsed[key]
+        self.attributes.setdefault(key, []).extend(instances)
+
+    def __contains__(self, item):
+        return item in self.attributes or item in self.attributes_unparsed
 
     def __getitem__(self, item):
+        if item not in self.attributes and item in self.attributes_unparsed:
+            # Lazy parsers are not allowed to suspend, so we can run them here without an event loop
+            coro = self.parse_attribute(item)
+            try:
+                coro.send(None)
+            except StopIteration:
+                pass
+            else:
+                coro.close()
+                raise StackCollectingException(
+                    f"attribute {item} cannot be parsed lazily (attribute holder: {self.parent})"
+                )
+
         return self.attributes[item]
 
     def dump(self) -> bytearray:
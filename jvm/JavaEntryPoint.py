@@ -11,6 +11,7 @@ Mod loader inspired by "Minecraft Forge" (https://github.com/MinecraftForge/Mine
 
 This project is not official by mojang and does not relate to it.
 """
+import asyncio
 import json
 
 import typing
@@ -70,6 +71,12 @@ class McpythonResourceLookup(IClassAccessor):
         except (FileNotFoundError, KeyError, NameError):
             pass
 
+    async def try_access_many(self, paths: typing.Iterable[str]) -> typing.Dict[str, bytes]:
+        # Wait for all reads at once instead of one after another
+        paths = list(paths)
+        results = await asyncio.gather(*(self.try_access_resource(path) for path in paths))
+        return {path: data for path, data in zip(paths, results) if data is not None}
+
 
 # Replace java bytecode loader with ResourceLoader's lookup system
 jvm.api.vm.add_accessor(McpythonResourceLookup())
@@ -99,15 +106,33 @@ class JavaMod(mcpython.common.mod.Mod.Mod):
                     logger.println(f"found mixin info file at {file} for mod {self.name}")
                     await self.load_mixin_map(file)
 
-            for file in self.resource_access.get_all_entries_in_directory(""):
-                if not file.endswith(".class"):
-                    continue
+            files = [
+                file
+                for file in self.resource_access.get_all_entries_in_directory("")
+                if file.endswith(".class")
+            ]
 
-                await self.load_mod_file(file)
+            # Read (and, if enabled, decode) the class files in one batch before loading them one by one
+            names = [file.split(".")[0] for file in files]
+            version = self.get_class_loader_version()
+            await jvm.api.vm.prefetch_classes(names, version=version)
+
+            try:
+                for file in files:
+                    await self.load_mod_file(file)
+            finally:
+                # Data not consumed (e.g. after an error) must not be picked up by classes loaded later on
+                jvm.api.vm.discard_prefetched(names, version=version)
         except:
             print(self.container, self.name)
             raise
 
+    def get_class_loader_version(self) -> str:
+        if self.loader_version not in FORGE_VERSION_NUMBER_TO_MC:
+            return "1.17.1"
+
+        return FORGE_VERSION_NUMBER_TO_MC[self.loader_version]
+
     async def load_mixin_map(self, file: str):
         """
         Loader for the mixin ref-map data
@@ -175,12 +200,7 @@ class JavaMod(mcpython.common.mod.Mod.Mod):
             # make sure that this is set!
             shared.CURRENT_EVENT_SUB = self.name
 
-            if self.loader_version not in FORGE_VERSION_NUMBER_TO_MC:
-                version = "1.17.1"
-            else:
-                version = FORGE_VERSION_NUMBER_TO_MC[self.loader_version]
-
-            await jvm.api.vm.load_class(cls, version=version)
+            await jvm.api.vm.load_class(cls, version=self.get_class_loader_version())
 
         # StackCollectingException is something internal and contains more meta-data than the other exceptions
         except StackCollectingException as e:
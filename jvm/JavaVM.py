@@ -1,14 +1,21 @@
 import asyncio
+import concurrent.futures
+import hashlib
 import typing
 
 from jvm.api import AbstractJavaVM
-from jvm.ClassAdressing import AccessorDict, IClassAccessor
+from jvm.ClassAdressing import IndexedAccessorDict, IClassAccessor
 
 from jvm.natives import manager as native_manager
 from jvm.api import DYNAMIC_NATIVES
+from jvm.api import PARALLEL_DECODING
+from jvm.api import CLASS_CACHE_DIRECTORY
 from jvm.logging import info
 from jvm.Java import JavaArrayManager
 from jvm.Java import JavaBytecodeClass
+from jvm.ClassCache import ClassFileCache
+from jvm.DecodedClassFile import DecodedClassFile
+from jvm.DecodedClassFile import decode_class_files
 from jvm.JavaExceptionStack import StackCollectingException
 import jvm.api
 from jvm.api import AbstractJavaClass
@@ -40,21 +47,199 @@ class JavaVM(AbstractJavaVM):
         self.array_helper = JavaArrayManager(self)
 
         self.simulation = False
-        self.file_lookup = AccessorDict()
+        self.file_lookup = IndexedAccessorDict()
+
+        # Process pool for decoding class files ahead of time, see enable_parallel_decoding()
+        self.decoder_pool: typing.Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self.decoder_batch_size = 32
+        self.pre_decoded: typing.Dict[bytes, DecodedClassFile] = {}
+
+        # On-disk cache of decoded class files, see enable_class_cache()
+        self.class_cache: typing.Optional[ClassFileCache] = None
+
+        # Class file data read ahead of time by prefetch_classes() by (version, name), consumed by load_class()
+        self.prefetched_bytecode: typing.Dict[typing.Tuple[typing.Any, str], bytes] = {}
+
+        # (version, name) -> key in pre_decoded of the classes pre-decoded by prefetch_classes()
+        self.prefetched_keys: typing.Dict[typing.Tuple[typing.Any, str], bytes] = {}
+
+        # Increased whenever resolved methods may change, outdating the caches of invoke instructions
+        self.method_epoch = 0
+
+    def invalidate_method_caches(self):
+        """
+        Outdates all method resolutions cached at call sites (see jvm.Instructions.CallSiteCache)
+        Called when a method is injected into a class, or when a class is redefined
+        """
+        self.method_epoch += 1
+
+    def check_class_redefinition(self, name: str, version: typing.Any):
+        if name in self.shared_classes or name in self.classes_by_version.get(version, {}):
+            self.invalidate_method_caches()
 
     def add_accessor(self, accessor: IClassAccessor):
         self.file_lookup.add_accessor(accessor)
         return self
 
+    def enable_parallel_decoding(self, workers: int = None):
+        """
+        Enables decoding class files in a process pool via pre_decode_classes()
+        :param workers: the worker count, defaults to the cpu count
+        """
+
+        if self.decoder_pool is None:
+            self.decoder_pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+
+        return self
+
+    def disable_parallel_decoding(self):
+        if self.decoder_pool is not None:
+            self.decoder_pool.shutdown(wait=False, cancel_futures=True)
+            self.decoder_pool = None
+
+        self.pre_decoded.clear()
+        self.prefetched_keys.clear()
+
+    def enable_class_cache(self, directory: str, max_size: int = 256 * 1024 * 1024):
+        """
+        Enables the on-disk cache for decoded class files, so unchanged class files are not decoded again
+        on the next start
+        :param directory: the directory to store the cache in
+        :param max_size: the size in bytes after which the least recently used entries are evicted
+        """
+
+        self.class_cache = ClassFileCache(directory, max_size=max_size)
+        return self
+
+    @staticmethod
+    def get_bytecode_key(bytecode: typing.Union[bytes, bytearray, memoryview]) -> bytes:
+        return hashlib.sha1(bytecode).digest()
+
+    async def pre_decode_classes(self, bytecodes: typing.Iterable[bytes]) -> typing.List[bytes]:
+        """
+        Decodes the given class files in the decoder pool, so load_class_from_bytecode() only needs to create
+        the class structure from the decoded form when the class gets loaded later on
+        Does nothing when parallel decoding is not enabled
+
+        Returns the keys in pre_decoded of the given class files, for dropping them when not needed anymore
+        """
+
+        if self.decoder_pool is None:
+            return []
+
+        keys = []
+        pending: typing.Dict[bytes, bytes] = {}
+        for bytecode in bytecodes:
+            key = self.get_bytecode_key(bytecode)
+            keys.append(key)
+
+            if key in self.pre_decoded:
+                continue
+
+            if self.class_cache is not None:
+                decoded = self.class_cache.get(key)
+
+                if decoded is not None:
+                    self.pre_decoded[key] = decoded
+                    continue
+
+            pending[key] = bytes(bytecode)
+
+        if not pending:
+            return keys
+
+        pending_keys = list(pending.keys())
+        loop = asyncio.get_running_loop()
+
+        # Batch the class files, so the overhead of transferring the data is not paid per class
+        batches = [
+            pending_keys[i: i + self.decoder_batch_size]
+            for i in range(0, len(pending_keys), self.decoder_batch_size)
+        ]
+        results = await asyncio.gather(*[
+            loop.run_in_executor(
+                self.decoder_pool,
+                decode_class_files,
+                [pending[key] for key in batch],
+            )
+            for batch in batches
+        ])
+
+        for batch, decoded in zip(batches, results):
+            for key, cls in zip(batch, decoded):
+                # Failed ones are decoded again when loading, for reporting the error
+                if cls is not None:
+                    self.pre_decoded[key] = cls
+
+                    if self.class_cache is not None:
+                        self.class_cache.put(key, cls)
+
+        return keys
+
     def walk_across_classes(self) -> typing.Iterator[AbstractJavaClass]:
         yield from self.shared_classes.values()
         for l in self.classes_by_version.values():
             yield from l.values()
 
+    async def prefetch_classes(self, names: typing.Iterable[str], version: typing.Any = 0):
+        """
+        Reads the class files for the given class names in one batch from the accessors,
+        so loading them later on does not need to wait for each file on its own
+        When parallel decoding is enabled, the class files are also pre-decoded
+
+        The data is only used by load_class() for the same version; callers should discard_prefetched()
+        the names afterwards, so data not consumed does not stay around
+        """
+
+        loaded = self.classes_by_version.get(version, {})
+        names = {name.replace(".", "/") for name in names if not name.startswith("[")}
+        names = {
+            name for name in names
+            if name not in self.shared_classes and name not in loaded and (version, name) not in self.prefetched_bytecode
+        }
+
+        if not names:
+            return
+
+        found = await self.file_lookup.prefetch(names)
+        self.prefetched_bytecode.update(((version, name), data) for name, data in found.items())
+
+        keys = await self.pre_decode_classes(found.values())
+        self.prefetched_keys.update(zip(((version, name) for name in found.keys()), keys))
+
+    def discard_prefetched(self, names: typing.Iterable[str], version: typing.Any = 0):
+        """
+        Drops the data of prefetch_classes() not consumed by load_class(), including the pre-decoded forms
+        """
+
+        for name in names:
+            name = name.replace(".", "/")
+            self.prefetched_bytecode.pop((version, name), None)
+
+            key = self.prefetched_keys.pop((version, name), None)
+            if key is not None:
+                self.pre_decoded.pop(key, None)
+
     async def load_lazy(self):
         while len(self.lazy_classes) > 0:
-            version, name = self.lazy_classes.pop()
-            await self.get_class(name, version=version)
+            batch = list(self.lazy_classes)
+            self.lazy_classes.clear()
+
+            by_version: typing.Dict[typing.Any, typing.List[str]] = {}
+            for version, name in batch:
+                by_version.setdefault(version, []).append(name)
+
+            try:
+                for version, names in by_version.items():
+                    await self.prefetch_classes(names, version=version)
+
+                for version, name in batch:
+                    await self.get_class(name, version=version)
+
+            finally:
+                # Classes resolved differently in between (e.g. natives) don't need their data anymore
+                for version, names in by_version.items():
+                    self.discard_prefetched(names, version=version)
 
     async def get_class(self, name: str, version=0) -> typing.Optional[AbstractJavaClass]:
         """
@@ -101,10 +286,13 @@ class JavaVM(AbstractJavaVM):
         if name.startswith("["):
             return await self.array_helper.get(name, version=version)
 
-        try:
-            bytecode = await self.file_lookup.try_access_class_file(name)
-        except FileNotFoundError:
-            bytecode = None
+        bytecode = self.prefetched_bytecode.pop((version, name), None)
+
+        if bytecode is None:
+            try:
+                bytecode = await self.file_lookup.try_access_class_file(name)
+            except FileNotFoundError:
+                bytecode = None
 
         if bytecode is None:
             if DYNAMIC_NATIVES:
@@ -132,13 +320,31 @@ class JavaVM(AbstractJavaVM):
         cls.internal_version = version
         cls.vm = self
 
+        decoded = None
+
         try:
-            await cls.from_bytes(bytearray(bytecode))
+            if self.pre_decoded or self.class_cache is not None:
+                key = self.get_bytecode_key(bytecode)
+                decoded = self.pre_decoded.pop(key, None)
+
+                if decoded is None and self.class_cache is not None:
+                    decoded = self.class_cache.get(key)
+
+                    if decoded is None:
+                        decoded = DecodedClassFile.from_bytes(bytecode)
+                        self.class_cache.put(key, decoded)
+
+            if decoded is not None:
+                await cls.from_decoded(decoded)
+            else:
+                await cls.from_bytes(bytecode)
         except StackCollectingException as e:
             e.add_trace(f"decoding class {name}")
             raise
 
         if prepare:
+            self.check_class_redefinition(name, version)
+
             if not shared:
                 self.classes_by_version.setdefault(version, {})[name] = cls
             else:
@@ -157,6 +363,7 @@ class JavaVM(AbstractJavaVM):
 
     def register_direct(self, cls: jvm.api.AbstractJavaClass):
         version = cls.internal_version
+        self.check_class_redefinition(cls.name, version)
 
         if version is None:
             self.shared_classes[cls.name] = cls
@@ -165,6 +372,7 @@ class JavaVM(AbstractJavaVM):
 
     def register_special(self, cls: jvm.api.AbstractJavaClass, name: str, version=...):
         version = cls.internal_version if version is ... else version
+        self.check_class_redefinition(name, version)
 
         if version is None:
             self.shared_classes[name] = cls
@@ -183,6 +391,12 @@ class JavaVM(AbstractJavaVM):
 
 
 jvm.api.vm = JavaVM()
+
+if PARALLEL_DECODING:
+    jvm.api.vm.enable_parallel_decoding()
+
+if CLASS_CACHE_DIRECTORY is not None:
+    jvm.api.vm.enable_class_cache(CLASS_CACHE_DIRECTORY)
 # jvm.api.vm.debug_method("com/enderio/core/client/handlers/ClientHandler", "onClientTick", "(Lnet/minecraftforge/fml/common/gameevent/TickEvent$ClientTickEvent;)V")
 # jvm.api.vm.debug_method("com/enderio/core/common/handlers/FireworkHandler", "onPlayerTick", "(Lnet/minecraftforge/fml/common/gameevent/TickEvent$PlayerTickEvent;)V")
 
@@ -0,0 +1,513 @@
+import builtins
+import dis
+import sys
+import types
+import typing
+
+import jvm.api
+import jvm.logging
+from jvm.api import PyBytecodeBuilder
+from jvm.JavaExceptionStack import StackCollectingException
+
+
+# The assembler emits the word code layout of CPython 3.11 (inline caches, relative jumps, SWAP/COPY, BINARY_OP)
+# On other interpreters, all methods stay in the bytecode interpreter
+COMPILER_SUPPORTED = sys.version_info[:2] == (3, 11)
+
+
+class PyOpcodes:
+    """
+    The instruction set the prepare_python_bytecode_instructions() hooks emit into a PyBytecodeBuilder
+
+    These are the classic, stack based CPython instructions; the builder lowers them to the opcodes of the
+    running interpreter. Jump instructions take a Label (see PyBytecodeBuilder.real_from_offset()) as argument.
+    """
+
+    NOP = "NOP"
+    POP_TOP = "POP_TOP"
+    ROT_TWO = "ROT_TWO"
+    ROT_THREE = "ROT_THREE"
+    DUP_TOP = "DUP_TOP"
+    DUP_TOP_TWO = "DUP_TOP_TWO"
+
+    LOAD_CONST = "LOAD_CONST"
+    LOAD_FAST = "LOAD_FAST"
+    STORE_FAST = "STORE_FAST"
+    LOAD_GLOBAL = "LOAD_GLOBAL"
+
+    BINARY_ADD = "BINARY_ADD"
+    BINARY_SUBTRACT = "BINARY_SUBTRACT"
+    BINARY_MULTIPLY = "BINARY_MULTIPLY"
+    BINARY_FLOOR_DIVIDE = "BINARY_FLOOR_DIVIDE"
+    BINARY_TRUE_DIVIDE = "BINARY_TRUE_DIVIDE"
+    BINARY_MODULO = "BINARY_MODULO"
+    BINARY_LSHIFT = "BINARY_LSHIFT"
+    BINARY_RSHIFT = "BINARY_RSHIFT"
+    BINARY_AND = "BINARY_AND"
+    BINARY_OR = "BINARY_OR"
+    BINARY_XOR = "BINARY_XOR"
+    INPLACE_ADD = "INPLACE_ADD"
+    UNARY_NEGATIVE = "UNARY_NEGATIVE"
+
+    BINARY_SUBSCR = "BINARY_SUBSCR"
+    STORE_SUBSCR = "STORE_SUBSCR"
+
+    COMPARE_OP = "COMPARE_OP"
+    IS_OP = "IS_OP"
+
+    JUMP_ABSOLUTE = "JUMP_ABSOLUTE"
+    POP_JUMP_IF_FALSE = "POP_JUMP_IF_FALSE"
+    POP_JUMP_IF_TRUE = "POP_JUMP_IF_TRUE"
+
+    RETURN_VALUE = "RETURN_VALUE"
+
+    # Data: (const index of the callable, argument count), see PyBytecodeBuilder.add_call()
+    CALL_CONST = "CALL_CONST"
+
+
+BINARY_OPERATORS = {
+    PyOpcodes.BINARY_ADD: "NB_ADD",
+    PyOpcodes.BINARY_SUBTRACT: "NB_SUBTRACT",
+    PyOpcodes.BINARY_MULTIPLY: "NB_MULTIPLY",
+    PyOpcodes.BINARY_FLOOR_DIVIDE: "NB_FLOOR_DIVIDE",
+    PyOpcodes.BINARY_TRUE_DIVIDE: "NB_TRUE_DIVIDE",
+    PyOpcodes.BINARY_MODULO: "NB_REMAINDER",
+    PyOpcodes.BINARY_LSHIFT: "NB_LSHIFT",
+    PyOpcodes.BINARY_RSHIFT: "NB_RSHIFT",
+    PyOpcodes.BINARY_AND: "NB_AND",
+    PyOpcodes.BINARY_OR: "NB_OR",
+    PyOpcodes.BINARY_XOR: "NB_XOR",
+    PyOpcodes.INPLACE_ADD: "NB_INPLACE_ADD",
+}
+
+# Instructions existing as they are in the running interpreter
+DIRECT_OPCODES = {
+    PyOpcodes.NOP,
+    PyOpcodes.POP_TOP,
+    PyOpcodes.LOAD_CONST,
+    PyOpcodes.LOAD_FAST,
+    PyOpcodes.STORE_FAST,
+    PyOpcodes.UNARY_NEGATIVE,
+    PyOpcodes.BINARY_SUBSCR,
+    PyOpcodes.STORE_SUBSCR,
+    PyOpcodes.COMPARE_OP,
+    PyOpcodes.IS_OP,
+    PyOpcodes.RETURN_VALUE,
+}
+
+# Jump instructions, as (forward variant, backward variant)
+JUMP_OPCODES = {
+    PyOpcodes.JUMP_ABSOLUTE: ("JUMP_FORWARD", "JUMP_BACKWARD"),
+    PyOpcodes.POP_JUMP_IF_FALSE: ("POP_JUMP_FORWARD_IF_FALSE", "POP_JUMP_BACKWARD_IF_FALSE"),
+    PyOpcodes.POP_JUMP_IF_TRUE: ("POP_JUMP_FORWARD_IF_TRUE", "POP_JUMP_BACKWARD_IF_TRUE"),
+}
+
+# Instructions after which the control flow does not continue with the next instruction
+TERMINAL_OPCODES = {"JUMP_FORWARD", "JUMP_BACKWARD", "RETURN_VALUE"}
+
+
+class Label:
+    """
+    A position in the instruction sequence of a CodeObjectBuilder, placed via place_label()
+    """
+
+    __slots__ = ("name",)
+
+    def __init__(self, name: str = None):
+        self.name = name
+
+    def __repr__(self):
+        return f"Label({self.name})"
+
+
+class CodeObjectBuilder(PyBytecodeBuilder):
+    """
+    Assembles a python code object from the instructions emitted by the prepare_python_bytecode_instructions() hooks
+
+    The instructions are first collected in the generic form (see PyOpcodes), then lowered to the opcodes
+    of the running interpreter, laid out (including EXTENDED_ARG prefixes and inline cache entries), and checked
+    by a stack depth simulation over all paths, so broken instruction sequences are rejected instead of
+    crashing the interpreter.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.consts: typing.List[typing.Any] = []
+        self.const_lookup: typing.Dict[typing.Tuple[type, typing.Any], int] = {}
+        self.names: typing.List[str] = []
+
+        # The java instruction index currently emitting instructions, base for real_from_offset()
+        self.current_index = 0
+        self.java_labels: typing.Dict[int, Label] = {}
+
+    def add_instruction(self, instruction_opcode: str, instruction_data=None):
+        self.instruction_sequence.append((instruction_opcode, instruction_data))
+
+    def add_name(self, name: str) -> int:
+        if name not in self.names:
+            self.names.append(name)
+        return self.names.index(name)
+
+    def add_const(self, const) -> int:
+        try:
+            key = type(const), const
+            if key in self.const_lookup:
+                return self.const_lookup[key]
+
+        except TypeError:  # not hashable
+            key = None
+
+        self.consts.append(const)
+        if key is not None:
+            self.const_lookup[key] = len(self.consts) - 1
+
+        return len(self.consts) - 1
+
+    def add_comparator(self, comp: str) -> int:
+        return dis.cmp_op.index(comp)
+
+    def add_call(self, function: typing.Callable, arg_count: int):
+        self.add_instruction(PyOpcodes.CALL_CONST, (self.add_const(function), arg_count))
+
+    def real_from_offset(self, offset: int) -> Label:
+        return self.get_java_label(self.current_index + offset)
+
+    def get_java_label(self, index: int) -> Label:
+        if index not in self.java_labels:
+            self.java_labels[index] = Label(str(index))
+        return self.java_labels[index]
+
+    def new_label(self) -> Label:
+        return Label()
+
+    def place_label(self, label: Label):
+        self.instruction_sequence.append(label)
+
+    def lower(self) -> typing.List[typing.Union[Label, typing.Tuple[str, typing.Any]]]:
+        """
+        Translates the generic instructions into the ones of the running interpreter
+        Jump targets stay Label instances, all other arguments are resolved to integers
+        """
+
+        result = []
+        emit = result.append
+
+        for entry in self.instruction_sequence:
+            if isinstance(entry, Label):
+                emit(entry)
+                continue
+
+            opcode, data = entry
+
+            if opcode in DIRECT_OPCODES:
+                emit((opcode, data or 0))
+
+            elif opcode in BINARY_OPERATORS:
+                emit(("BINARY_OP", [e[0] for e in dis._nb_ops].index(BINARY_OPERATORS[opcode])))
+
+            elif opcode in JUMP_OPCODES:
+                if not isinstance(data, Label):
+                    raise StackCollectingException(f"jump instruction {opcode} without Label target: {data}")
+                emit((opcode, data))
+
+            elif opcode == PyOpcodes.ROT_TWO:
+                emit(("SWAP", 2))
+
+            elif opcode == PyOpcodes.ROT_THREE:
+                emit(("SWAP", 3))
+                emit(("SWAP", 2))
+
+            elif opcode == PyOpcodes.DUP_TOP:
+                emit(("COPY", 1))
+
+            elif opcode == PyOpcodes.DUP_TOP_TWO:
+                emit(("COPY", 2))
+                emit(("COPY", 2))
+
+            elif opcode == PyOpcodes.LOAD_GLOBAL:
+                emit(("LOAD_GLOBAL", data << 1))
+
+            elif opcode == PyOpcodes.CALL_CONST:
+                const, arg_count = data
+                emit(("LOAD_CONST", const))
+
+                if arg_count == 0:
+                    emit(("PUSH_NULL", 0))
+                    emit(("SWAP", 2))
+                    emit(("PRECALL", 0))
+                    emit(("CALL", 0))
+
+                else:
+                    # Moves the callable below the arguments and calls it in the "method" form, where
+                    # the first argument is passed as 'self' (the slot which would otherwise be NULL)
+                    for depth in range(arg_count + 1, 1, -1):
+                        emit(("SWAP", depth))
+                    emit(("PRECALL", arg_count - 1))
+                    emit(("CALL", arg_count - 1))
+
+            else:
+                raise StackCollectingException(f"unknown python bytecode instruction {opcode} (data: {data})")
+
+        return result
+
+    def assemble(
+        self,
+        name: str,
+        qualified_name: str,
+        filename: str,
+        arg_count: int,
+        local_count: int,
+    ) -> types.CodeType:
+        """
+        Creates the code object for a function taking 'arg_count' positional arguments
+        stored as the first of 'local_count' fast locals
+        """
+
+        if not COMPILER_SUPPORTED:
+            raise NotImplementedError(f"python bytecode assembly is not supported on {sys.version}")
+
+        # Prologue: fast locals must be bound before they are read
+        none = self.add_const(None)
+        instructions = [("RESUME", 0)]
+        for i in range(arg_count, local_count):
+            instructions.append(("LOAD_CONST", none))
+            instructions.append(("STORE_FAST", i))
+        instructions += self.lower()
+
+        stack_size = compute_stack_size(instructions)
+        code = layout(instructions)
+
+        return (lambda: None).__code__.replace(
+            co_code=code,
+            co_consts=tuple(self.consts),
+            co_names=tuple(self.names),
+            co_varnames=tuple(f"local_{i}" for i in range(local_count)),
+            co_freevars=(),
+            co_cellvars=(),
+            co_argcount=arg_count,
+            co_posonlyargcount=0,
+            co_kwonlyargcount=0,
+            co_nlocals=local_count,
+            co_stacksize=stack_size,
+            co_flags=0x1 | 0x2,  # CO_OPTIMIZED | CO_NEWLOCALS
+            co_name=name,
+            co_qualname=qualified_name,
+            co_filename=filename,
+            co_firstlineno=1,
+            co_linetable=create_line_table(len(code) // 2),
+            co_exceptiontable=b"",
+        )
+
+
+def resolve_jump(opcode: str, target_is_backward: bool) -> str:
+    if opcode in JUMP_OPCODES:
+        return JUMP_OPCODES[opcode][int(target_is_backward)]
+    return opcode
+
+
+def layout(instructions: typing.List) -> bytes:
+    """
+    Encodes the lowered instructions into word code
+    Re-runs until all EXTENDED_ARG prefixes are stable, as they change the jump distances
+    """
+
+    label_positions = {}
+    for i, entry in enumerate(instructions):
+        if isinstance(entry, Label):
+            label_positions[entry] = i
+
+    # the amount of EXTENDED_ARG prefixes per instruction, as index -> count
+    extended = {}
+
+    while True:
+        # offsets in code units
+        offsets = {}
+        label_offsets = {}
+        offset = 0
+
+        for i, entry in enumerate(instructions):
+            if isinstance(entry, Label):
+                label_offsets[entry] = offset
+                continue
+
+            offsets[i] = offset
+            opcode = resolve_jump(entry[0], isinstance(entry[1], Label) and label_positions[entry[1]] < i)
+            offset += 1 + extended.get(i, 0) + dis._inline_cache_entries[dis.opmap[opcode]]
+
+        code = bytearray()
+        changed = False
+
+        for i, entry in enumerate(instructions):
+            if isinstance(entry, Label):
+                continue
+
+            opcode, arg = entry
+
+            if isinstance(arg, Label):
+                if arg not in label_offsets:
+                    raise StackCollectingException(f"jump target {arg} was never placed")
+
+                backward = label_positions[arg] < i
+                opcode = resolve_jump(opcode, backward)
+                next_offset = offsets[i] + 1 + extended.get(i, 0)
+                arg = next_offset - label_offsets[arg] if backward else label_offsets[arg] - next_offset
+
+            prefixes = []
+            value = arg >> 8
+            while value:
+                prefixes.insert(0, value & 0xFF)
+                value >>= 8
+
+            if len(prefixes) != extended.get(i, 0):
+                extended[i] = len(prefixes)
+                changed = True
+
+            for prefix in prefixes:
+                code += bytes((dis.opmap["EXTENDED_ARG"], prefix))
+
+            op = dis.opmap[opcode]
+            code += bytes((op, arg & 0xFF))
+            code += b"\x00\x00" * dis._inline_cache_entries[op]
+
+        if not changed:
+            return bytes(code)
+
+
+def create_line_table(code_units: int) -> bytes:
+    """
+    Creates a location table mapping all instructions to the first line, without column information
+    (code 13 entries of up to 8 code units each, with a line delta of 0), as tracebacks need an entry per instruction
+    """
+
+    table = bytearray()
+    while code_units > 0:
+        length = min(code_units, 8)
+        table += bytes((0x80 | (13 << 3) | (length - 1), 0))
+        code_units -= length
+    return bytes(table)
+
+
+def compute_stack_size(instructions: typing.List) -> int:
+    """
+    Simulates the stack depth over all control flow paths
+    Raises a StackCollectingException on inconsistent depths, stack underflows or paths leaving the code
+    """
+
+    label_positions = {}
+    for i, entry in enumerate(instructions):
+        if isinstance(entry, Label):
+            label_positions[entry] = i
+
+    depths = {}
+    pending = [(0, 0)]
+    max_depth = 0
+
+    while pending:
+        i, depth = pending.pop()
+
+        while True:
+            if i >= len(instructions):
+                raise StackCollectingException("control flow reaches the end of the compiled code")
+
+            if i in depths:
+                if depths[i] != depth:
+                    raise StackCollectingException(f"inconsistent stack depth at {i}: {depths[i]} != {depth}")
+                break
+
+            depths[i] = depth
+            entry = instructions[i]
+
+            if isinstance(entry, Label):
+                i += 1
+                continue
+
+            opcode, arg = entry
+
+            if isinstance(arg, Label):
+                backward = label_positions[arg] < i
+                op = dis.opmap[resolve_jump(opcode, backward)]
+                pending.append((label_positions[arg], depth + dis.stack_effect(op, 0, jump=True)))
+                depth += dis.stack_effect(op, 0, jump=False)
+                opcode = dis.opname[op]
+
+            else:
+                op = dis.opmap[opcode]
+                depth += dis.stack_effect(op, arg if op >= dis.HAVE_ARGUMENT else None)
+
+            if depth < 0:
+                raise StackCollectingException(f"stack underflow at {i} ({opcode})")
+
+            max_depth = max(max_depth, depth)
+
+            if opcode in TERMINAL_OPCODES:
+                break
+
+            i += 1
+
+    return max_depth
+
+
+async def emit_instructions(code: jvm.api.AbstractBytecodeContainer, builder: PyBytecodeBuilder) -> bool:
+    """
+    Runs the prepare_python_bytecode_instructions() hooks of all instructions of the code into the builder,
+    placing a label (see CodeObjectBuilder.get_java_label()) in front of each instruction
+    Returns False when an instruction has no python bytecode equivalent
+    """
+
+    try:
+        for i, entry in enumerate(code.decoded_code):
+            if entry is None:
+                continue
+
+            builder.current_index = i
+            builder.place_label(builder.get_java_label(i))
+
+            result = entry[0].prepare_python_bytecode_instructions(i, entry[1], code, builder)
+            if isinstance(result, typing.Awaitable):
+                await result
+
+    except NotImplementedError:
+        return False
+
+    return True
+
+
+def get_arg_count(method) -> int:
+    """
+    The count of local variable slots filled by the arguments, including the instance for non-static methods
+    """
+    return method.method_descriptor.slot_count + int(not method.access & 0x0008)
+
+
+async def compile_method(code: jvm.api.AbstractBytecodeContainer) -> typing.Optional[types.FunctionType]:
+    """
+    Compiles the code of a method into a python function taking the argument local variables of the method
+    Returns None when the code contains instructions without python bytecode equivalent
+    (see BaseInstruction.prepare_python_bytecode_instructions())
+    """
+
+    if not COMPILER_SUPPORTED:
+        return
+
+    method = code.method
+    builder = CodeObjectBuilder()
+
+    if not await emit_instructions(code, builder):
+        return
+
+    arg_count = get_arg_count(method)
+
+    try:
+        assembled = builder.assemble(
+            method.name,
+            f"{method.class_file.name}.{method.name}",
+            f"<java {method.class_file.name}>",
+            arg_count,
+            max(code.code.max_locals, arg_count),
+        )
+
+    except StackCollectingException as e:
+        jvm.logging.warn(f"failed to compile {method} to python bytecode: {e.text}")
+        return
+
+    return types.FunctionType(assembled, {"__builtins__": builtins}, method.name)
@@ -0,0 +1,464 @@
+import builtins
+import hashlib
+import importlib
+import linecache
+import math
+import os
+import typing
+
+import jvm.api
+import jvm.logging
+import jvm.PyBytecode
+from jvm.JavaExceptionStack import StackCollectingException
+from jvm.PyBytecode import CodeObjectBuilder, Label, PyOpcodes
+
+
+# Bump when the generated source changes; persisted sources of other versions are never read
+SOURCE_FORMAT_VERSION = 1
+
+# The name of the function in the generated module
+FUNCTION_NAME = "method"
+
+# Stack effects of the PyOpcodes instructions, with CALL_CONST depending on its argument count
+STACK_EFFECTS = {
+    PyOpcodes.NOP: 0,
+    PyOpcodes.POP_TOP: -1,
+    PyOpcodes.ROT_TWO: 0,
+    PyOpcodes.ROT_THREE: 0,
+    PyOpcodes.DUP_TOP: 1,
+    PyOpcodes.DUP_TOP_TWO: 2,
+    PyOpcodes.LOAD_CONST: 1,
+    PyOpcodes.LOAD_FAST: 1,
+    PyOpcodes.STORE_FAST: -1,
+    PyOpcodes.LOAD_GLOBAL: 1,
+    PyOpcodes.UNARY_NEGATIVE: 0,
+    PyOpcodes.BINARY_SUBSCR: -1,
+    PyOpcodes.STORE_SUBSCR: -3,
+    PyOpcodes.COMPARE_OP: -1,
+    PyOpcodes.IS_OP: -1,
+    PyOpcodes.JUMP_ABSOLUTE: 0,
+    PyOpcodes.POP_JUMP_IF_FALSE: -1,
+    PyOpcodes.POP_JUMP_IF_TRUE: -1,
+    PyOpcodes.RETURN_VALUE: -1,
+}
+
+BINARY_OPERATORS = {
+    PyOpcodes.BINARY_ADD: "+",
+    PyOpcodes.BINARY_SUBTRACT: "-",
+    PyOpcodes.BINARY_MULTIPLY: "*",
+    PyOpcodes.BINARY_FLOOR_DIVIDE: "//",
+    PyOpcodes.BINARY_TRUE_DIVIDE: "/",
+    PyOpcodes.BINARY_MODULO: "%",
+    PyOpcodes.BINARY_LSHIFT: "<<",
+    PyOpcodes.BINARY_RSHIFT: ">>",
+    PyOpcodes.BINARY_AND: "&",
+    PyOpcodes.BINARY_OR: "|",
+    PyOpcodes.BINARY_XOR: "^",
+    PyOpcodes.INPLACE_ADD: "+",
+}
+
+COMPARATORS = ("<", "<=", "==", "!=", ">", ">=")
+
+TERMINAL_OPCODES = {PyOpcodes.JUMP_ABSOLUTE, PyOpcodes.RETURN_VALUE}
+
+
+def get_stack_effect(opcode: str, data) -> int:
+    if opcode in BINARY_OPERATORS:
+        return -1
+    if opcode == PyOpcodes.CALL_CONST:
+        return 1 - data[1]
+    return STACK_EFFECTS[opcode]
+
+
+class PySourceBuilder(CodeObjectBuilder):
+    """
+    Transpiles the instructions emitted by the prepare_python_bytecode_instructions() hooks into python source
+
+    Instead of assembling word code for one interpreter version, the stack depth of each instruction is
+    simulated over all paths, and stack entries become local variables named by their depth ("s0", "s1", ...).
+    Jumps are mapped onto a "pc" variable: the code is split into blocks at the jump targets, each one guarded
+    by "if pc <= <block>:", so entering a block falls through the following ones without re-checking.
+    Backward jumps restart the dispatch from a surrounding "while True:" loop.
+
+    Constants which are not literals are referenced via their import path when possible; otherwise, they are
+    module globals injected at load time, and the source cannot be persisted (see get_source()).
+    """
+
+    def __init__(self):
+        super().__init__()
+
+        # const index -> expression in the source
+        self.const_expressions: typing.Dict[int, str] = {}
+
+        # modules to import, and const index -> object of constants injected at load time
+        self.imports: typing.Set[str] = set()
+        self.injected: typing.Dict[int, typing.Any] = {}
+
+    def get_const_expression(self, index: int) -> str:
+        if index in self.const_expressions:
+            return self.const_expressions[index]
+
+        value = self.consts[index]
+
+        if value is None or isinstance(value, (bool, int, str, bytes)):
+            expression = repr(value)
+
+        elif isinstance(value, float):
+            expression = repr(value) if math.isfinite(value) else f"float({repr(str(value))})"
+
+        elif getattr(builtins, getattr(value, "__name__", ""), None) is value:
+            expression = value.__name__
+
+        else:
+            expression = self.resolve_import_path(value)
+
+            if expression is None:
+                expression = f"const_{index}"
+                self.injected[index] = value
+
+        self.const_expressions[index] = expression
+        return expression
+
+    def resolve_import_path(self, value) -> typing.Optional[str]:
+        module = getattr(value, "__module__", None)
+        qualified_name = getattr(value, "__qualname__", None)
+
+        if module is None or qualified_name is None or "<" in qualified_name:
+            return
+
+        try:
+            obj = importlib.import_module(module)
+            for part in qualified_name.split("."):
+                obj = getattr(obj, part)
+        except (ImportError, AttributeError):
+            return
+
+        if obj is not value:
+            return
+
+        self.imports.add(module)
+        return f"{module}.{qualified_name}"
+
+    def compute_depths(self) -> typing.Dict[int, int]:
+        """
+        Simulates the stack depth in front of each reachable instruction of the sequence
+        """
+
+        label_positions = {
+            entry: i for i, entry in enumerate(self.instruction_sequence) if isinstance(entry, Label)
+        }
+
+        depths = {}
+        pending = [(0, 0)]
+
+        while pending:
+            i, depth = pending.pop()
+
+            while True:
+                if i >= len(self.instruction_sequence):
+                    raise StackCollectingException("control flow reaches the end of the transpiled code")
+
+                if i in depths:
+                    if depths[i] != depth:
+                        raise StackCollectingException(f"inconsistent stack depth at {i}: {depths[i]} != {depth}")
+                    break
+
+                depths[i] = depth
+                entry = self.instruction_sequence[i]
+
+                if not isinstance(entry, Label):
+                    opcode, data = entry
+                    depth += get_stack_effect(opcode, data)
+
+                    if depth < 0:
+                        raise StackCollectingException(f"stack underflow at {i} ({opcode})")
+
+                    if isinstance(data, Label):
+                        pending.append((label_positions[data], depth))
+
+                    if opcode in TERMINAL_OPCODES:
+                        break
+
+                i += 1
+
+        return depths
+
+    def get_source(self, name: str, arg_count: int, local_count: int) -> typing.Tuple[str, bool]:
+        """
+        Creates the module source defining the function FUNCTION_NAME, taking the first 'arg_count' of
+        'local_count' local variables as arguments
+        Returns the source and if it can be persisted (see PySourceBuilder)
+        """
+
+        depths = self.compute_depths()
+        sequence = self.instruction_sequence
+
+        label_positions = {entry: i for i, entry in enumerate(sequence) if isinstance(entry, Label)}
+
+        # Blocks start at jump targets and behind conditional jumps, so a taken jump skips the rest of its block
+        targets = set()
+        for i, entry in enumerate(sequence):
+            if not isinstance(entry, Label) and isinstance(entry[1], Label):
+                targets.add(label_positions[entry[1]])
+
+                if entry[0] != PyOpcodes.JUMP_ABSOLUTE:
+                    targets.add(i + 1)
+
+        # A jump to a position not behind the jumping instruction needs to restart the block dispatch
+        has_backward_jumps = any(
+            label_positions[entry[1]] <= i
+            for i, entry in enumerate(sequence)
+            if i in depths and not isinstance(entry, Label) and isinstance(entry[1], Label)
+        )
+
+        body: typing.List[str] = []
+        block_indent = "        " if has_backward_jumps else "    "
+        indent = block_indent
+
+        def open_block(position: int):
+            # Blocks may be empty, e.g. for consecutive jump targets
+            if body and body[-1].endswith(":") and body[-1].startswith(f"{block_indent}if pc <= "):
+                body.append(f"{indent}pass")
+            body.append(f"{block_indent}if pc <= {position}:")
+
+        if targets:
+            indent += "    "
+            open_block(0)
+
+        i = 0
+        while i < len(sequence):
+            entry = sequence[i]
+
+            if i not in depths:
+                i += 1
+                continue
+
+            if i in targets and i != 0:
+                open_block(i)
+
+            if isinstance(entry, Label):
+                i += 1
+                continue
+
+            opcode, data = entry
+            d = depths[i]
+
+            # A comparison directly followed by a conditional jump becomes the condition of the jump
+            if opcode in (PyOpcodes.COMPARE_OP, PyOpcodes.IS_OP) and i + 1 < len(sequence):
+                following = sequence[i + 1]
+                if not isinstance(following, Label) and following[0] in (PyOpcodes.POP_JUMP_IF_TRUE, PyOpcodes.POP_JUMP_IF_FALSE):
+                    condition = self.get_condition(opcode, data, f"s{d - 2}", f"s{d - 1}")
+                    if following[0] == PyOpcodes.POP_JUMP_IF_FALSE:
+                        condition = f"not ({condition})"
+
+                    self.add_jump(body, indent, condition, label_positions[following[1]], i + 1)
+                    i += 2
+                    continue
+
+            self.add_statement(body, indent, opcode, data, d, label_positions, i)
+            i += 1
+
+        lines = [
+            f"# {name}, transpiled from java bytecode (format version {SOURCE_FORMAT_VERSION})",
+        ]
+        lines += [f"import {module}" for module in sorted(self.imports)]
+        lines += ["", ""]
+
+        arguments = ", ".join(f"local_{i}" for i in range(arg_count))
+        lines.append(f"def {FUNCTION_NAME}({arguments}):")
+        lines += [f"    local_{i} = None" for i in range(arg_count, local_count)]
+
+        if targets:
+            lines.append("    pc = 0")
+        if has_backward_jumps:
+            lines.append("    while True:")
+
+        if body and body[-1].endswith(":"):
+            body.append(f"{indent}pass")
+
+        lines += body
+        lines.append("")
+
+        return "\n".join(lines), not self.injected
+
+    def get_condition(self, opcode: str, data, a: str, b: str) -> str:
+        if opcode == PyOpcodes.COMPARE_OP:
+            return f"{a} {COMPARATORS[data]} {b}"
+        return f"{a} {'is not' if data else 'is'} {b}"
+
+    def add_jump(self, body: typing.List[str], indent: str, condition: typing.Optional[str], target: int, position: int):
+        if condition is not None:
+            body.append(f"{indent}if {condition}:")
+            indent += "    "
+
+        body.append(f"{indent}pc = {target}")
+        if target <= position:
+            body.append(f"{indent}continue")
+
+    def add_statement(self, body: typing.List[str], indent: str, opcode: str, data, d: int, label_positions, position: int):
+        def emit(line: str):
+            body.append(indent + line)
+
+        if opcode in (PyOpcodes.NOP, PyOpcodes.POP_TOP):
+            pass
+
+        elif opcode == PyOpcodes.ROT_TWO:
+            emit(f"s{d - 2}, s{d - 1} = s{d - 1}, s{d - 2}")
+
+        elif opcode == PyOpcodes.ROT_THREE:
+            emit(f"s{d - 3}, s{d - 2}, s{d - 1} = s{d - 1}, s{d - 3}, s{d - 2}")
+
+        elif opcode == PyOpcodes.DUP_TOP:
+            emit(f"s{d} = s{d - 1}")
+
+        elif opcode == PyOpcodes.DUP_TOP_TWO:
+            emit(f"s{d}, s{d + 1} = s{d - 2}, s{d - 1}")
+
+        elif opcode == PyOpcodes.LOAD_CONST:
+            emit(f"s{d} = {self.get_const_expression(data)}")
+
+        elif opcode == PyOpcodes.LOAD_FAST:
+            emit(f"s{d} = local_{data}")
+
+        elif opcode == PyOpcodes.STORE_FAST:
+            emit(f"local_{data} = s{d - 1}")
+
+        elif opcode == PyOpcodes.LOAD_GLOBAL:
+            emit(f"s{d} = {self.names[data]}")
+
+        elif opcode in BINARY_OPERATORS:
+            emit(f"s{d - 2} = s{d - 2} {BINARY_OPERATORS[opcode]} s{d - 1}")
+
+        elif opcode == PyOpcodes.UNARY_NEGATIVE:
+            emit(f"s{d - 1} = -s{d - 1}")
+
+        elif opcode == PyOpcodes.BINARY_SUBSCR:
+            emit(f"s{d - 2} = s{d - 2}[s{d - 1}]")
+
+        elif opcode == PyOpcodes.STORE_SUBSCR:
+            emit(f"s{d - 2}[s{d - 1}] = s{d - 3}")
+
+        elif opcode in (PyOpcodes.COMPARE_OP, PyOpcodes.IS_OP):
+            emit(f"s{d - 2} = {self.get_condition(opcode, data, f's{d - 2}', f's{d - 1}')}")
+
+        elif opcode == PyOpcodes.JUMP_ABSOLUTE:
+            self.add_jump(body, indent, None, label_positions[data], position)
+
+        elif opcode == PyOpcodes.POP_JUMP_IF_TRUE:
+            self.add_jump(body, indent, f"s{d - 1}", label_positions[data], position)
+
+        elif opcode == PyOpcodes.POP_JUMP_IF_FALSE:
+            self.add_jump(body, indent, f"not s{d - 1}", label_positions[data], position)
+
+        elif opcode == PyOpcodes.RETURN_VALUE:
+            emit(f"return s{d - 1}")
+
+        elif opcode == PyOpcodes.CALL_CONST:
+            const, arg_count = data
+            arguments = ", ".join(f"s{i}" for i in range(d - arg_count, d))
+            emit(f"s{d - arg_count} = {self.get_const_expression(const)}({arguments})")
+
+        else:
+            raise StackCollectingException(f"unknown python bytecode instruction {opcode} (data: {data})")
+
+
+def get_source_key(code: jvm.api.AbstractBytecodeContainer, builder: PySourceBuilder) -> str:
+    """
+    Returns the key of the persisted source of the method, including the constants emitted into the builder,
+    as the source contains them as literals while the code only references constant pool indices
+    """
+
+    method = code.method
+    key = hashlib.sha1(f"{method.class_file.name}:{method.name}:{method.signature}:{SOURCE_FORMAT_VERSION}:".encode("utf-8"))
+    key.update(code.code.code)
+
+    for index in range(len(builder.consts)):
+        key.update(f"\n{builder.get_const_expression(index)}".encode("utf-8"))
+
+    return key.hexdigest()
+
+
+def load_source(source: str, filename: str, name: str, injected: typing.Dict[int, typing.Any] = None) -> typing.Callable:
+    # Registering the source makes the lines show up in tracebacks
+    linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+
+    namespace = {"__builtins__": builtins, "__name__": filename}
+    if injected:
+        namespace.update({f"const_{index}": value for index, value in injected.items()})
+
+    exec(compile(source, filename, "exec"), namespace)
+
+    function = namespace[FUNCTION_NAME]
+    function.__name__ = function.__qualname__ = name
+    return function
+
+
+def read_persisted_source(path: str) -> typing.Optional[str]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return
+    except (OSError, UnicodeDecodeError):
+        jvm.logging.warn(f"failed to read transpiled source {path}")
+
+
+def persist_source(path: str, source: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # Write to a temporary file and move it over, so concurrent readers never see partial files
+    temp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp, "w", encoding="utf-8") as f:
+            f.write(source)
+        os.replace(temp, path)
+    except OSError:
+        jvm.logging.warn(f"failed to write transpiled source {path}")
+        try:
+            os.remove(temp)
+        except OSError:
+            pass
+
+
+async def compile_method(code: jvm.api.AbstractBytecodeContainer, directory: str = None) -> typing.Optional[typing.Callable]:
+    """
+    Transpiles the code of a method to python source and compiles it into a python function taking
+    the argument local variables of the method
+    Returns None when the code contains instructions without python equivalent
+
+    When 'directory' is set, the source is persisted there and reused on later runs
+    """
+
+    method = code.method
+    name = f"{method.class_file.name}.{method.name}"
+    filename = f"<java {method.class_file.name}.{method.name}{method.signature}>"
+
+    builder = PySourceBuilder()
+    if not await jvm.PyBytecode.emit_instructions(code, builder):
+        return
+
+    path = os.path.join(directory, f"{get_source_key(code, builder)}.py") if directory is not None else None
+
+    if path is not None:
+        source = read_persisted_source(path)
+
+        if source is not None:
+            try:
+                return load_source(source, filename, name)
+            except Exception:
+                jvm.logging.warn(f"dropping invalid transpiled source {path}")
+
+    arg_count = jvm.PyBytecode.get_arg_count(method)
+
+    try:
+        source, persistable = builder.get_source(name, arg_count, max(code.code.max_locals, arg_count))
+    except StackCollectingException as e:
+        jvm.logging.warn(f"failed to transpile {method} to python source: {e.text}")
+        return
+
+    function = load_source(source, filename, name, builder.injected)
+
+    if path is not None and persistable:
+        persist_source(path, source)
+
+    return function
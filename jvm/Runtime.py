@@ -11,6 +11,9 @@ Mod loader inspired by "Minecraft Forge" (https://github.com/MinecraftForge/Mine
 
 This project is not official by mojang and does not relate to it.
 """
+import bisect
+import collections
+import contextvars
 import sys
 import typing
 
@@ -18,6 +21,8 @@ import jvm.Java
 import jvm.api
 import jvm.JavaAttributes
 import jvm.logging
+import jvm.PyBytecode
+import jvm.PySource
 import jvm.util
 from jvm.api import AbstractBytecodeContainer
 from jvm.api import AbstractStack, AbstractRuntime
@@ -25,26 +30,136 @@ from jvm.JavaExceptionStack import StackCollectingException
 import jvm.RuntimeModificationUtil
 from jvm.api import BaseInstruction
 from jvm.api import AbstractMethod
+from jvm.util import get_method_descriptor
 
 DEBUG = "--debug-vm" in sys.argv
 
+# Keeps the last executed instructions of each method invocation for error reports, see Stack.run_traced()
+TRACE = "--trace-vm" in sys.argv
+
+# The Runtime of the current logical thread, see Runtime.get_current()
+CURRENT_RUNTIME: contextvars.ContextVar["Runtime"] = contextvars.ContextVar("CURRENT_RUNTIME")
+
+# The parents of the throwable classes implemented as native classes, which have no parent information
+NATIVE_THROWABLE_PARENTS = {
+    "java/lang/Exception": "java/lang/Throwable",
+    "java/lang/Error": "java/lang/Throwable",
+    "java/lang/RuntimeException": "java/lang/Exception",
+    "java/lang/ReflectiveOperationException": "java/lang/Exception",
+    "java/lang/ClassNotFoundException": "java/lang/ReflectiveOperationException",
+    "java/lang/InterruptedException": "java/lang/Exception",
+    "java/io/IOException": "java/lang/Exception",
+    "java/io/FileNotFoundException": "java/io/IOException",
+    "java/lang/IllegalArgumentException": "java/lang/RuntimeException",
+    "java/lang/NumberFormatException": "java/lang/IllegalArgumentException",
+    "java/lang/IllegalStateException": "java/lang/RuntimeException",
+    "java/lang/NullPointerException": "java/lang/RuntimeException",
+    "java/lang/ClassCastException": "java/lang/RuntimeException",
+    "java/lang/ArithmeticException": "java/lang/RuntimeException",
+    "java/lang/UnsupportedOperationException": "java/lang/RuntimeException",
+    "java/lang/IndexOutOfBoundsException": "java/lang/RuntimeException",
+    "java/lang/ArrayIndexOutOfBoundsException": "java/lang/IndexOutOfBoundsException",
+    "java/util/NoSuchElementException": "java/lang/RuntimeException",
+    "java/util/ConcurrentModificationException": "java/lang/RuntimeException",
+    "java/lang/AssertionError": "java/lang/Error",
+    "java/lang/LinkageError": "java/lang/Error",
+}
+
+
+async def is_subclass_of(cls: jvm.api.AbstractJavaClass, class_name: str) -> bool:
+    """
+    Checks if the class is or inherits from the class with the given name, walking up the parent classes
+    """
+
+    pending = [cls]
+    while pending:
+        cls = pending.pop()
+
+        if cls.name == class_name:
+            return True
+
+        if isinstance(cls, jvm.Java.JavaBytecodeClass):
+            if cls.parent is not None:
+                parent = await cls.parent()
+                if isinstance(parent, typing.Awaitable):
+                    parent = await parent
+                pending.append(parent)
+
+        elif getattr(cls, "parents", None):
+            pending.extend(cls.parents)
+
+        else:
+            name = NATIVE_THROWABLE_PARENTS.get(cls.name)
+            while name is not None:
+                if name == class_name:
+                    return True
+                name = NATIVE_THROWABLE_PARENTS.get(name)
+
+    return False
+
 
 class Runtime(AbstractRuntime):
     """
     A Runtime is a "frame" in the current VM
     Each thread needs an own Runtime
     A Runtime hold the "flow" between methods
+
+    Stacks of finished invocations are kept in a pool and reused for the next invocations
     """
 
+    # Upper bound of unused stacks kept around for reuse
+    MAX_POOLED_STACKS = 64
+
     def __init__(self):
         self.stacks: typing.List["Stack"] = []
+        self.stack_pool: typing.List["Stack"] = []
+
+    @classmethod
+    def get_current(cls) -> "Runtime":
+        """
+        Returns the Runtime of the current logical thread (the context of the running asyncio task),
+        creating it on first use
+        """
+
+        runtime = CURRENT_RUNTIME.get(None)
+
+        if runtime is None:
+            runtime = cls()
+            CURRENT_RUNTIME.set(runtime)
+
+        return runtime
 
     def spawn_stack(self):
-        stack = Stack()
-        stack.runtime = self
+        if self.stack_pool:
+            stack = self.stack_pool.pop()
+        else:
+            stack = Stack()
+            stack.runtime = self
+
         self.stacks.append(stack)
         return stack
 
+    def release_stack(self, stack: "Stack"):
+        """
+        Hands a stack spawned by spawn_stack() back for reuse, after its invocation finished
+        """
+
+        if self.stacks[-1] is stack:
+            self.stacks.pop(-1)
+        else:
+            # Invocations of different tasks sharing this runtime may finish out of order
+            self.stacks.remove(stack)
+
+        # Drop the references, so the pool does not keep objects alive
+        stack.stack.clear()
+        if stack.code is not None:
+            stack.local_vars[:] = stack.code.empty_local_vars
+
+        stack.code = stack.method = stack.return_value = None
+
+        if len(self.stack_pool) < self.MAX_POOLED_STACKS:
+            self.stack_pool.append(stack)
+
     async def run_method(self, method: typing.Union[jvm.Java.JavaMethod, typing.Callable], *args, stack=None):
         if callable(method) and not isinstance(
             method, jvm.Java.JavaMethod
@@ -59,7 +174,9 @@ class Runtime(AbstractRuntime):
                     result = method(*args, stack=stack)
 
                 if isinstance(result, typing.Awaitable):
-                    await result
+                    result = await result
+
+                return result
 
             except StackCollectingException as e:
                 e.add_trace("invoking native " + str(method) + " with " + str(args))
@@ -71,8 +188,7 @@ class Runtime(AbstractRuntime):
                     f"during invoking native {method} with {args}"
                 )
             finally:
-                if self.stacks[-1] == stack:
-                    self.stacks.pop(-1)
+                self.release_stack(stack)
 
         if method.code_repr is None:
             if isinstance(method, jvm.Java.JavaMethod):
@@ -92,75 +208,62 @@ class Runtime(AbstractRuntime):
             else:
                 return await method.invoke(args, stack=stack)
 
+        code = method.code_repr
+        if code.python_function is None:
+            code.invocation_count += 1
+            if code.invocation_count == jvm.api.PY_COMPILATION_THRESHOLD:
+                await code.compile_to_python()
+
+        # Callers passing args without the None entries for long & double arguments stay in the interpreter
+        if code.python_function is not None and len(args) == code.python_function.__code__.co_argcount:
+            return self.run_compiled(method, code.python_function, args)
+
         stack = self.spawn_stack()
         stack.vm = method.get_parent_class().vm
 
-        stack.code = method.code_repr
         stack.method = method
-        method.code_repr.prepare_stack(stack)
-        stack.local_vars[: len(args)] = list(args)
-
-        await stack.run()
-
-        return stack.return_value
-
-    @classmethod
-    def get_arg_parts_of(
-        cls,
-        method: typing.Union[jvm.Java.JavaMethod, typing.Callable],
-    ) -> typing.Iterator[str]:
-
-        if hasattr(method, "signature"):
-            signature = method.signature
-        elif hasattr(method, "native_signature"):
-            signature = method.native_signature
-        elif isinstance(method, str):
-            signature = method
-        else:
-            raise ValueError(method)
+        code.prepare_stack(stack)
+        stack.local_vars[: len(args)] = args
 
-        if signature is None:
-            raise RuntimeError(method)
-
-        if not signature.startswith("("):
-            raise StackCollectingException(f"invalid signature: {signature}")
+        try:
+            await stack.run()
 
-        v = signature.removeprefix("(").split(")")[0]
-        i = 0
-        start = 0
+            return stack.return_value
+        finally:
+            self.release_stack(stack)
 
+    @staticmethod
+    def run_compiled(method: jvm.Java.JavaMethod, function: typing.Callable, args):
         try:
-            while i < len(v):
-                is_array = False
+            return function(*args)
 
-                if v[i] == "[":
-                    is_array = True
-
-                if v[i] == "L":
-                    i = v.index(";", i) + 1
-                    yield v[start:i], False
-                else:
-                    i += 1
-                    if not is_array:
-                        yield v[start:i], v[i - 1] in "DJ"
+        except StackCollectingException as e:
+            e.add_trace(f"during invoking python compiled {method}")
+            e.add_method_invocation_step(method)
+            raise
 
-                if not is_array:
-                    start = i
         except:
-            raise StackCollectingException(f"cannot parse argument list {signature}")
+            raise StackCollectingException(
+                f"Implementation-wise during invoking python compiled {method} with {args}"
+            )
 
-        yield from tuple()
+    @classmethod
+    def get_arg_parts_of(
+        cls,
+        method: typing.Union[jvm.Java.JavaMethod, typing.Callable],
+    ) -> typing.Iterator[str]:
+        return iter(get_method_descriptor(method).arg_parts)
 
     def parse_args_from_stack(self, method, stack, static=False):
         try:
-            parts = tuple(self.get_arg_parts_of(method))
+            descriptor = get_method_descriptor(method)
             previous_count = len(stack.stack)
         except StackCollectingException as e:
             e.add_trace("during parsing args").add_trace(str(stack.stack))
             raise
 
         try:
-            args = [stack.pop() for _ in range(len(parts))]
+            args = [stack.pop() for _ in range(descriptor.pop_count)]
 
             if not static:
                 obj = stack.pop()
@@ -168,16 +271,13 @@ class Runtime(AbstractRuntime):
 
         except StackCollectingException as e:
             e.add_trace(
-                f"StackUnderflowException during preparing method execution of '{method}' (static: {static}) with stack size before data popping {previous_count}, expecting {len(parts)+(int(not static))} ({parts})"
+                f"StackUnderflowException during preparing method execution of '{method}' (static: {static}) with stack size before data popping {previous_count}, expecting {descriptor.pop_count+(int(not static))} ({descriptor.arg_parts})"
             )
             raise
 
-        if isinstance(method, jvm.Java.JavaMethod):
-            offset = 0
-            for i, (_, state) in enumerate(parts):
-                if state:
-                    args.insert(i + offset - 1, None)
-                    offset += 1
+        if descriptor.wide_insert_positions and isinstance(method, jvm.Java.JavaMethod):
+            for position in descriptor.wide_insert_positions:
+                args.insert(position, None)
 
         return tuple(reversed(args))
 
@@ -186,6 +286,8 @@ class Runtime(AbstractRuntime):
 
 
 class Stack(AbstractStack):
+    __slots__ = ()
+
     def pop(self):
         if len(self.stack) == 0:
             raise StackCollectingException("StackUnderflowException")
@@ -206,95 +308,186 @@ class Stack(AbstractStack):
     async def run(self):
         """
         Runs the data on this stack
+        The instructions are executed in a plain loop, see run_traced() for the variant used when tracing
+        or debugging
         """
 
         if self.vm is None:
             self.vm = self.method.get_parent_class().vm
 
+        method = self.method
+
         # todo: check for class debugging
-        debugging = (
-            DEBUG
-            or (self.method.class_file.name, self.method.name, self.method.signature)
-            in self.method.class_file.vm.debugged_methods
+        debugging = DEBUG or (
+            method.class_file.vm.debugged_methods
+            and (method.class_file.name, method.name, method.signature) in method.class_file.vm.debugged_methods
         )
 
         # todo: is this really needed?
-        await self.method.class_file.prepare_use()
-        if debugging:
-            jvm.logging.warn(f"launching method {self.method} with local vars {self.local_vars}")
+        await method.class_file.prepare_use(self.runtime)
 
-        history = []
+        if debugging or TRACE:
+            await self.run_traced(debugging)
+            return
 
+        decoded_code = self.code.decoded_code
+        instruction = None
+
+        # Left only for jumping into exception handlers
         while self.cp != -1:
-            history.append(self.cp)
+            try:
+                while self.cp != -1:
+                    instruction = decoded_code[self.cp]
 
-            if len(history) > 20:
-                history.pop(0)
+                    if instruction[0].IS_ASYNC:
+                        result = await instruction[0].invoke(instruction[1], self)
+                    else:
+                        result = instruction[0].invoke(instruction[1], self)
 
-            instruction = self.code.decoded_code[self.cp]
+                    if not result and self.cp != -1:
+                        self.cp += instruction[2]
 
-            if instruction is None:
-                next_below = None
-                for i in range(self.cp, -1, -1):
-                    if self.code.decoded_code[i] is not None:
-                        next_below = self.code.decoded_code[i]
-                        break
+            except StackCollectingException as e:
+                if e.base is None or not await self.jump_to_exception_handler(e.base):
+                    self.add_invocation_trace(e, instruction)
+                    raise
 
-                raise StackCollectingException(
-                    "Instruction jump target was invalid [null -> inside instruction data]"
-                ).add_trace(f"during fetching {self.cp} in {self.method}").add_trace(
-                    f"next below: {next_below}"
-                )
+            except:
+                await self.raise_implementation_error(instruction)
 
-            if debugging:
-                jvm.logging.warn(
-                    "instruction [info before invoke] " + str((self.cp, instruction))
-                )
-                jvm.logging.warn(
-                    f"stack ({len(self.stack)}): " + str(self.stack)[-300:]
-                )
-                jvm.logging.warn(
-                    f"local ({len(self.local_vars)}): " + str(self.local_vars)[:300]
-                )
+    async def run_traced(self, debugging: bool):
+        """
+        Runs the data on this stack, keeping the last executed instructions for error reports
+        :param debugging: if the state should be logged around each instruction
+        """
+
+        if debugging:
+            jvm.logging.warn(f"launching method {self.method} with local vars {self.local_vars}")
 
+        history = collections.deque(maxlen=20)
+        decoded_code = self.code.decoded_code
+        instruction = None
+
+        # Left only for jumping into exception handlers
+        while self.cp != -1:
             try:
-                result = instruction[0].invoke(instruction[1], self)
-                if isinstance(result, typing.Awaitable):
-                    result = await result
+                while self.cp != -1:
+                    history.append(self.cp)
+                    instruction = decoded_code[self.cp]
+
+                    if debugging and instruction is not None:
+                        jvm.logging.warn(
+                            "instruction [info before invoke] " + str((self.cp, instruction))
+                        )
+                        jvm.logging.warn(
+                            f"stack ({len(self.stack)}): " + str(self.stack)[-300:]
+                        )
+                        jvm.logging.warn(
+                            f"local ({len(self.local_vars)}): " + str(self.local_vars)[:300]
+                        )
+
+                    if instruction[0].IS_ASYNC:
+                        result = await instruction[0].invoke(instruction[1], self)
+                    else:
+                        result = instruction[0].invoke(instruction[1], self)
 
-            except StackCollectingException as e:
-                # This exception MAY be caused by a wrong InvokeDynamic reference (missing static attribute)
-                if e.text == "StackUnderflowException":
-                    for cp in history:
-                        if self.code.decoded_code[cp][0].__name__ == "LambdaInvokeDynamic":
-                            e.add_trace(f"after InvokeDynamic on {self.code.decoded_code[cp]}")
+                    if not result and self.cp != -1:
+                        self.cp += instruction[2]
 
-                e.add_trace(
-                    f"during invoking {instruction[0]} in {self.method} [index: {self.cp}]"
-                )
-                e.add_method_invocation_step(self.method)
-                raise
-            except:
-                if isinstance(self.method, jvm.Java.JavaMethod):
-                    await self.method.print_stats(current=self.cp)
+            except StackCollectingException as e:
+                if e.base is None or not await self.jump_to_exception_handler(e.base):
+                    self.add_invocation_trace(e, instruction, history)
+                    raise
 
-                raise StackCollectingException(
-                    f"Implementation-wise during invoking {instruction[0].__name__} in {self.method} [index: {self.cp}]"
-                ).add_trace(str(instruction[1])).add_trace(str(instruction[2]))
+                if debugging:
+                    jvm.logging.warn(f"jumping to exception handler at {self.cp} for {e.base}")
 
-            if not result and self.cp != -1:
-                try:
-                    self.cp += instruction[2]
-                except:
-                    raise StackCollectingException(
-                        f"Implementation-wise during increasing command pointer of {instruction[0].__name__} in {self.method} [index: {self.cp}]"
-                    ).add_trace(str(instruction[1])).add_trace(str(instruction[2]))
+            except:
+                await self.raise_implementation_error(instruction)
 
         if debugging:
             jvm.logging.warn(
                 repr(("finished method", self.method, self.return_value))
             )
 
+    async def jump_to_exception_handler(self, exception) -> bool:
+        """
+        Jumps to the first exception handler covering the current instruction and catching the exception,
+        with only the exception on the stack
+        Returns False when there is none
+        """
+
+        handlers = self.code.get_exception_handlers(self.cp)
+        if not handlers:
+            return False
+
+        cls = None
+        for handler, class_name in handlers:
+            if class_name is not None:
+                if cls is None:
+                    if not hasattr(exception, "get_class"):
+                        continue
+                    cls = await exception.get_class()
+
+                if not await is_subclass_of(cls, class_name):
+                    continue
+
+            self.stack.clear()
+            self.push(exception)
+            self.cp = handler
+            return True
+
+        return False
+
+    def add_invocation_trace(self, e: StackCollectingException, instruction, history: typing.Iterable[int] = None):
+        """
+        Adds the information about the failing instruction to an exception raised during run()
+        :param history: the indices of the last executed instructions, when tracked
+        """
+
+        # This exception MAY be caused by a wrong InvokeDynamic reference (missing static attribute)
+        if e.text == "StackUnderflowException":
+            if history is not None:
+                for cp in history:
+                    if self.code.decoded_code[cp][0].__name__ == "LambdaInvokeDynamic":
+                        e.add_trace(f"after InvokeDynamic on {self.code.decoded_code[cp]}")
+
+            else:
+                # Without history, name the ones which could have been executed before
+                for cp, entry in enumerate(self.code.decoded_code[:self.cp]):
+                    if entry is not None and entry[0].__name__ == "LambdaInvokeDynamic":
+                        e.add_trace(f"possibly after InvokeDynamic on {entry} [index: {cp}]")
+
+        e.add_trace(
+            f"during invoking {instruction[0] if instruction is not None else None} in {self.method} [index: {self.cp}]"
+        )
+        e.add_method_invocation_step(self.method)
+
+    async def raise_implementation_error(self, instruction):
+        """
+        Raises the exception for a non-java exception raised during run(), called from within the except block
+        """
+
+        if instruction is None and 0 <= self.cp < len(self.code.decoded_code):
+            next_below = None
+            for i in range(self.cp, -1, -1):
+                if self.code.decoded_code[i] is not None:
+                    next_below = self.code.decoded_code[i]
+                    break
+
+            raise StackCollectingException(
+                "Instruction jump target was invalid [null -> inside instruction data]"
+            ).add_trace(f"during fetching {self.cp} in {self.method}").add_trace(
+                f"next below: {next_below}"
+            )
+
+        if isinstance(self.method, jvm.Java.JavaMethod):
+            await self.method.print_stats(current=self.cp)
+
+        raise StackCollectingException(
+            f"Implementation-wise during invoking {instruction[0].__name__ if instruction is not None else None} in {self.method} [index: {self.cp}]"
+        ).add_trace(str(instruction[1] if instruction is not None else None)).add_trace(str(instruction[2] if instruction is not None else None))
+
 
 class VirtualStack(AbstractStack):
     def __init__(self):
@@ -356,6 +549,21 @@ class BytecodeRepr(AbstractBytecodeContainer):
             typing.Optional[typing.Tuple[BaseInstruction, typing.Any, int]]
         ] = [None] * len(code.code)
 
+        # Tiering: after jvm.api.PY_COMPILATION_THRESHOLD invocations, the code is compiled to a python function
+        # (see compile_to_python()), which Runtime.run_method() calls instead of interpreting the code
+        self.invocation_count = 0
+        self.python_function: typing.Optional[typing.Callable] = None
+
+        # The initial local variable state, copied into the stacks by prepare_stack()
+        self.empty_local_vars = (None,) * code.max_locals
+
+        # The exception table as interval index: the code is split at all start and end indices of the
+        # handler ranges, exception_handlers[i] holding the handlers covering exception_bounds[i] up to
+        # exception_bounds[i + 1] in table order, see get_exception_handlers()
+        self.exception_bounds: typing.List[int] = []
+        self.exception_handlers: typing.List[typing.Tuple[typing.Tuple[int, typing.Optional[str]], ...]] = []
+        self.create_exception_index()
+
         # todo: use to indicate if bytecodes are jump-targets for optimisation lookup
         # self.is_jump_target = array.ArrayType("b")
 
@@ -392,6 +600,33 @@ class BytecodeRepr(AbstractBytecodeContainer):
                     + ")"
                 ).add_trace(str(self.decoded_code)).add_trace(str(self.code.class_file))
 
+    def create_exception_index(self):
+        table = [
+            (start, end, handler, self.code.class_file.cp[catch - 1][1][1] if catch != 0 else None)
+            for start, end, handler, catch in self.code.exception_table
+        ]
+
+        self.exception_bounds = sorted({index for entry in table for index in entry[:2]})
+        self.exception_handlers = [
+            tuple((handler, catch) for start, end, handler, catch in table if start <= bound < end)
+            for bound in self.exception_bounds
+        ]
+
+    def get_exception_handlers(self, index: int) -> typing.Tuple[typing.Tuple[int, typing.Optional[str]], ...]:
+        """
+        Returns the handlers covering the instruction at the given index as (handler index, catch class name),
+        in the order of the exception table, with None as class name for handlers catching everything
+        """
+
+        i = bisect.bisect_right(self.exception_bounds, index) - 1
+        return self.exception_handlers[i] if i >= 0 else ()
+
+    def get_exception_table_boundaries(self) -> typing.Set[int]:
+        """
+        The indices where handler ranges start or end, and the handler entry points
+        """
+        return set(self.exception_bounds) | {handler for handlers in self.exception_handlers for handler, _ in handlers}
+
     async def optimiser_iteration(self):
         """
         Runs optimiser code on the internal bytecode
@@ -425,6 +660,70 @@ class BytecodeRepr(AbstractBytecodeContainer):
 
         self.validate_code()
 
+        if jvm.api.FUSE_INSTRUCTIONS:
+            self.fuse_instructions()
+
+    def fuse_instructions(self):
+        """
+        Replaces sequences of instructions matching the pattern of a superinstruction (see
+        AbstractBytecodeContainer.SUPERINSTRUCTIONS) with the superinstruction, invoked with one dispatch
+
+        The superinstruction only takes the slot of the first instruction, the other ones stay in place
+        as jump targets, so no jump offsets need to be changed
+        """
+
+        heads = [i for i, e in enumerate(self.decoded_code) if e is not None]
+
+        # Fused sequences stay within one handler range, so the index of a throwing instruction
+        # resolves to the same handlers as before
+        boundaries = self.get_exception_table_boundaries()
+
+        i = 0
+        while i < len(heads):
+            for instr in self.SUPERINSTRUCTIONS:
+                indices = heads[i:i + len(instr.PATTERN)]
+
+                if len(indices) != len(instr.PATTERN) or not all(
+                    issubclass(self.decoded_code[index][0], expected)
+                    for index, expected in zip(indices, instr.PATTERN)
+                ):
+                    continue
+
+                if boundaries and any(index in boundaries for index in indices[1:]):
+                    continue
+
+                data = instr.fuse(self, indices)
+                if data is None:
+                    continue
+
+                last = self.decoded_code[indices[-1]]
+                self.decoded_code[indices[0]] = (instr, data, indices[-1] + last[2] - indices[0])
+                i += len(indices)
+                break
+
+            else:
+                i += 1
+
+    async def compile_to_python(self):
+        """
+        Compiles the code to a python function via the backend selected by jvm.api.PY_COMPILATION_BACKEND,
+        when all instructions support it
+        Debugged methods are never compiled, as the interpreter does the debug output
+        """
+
+        method = self.method
+        if DEBUG or (method.class_file.name, method.name, method.signature) in method.class_file.vm.debugged_methods:
+            return
+
+        # The compiled functions have no exception handler dispatch
+        if self.exception_handlers:
+            return
+
+        if jvm.api.PY_COMPILATION_BACKEND == "source" or not jvm.PyBytecode.COMPILER_SUPPORTED:
+            self.python_function = await jvm.PySource.compile_method(self, jvm.api.PY_SOURCE_DIRECTORY)
+        else:
+            self.python_function = await jvm.PyBytecode.compile_method(self)
+
     def validate_code(self):
         """
         Helper method for validating the internal bytecode state and its assigned data
@@ -540,7 +839,10 @@ class BytecodeRepr(AbstractBytecodeContainer):
 
         todo: do some more stuff here
         """
-        stack.local_vars = [None] * self.code.max_locals
+        # Pooled stacks are already cleared by Runtime.release_stack(), so only resize them when needed
+        if len(stack.local_vars) != len(self.empty_local_vars):
+            stack.local_vars = list(self.empty_local_vars)
+
         stack.cp = 0
         stack.code = self
 
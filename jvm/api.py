@@ -1,3 +1,4 @@
+import inspect
 import sys
 import typing
 from abc import ABC
@@ -26,6 +27,8 @@ class AbstractRuntime(metaclass=ABCMeta):
 
 
 class AbstractStack(metaclass=ABCMeta):
+    __slots__ = ("local_vars", "stack", "cp", "code", "method", "vm", "runtime", "return_value")
+
     def __init__(self):
         self.local_vars = []
         self.stack = []
@@ -66,6 +69,12 @@ class AbstractStack(metaclass=ABCMeta):
         """
         pass
 
+    async def jump_to_exception_handler(self, exception) -> bool:
+        """
+        Jumps to the exception handler of the current instruction catching the exception, if there is one
+        """
+        return False
+
     def pop_expect_type(self, *type_name: str):
         pass
 
@@ -82,14 +91,20 @@ class AbstractStack(metaclass=ABCMeta):
 class AbstractBytecodeContainer(metaclass=ABCMeta):
     OPCODES: typing.Dict[int, typing.Type["BaseInstruction"]] = {}
 
+    # The superinstructions tried by the fusion pass, in order
+    SUPERINSTRUCTIONS: typing.List[typing.Type["BaseInstruction"]] = []
+
     @classmethod
     def register_instruction(cls, instr):
-        from jvm.Instructions import OpcodeInstruction
+        from jvm.Instructions import OpcodeInstruction, Superinstruction
 
         if issubclass(instr, OpcodeInstruction):
             for opcode in instr.OPCODES:
                 cls.OPCODES[opcode] = instr
 
+        elif issubclass(instr, Superinstruction):
+            cls.SUPERINSTRUCTIONS.append(instr)
+
         return instr
 
     def __init__(self):
@@ -202,9 +217,36 @@ class AbstractJavaClassInstance(ABC):
 
 DYNAMIC_NATIVES = "--fill-unknown-natives" in sys.argv
 
+# Decode class files in a process pool when loading whole archives, see JavaVM.enable_parallel_decoding()
+PARALLEL_DECODING = "--parallel-class-decoding" in sys.argv
+
+# Invocation count after which methods are compiled to python bytecode (see jvm.PyBytecode), 0 disables compilation
+PY_COMPILATION_THRESHOLD = int(next(
+    (arg.removeprefix("--py-compilation-threshold=") for arg in sys.argv if arg.startswith("--py-compilation-threshold=")), 100
+))
+
+# How methods are compiled: "bytecode" assembles word code (jvm.PyBytecode, CPython 3.11 only),
+# "source" transpiles them to python source (jvm.PySource); "source" is used where "bytecode" is not supported
+PY_COMPILATION_BACKEND = next(
+    (arg.removeprefix("--py-compilation-backend=") for arg in sys.argv if arg.startswith("--py-compilation-backend=")), "bytecode"
+)
+
+# Directory to persist the transpiled sources of the "source" backend in, reused by later runs
+PY_SOURCE_DIRECTORY = next(
+    (arg.removeprefix("--py-source-cache=") for arg in sys.argv if arg.startswith("--py-source-cache=")), None
+)
+
+# Fuse common instruction sequences into superinstructions, see BytecodeRepr.fuse_instructions()
+FUSE_INSTRUCTIONS = "--no-instruction-fusion" not in sys.argv
+
+# Directory for the on-disk cache of decoded class files, see JavaVM.enable_class_cache()
+CLASS_CACHE_DIRECTORY = next(
+    (arg.removeprefix("--class-cache=") for arg in sys.argv if arg.startswith("--class-cache=")), None
+)
+
 
 class AbstractMethod(metaclass=ABCMeta):
-    __slots__ = ("class_file", "name", "signature", "access", "code_repr")
+    __slots__ = ("class_file", "name", "signature", "access", "code_repr", "method_descriptor")
 
     def __init__(self):
         self.class_file: AbstractJavaClass = None
@@ -213,6 +255,9 @@ class AbstractMethod(metaclass=ABCMeta):
         self.access = 0
         self.code_repr = None
 
+        # jvm.util.MethodDescriptor of the signature, set on load or resolved on first use
+        self.method_descriptor = None
+
     @abstractmethod
     async def invoke(self, args, stack=None):
         pass
@@ -223,30 +268,66 @@ class AbstractMethod(metaclass=ABCMeta):
 
 
 class PyBytecodeBuilder:
+    """
+    Target of BaseInstruction.prepare_python_bytecode_instructions(), collecting the python bytecode
+    instructions (see jvm.PyBytecode.PyOpcodes) for the java instructions of a method
+
+    Implemented by jvm.PyBytecode.CodeObjectBuilder
+    """
+
     def __init__(self):
         self.instruction_sequence = []
 
-    def add_instruction(self, instruction_opcode: int, instruction_data=None):
-        pass
+    def add_instruction(self, instruction_opcode: str, instruction_data=None):
+        raise NotImplementedError
 
     def add_name(self, name: str) -> int:
-        pass
+        raise NotImplementedError
 
-    def add_const(self, const):
-        pass
+    def add_const(self, const) -> int:
+        raise NotImplementedError
 
     def add_comparator(self, comp: str) -> int:
-        pass
+        raise NotImplementedError
 
-    def real_from_offset(self, offset: int) -> int:
-        pass
+    def add_call(self, function: typing.Callable, arg_count: int):
+        """
+        Calls 'function' with the top 'arg_count' stack entries and pushes the result
+        """
+        raise NotImplementedError
+
+    def real_from_offset(self, offset: int):
+        """
+        Returns the jump target for the java instruction at 'offset' relative to the current one
+        """
+        raise NotImplementedError
+
+    def new_label(self):
+        """
+        Returns a new jump target, which needs to be placed via place_label()
+        """
+        raise NotImplementedError
+
+    def place_label(self, label):
+        raise NotImplementedError
 
 
 class BaseInstruction(ABC):
     """
     Every instruction has to implement this, everything else does not matter
+
+    invoke() may be implemented sync or async; only instructions which really need to suspend
+    (e.g. for class loading or method invocation) should be async, as the interpreter
+    calls sync ones directly without creating a coroutine
     """
 
+    # Set for each subclass based on its invoke() implementation
+    IS_ASYNC = True
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.IS_ASYNC = inspect.iscoroutinefunction(cls.invoke)
+
     @classmethod
     async def invoke(cls, data: typing.Any, stack: AbstractStack) -> bool:
         raise NotImplementedError
@@ -281,7 +362,12 @@ class BaseInstruction(ABC):
 
     @classmethod
     def prepare_python_bytecode_instructions(cls, command_index, prepared_data: typing.Any, container: AbstractBytecodeContainer, builder: PyBytecodeBuilder):
-        pass
+        """
+        Emits the python bytecode equivalent of this instruction into the builder
+        Instructions without an equivalent keep the default implementation, so methods using them
+        are not compiled and stay in the interpreter
+        """
+        raise NotImplementedError
 
     @classmethod
     def decode(cls, code, index: int, class_file):
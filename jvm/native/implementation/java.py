@@ -1,5 +1,7 @@
+import array
 import asyncio
 import collections
+import math
 import os.path
 import re
 import threading
@@ -11,6 +13,9 @@ import typing
 import jvm.api
 from jvm.api import AbstractMethod
 from jvm.api import AbstractStack
+from jvm.Instructions import ArrayStore
+from jvm.Java import JavaBytecodeClass
+from jvm.Java import JavaClassInstance
 from jvm.Java import JavaMethod
 from jvm.JavaExceptionStack import StackCollectingException
 from jvm.natives import bind_native, bind_annotation
@@ -686,8 +691,27 @@ class System:
 
     @staticmethod
     @bind_native("java/lang/System", "arraycopy(Ljava/lang/Object;ILjava/lang/Object;II)V")
-    def arraycopy(method, stack, source: list, start: int, target: list, new_start: int, size: int):
-        target[new_start:new_start + size] = source[start:start + size]
+    def arraycopy(method, stack, source, start: int, target, new_start: int, size: int):
+        if source is None or target is None:
+            raise StackCollectingException("NullPointerException: array is null")
+
+        if start < 0 or new_start < 0 or size < 0 or start + size > len(source) or new_start + size > len(target):
+            raise StackCollectingException(
+                f"ArrayIndexOutOfBoundsException: copying {size} entries from {start} (length {len(source)}) to {new_start} (length {len(target)})"
+            )
+
+        if isinstance(target, array.ArrayType) and isinstance(source, array.ArrayType) and source.typecode == target.typecode:
+            # copies the memory directly, overlapping ranges in the same array included
+            memoryview(target)[new_start:new_start + size] = memoryview(source)[start:start + size]
+            return
+
+        section = source[start:start + size]
+
+        # primitive arrays (array.array) only take arrays of the same type code in slice assignment
+        if isinstance(target, array.ArrayType) and not (isinstance(section, array.ArrayType) and section.typecode == target.typecode):
+            section = array.ArrayType(target.typecode, section)
+
+        target[new_start:new_start + size] = section
 
     @staticmethod
     @bind_native("java/lang/System", "currentTimeMillis()")
@@ -695,6 +719,336 @@ class System:
         return round(time.time() * 1000)
 
 
+# The component types of the java/util/Arrays overloads
+ARRAY_COMPONENT_TYPES = ("Z", "B", "C", "S", "I", "J", "F", "D", "Ljava/lang/Object;")
+
+# The component types compared and hashed by value; object arrays dispatch to the methods of their entries
+PRIMITIVE_ARRAY_COMPONENT_TYPES = ARRAY_COMPONENT_TYPES[:-1]
+
+# The default values of the array component types, see get_array_component_type()
+ARRAY_DEFAULT_VALUES = {"Z": 0, "B": 0, "C": 0, "S": 0, "I": 0, "J": 0, "F": 0.0, "D": 0.0, "L": None}
+
+
+def bind_array_natives(signature: str, types=ARRAY_COMPONENT_TYPES):
+    """
+    Binds the decorated function as java/util/Arrays native for each array component type
+    :param signature: the signature, with {0} in place of the component type
+    """
+
+    def bind(function):
+        for component_type in types:
+            bind_native("java/util/Arrays", signature.format(component_type))(function)
+        return function
+
+    return bind
+
+
+def get_array_component_type(method) -> str:
+    """
+    The component type of the first array parameter of the invoked method, "L" for object arrays
+    """
+    return method.signature[2]
+
+
+class Arrays:
+    """
+    The bulk operations of java/util/Arrays
+
+    Primitive arrays (see the newarray instruction) are array.array instances, these are worked on
+    as a whole instead of per element where possible
+    Arrays from other sources (lists, bytes) work too
+
+    Object arrays are compared, hashed and sorted by the equals(), hashCode() and compareTo() methods of
+    their entries where the bytecode classes of these override them
+    """
+
+    @staticmethod
+    def check_range(data, start: int, end: int):
+        if data is None:
+            raise StackCollectingException("NullPointerException: array is null")
+
+        if start > end:
+            raise StackCollectingException(f"IllegalArgumentException: fromIndex({start}) > toIndex({end})")
+
+        if start < 0 or end > len(data):
+            raise StackCollectingException(f"ArrayIndexOutOfBoundsException: range [{start}, {end}) out of length {len(data)}")
+
+    @staticmethod
+    def create_filled(template, component_type: str, value, size: int):
+        """
+        Creates a list or primitive array like the template, with size times the value
+        """
+
+        if isinstance(template, array.ArrayType):
+            return array.ArrayType(template.typecode, [ArrayStore.convert_to_array_type(template, value)]) * size
+
+        return [value] * size
+
+    @staticmethod
+    @bind_array_natives("fill([{0}{0})V")
+    def fill(method, stack, data, value):
+        Arrays.fillRange(method, stack, data, 0, len(data) if data is not None else 0, value)
+
+    @staticmethod
+    @bind_array_natives("fill([{0}II{0})V")
+    def fillRange(method, stack, data, start: int, end: int, value):
+        Arrays.check_range(data, start, end)
+        data[start:end] = Arrays.create_filled(data, get_array_component_type(method), value, end - start)
+
+    @staticmethod
+    @bind_array_natives("copyOf([{0}I)[{0}")
+    def copyOf(method, stack, data, size: int):
+        if size < 0:
+            raise StackCollectingException(f"NegativeArraySizeException: {size}")
+
+        return Arrays.copyOfRange(method, stack, data, 0, size)
+
+    @staticmethod
+    @bind_array_natives("copyOfRange([{0}II)[{0}")
+    def copyOfRange(method, stack, data, start: int, end: int):
+        # the end may be behind the array end
+        Arrays.check_range(data, start, start)
+        if start > end:
+            raise StackCollectingException(f"IllegalArgumentException: fromIndex({start}) > toIndex({end})")
+
+        copied = data[start:end]
+        if not isinstance(copied, (array.ArrayType, list)):
+            copied = list(copied)
+
+        # padded with the default value up to the requested length
+        if end > len(data):
+            component_type = get_array_component_type(method)
+            copied += Arrays.create_filled(copied, component_type, ARRAY_DEFAULT_VALUES[component_type], end - len(data))
+
+        return copied
+
+    @staticmethod
+    @bind_array_natives("sort([{0})V", PRIMITIVE_ARRAY_COMPONENT_TYPES[1:])
+    def sort(method, stack, data):
+        Arrays.sortRange(method, stack, data, 0, len(data) if data is not None else 0)
+
+    @staticmethod
+    @bind_array_natives("sort([{0}II)V", PRIMITIVE_ARRAY_COMPONENT_TYPES[1:])
+    def sortRange(method, stack, data, start: int, end: int):
+        Arrays.check_range(data, start, end)
+        values = data[start:end]
+
+        # java sorts NaN to the end, python does not order it at all
+        nan_count = 0
+        if get_array_component_type(method) in "FD":
+            values = [value for value in values if value == value]
+            nan_count = end - start - len(values)
+
+        try:
+            values = sorted(values) + [math.nan] * nan_count
+        except TypeError:
+            raise StackCollectingException(
+                f"ClassCastException: array {data} contains values not comparable without a Comparator"
+            ) from None
+
+        if isinstance(data, array.ArrayType):
+            values = array.ArrayType(data.typecode, values)
+
+        data[start:end] = values
+
+    @staticmethod
+    @bind_array_natives("equals([{0}[{0})Z", PRIMITIVE_ARRAY_COMPONENT_TYPES)
+    def equals(method, stack, a, b):
+        if a is b:
+            return True
+
+        if a is None or b is None or len(a) != len(b):
+            return False
+
+        # arrays of the same type compare in one go
+        if isinstance(a, array.ArrayType) and isinstance(b, array.ArrayType) and a.typecode == b.typecode:
+            return a == b
+
+        return list(a) == list(b)
+
+    @staticmethod
+    @bind_array_natives("hashCode([{0})I", PRIMITIVE_ARRAY_COMPONENT_TYPES)
+    def hashCode(method, stack, data):
+        if data is None:
+            return 0
+
+        component_type = get_array_component_type(method)
+
+        if component_type in "FD":
+            # floatToIntBits / doubleToLongBits for all values at once
+            if not isinstance(data, array.ArrayType):
+                data = array.ArrayType(component_type.lower(), data)
+            values = array.ArrayType("i" if data.typecode == "f" else "q", data.tobytes())
+        elif component_type == "Z":
+            values = [1231 if value else 1237 for value in data]
+        elif component_type == "C" and not isinstance(data, array.ArrayType):
+            values = [ord(value) if isinstance(value, str) else value for value in data]
+        else:
+            values = data
+
+        result = 1
+        if component_type in "JD":
+            for value in values:
+                # longs hash to the xor of their upper and lower half
+                value &= 0xFFFFFFFFFFFFFFFF
+                result = (31 * result + (value ^ (value >> 32))) & 0xFFFFFFFF
+        else:
+            for value in values:
+                result = (31 * result + value) & 0xFFFFFFFF
+
+        return result - (1 << 32) if result & 0x80000000 else result
+
+    @staticmethod
+    @bind_native("java/util/Arrays", "sort([Ljava/lang/Object;)V")
+    async def sortObjects(method, stack, data):
+        await Arrays.sortObjectsRange(method, stack, data, 0, len(data) if data is not None else 0)
+
+    @staticmethod
+    @bind_native("java/util/Arrays", "sort([Ljava/lang/Object;II)V")
+    async def sortObjectsRange(method, stack, data, start: int, end: int):
+        Arrays.check_range(data, start, end)
+        values = data[start:end]
+
+        # without bytecode objects, there is no compareTo() to invoke
+        if not any(isinstance(value, JavaClassInstance) for value in values):
+            if None in values:
+                raise StackCollectingException("NullPointerException: array contains null")
+
+            try:
+                data[start:end] = sorted(values)
+                return
+            except TypeError:
+                raise StackCollectingException(
+                    f"ClassCastException: array {data} contains values not comparable without a Comparator"
+                ) from None
+
+        data[start:end] = await Arrays.merge_sort(stack, values)
+
+    @staticmethod
+    async def merge_sort(stack, values: list) -> list:
+        """
+        Stable sort by compare_objects(), as sorted() can not await the comparisons
+        """
+
+        if len(values) <= 1:
+            return list(values)
+
+        middle = len(values) // 2
+        left = await Arrays.merge_sort(stack, values[:middle])
+        right = await Arrays.merge_sort(stack, values[middle:])
+
+        result = []
+        i = j = 0
+        while i < len(left) and j < len(right):
+            if await Arrays.compare_objects(stack, right[j], left[i]) < 0:
+                result.append(right[j])
+                j += 1
+            else:
+                result.append(left[i])
+                i += 1
+
+        return result + left[i:] + right[j:]
+
+    @staticmethod
+    @bind_native("java/util/Arrays", "equals([Ljava/lang/Object;[Ljava/lang/Object;)Z")
+    async def equalsObjects(method, stack, a, b):
+        if a is b:
+            return True
+
+        if a is None or b is None or len(a) != len(b):
+            return False
+
+        for x, y in zip(a, b):
+            if not await Arrays.equals_object(stack, x, y):
+                return False
+
+        return True
+
+    @staticmethod
+    @bind_native("java/util/Arrays", "hashCode([Ljava/lang/Object;)I")
+    async def hashCodeObjects(method, stack, data):
+        if data is None:
+            return 0
+
+        result = 1
+        for value in data:
+            result = (31 * result + (await Arrays.hash_object(stack, value) & 0xFFFFFFFF)) & 0xFFFFFFFF
+
+        return result - (1 << 32) if result & 0x80000000 else result
+
+    @staticmethod
+    async def get_overridden_method(value, name: str, signature: str) -> typing.Optional[JavaMethod]:
+        """
+        Looks up the method in the bytecode classes of the object, None when the object is no bytecode
+        object or the method is only implemented by a native parent (e.g. java/lang/Object)
+        """
+
+        if not isinstance(value, JavaClassInstance):
+            return
+
+        cls = value.class_file
+        while isinstance(cls, JavaBytecodeClass):
+            if (name, signature) in cls.methods:
+                return cls.methods[(name, signature)]
+
+            if cls.parent is None:
+                return
+
+            cls = await cls.parent()
+            if isinstance(cls, typing.Awaitable):
+                cls = await cls
+
+    @staticmethod
+    async def equals_object(stack, a, b) -> bool:
+        if a is b:
+            return True
+
+        if a is None or b is None:
+            return False
+
+        method = await Arrays.get_overridden_method(a, "equals", "(Ljava/lang/Object;)Z")
+        if method is not None:
+            return bool(await method.invoke([a, b], stack=stack))
+
+        # java/lang/Object.equals() compares the identity
+        return not isinstance(a, JavaClassInstance) and a == b
+
+    @staticmethod
+    async def hash_object(stack, value) -> int:
+        """
+        The hash of an object array entry
+        Strings hash like java strings, bytecode objects by their hashCode(), other objects by the python hash
+        """
+
+        if value is None:
+            return 0
+
+        if isinstance(value, str):
+            return String.hashCode(None, None, value)
+
+        method = await Arrays.get_overridden_method(value, "hashCode", "()I")
+        if method is not None:
+            return await method.invoke([value], stack=stack)
+
+        return hash(value)
+
+    @staticmethod
+    async def compare_objects(stack, a, b) -> int:
+        if a is None or b is None:
+            raise StackCollectingException("NullPointerException: array contains null")
+
+        method = await Arrays.get_overridden_method(a, "compareTo", "(Ljava/lang/Object;)I")
+        if method is not None:
+            return await method.invoke([a, b], stack=stack)
+
+        try:
+            return (a > b) - (a < b)
+        except TypeError:
+            raise StackCollectingException(
+                f"ClassCastException: {a} can not be compared to {b} without a Comparator"
+            ) from None
+
+
 class Thread:
     CURRENT = None
     CURRENT_CLASS_LOADER = None
@@ -812,6 +1166,21 @@ class Enumeration:
 
 
 class String:
+    @staticmethod
+    @bind_native("java/lang/String", "equals(Ljava/lang/Object;)Z")
+    def equals(method, stack, this: str, other):
+        return this == other
+
+    @staticmethod
+    @bind_native("java/lang/String", "hashCode()I")
+    def hashCode(method, stack, this: str):
+        # java hashes the UTF-16 code units, this differs only for characters outside the BMP
+        result = 0
+        for c in this:
+            result = (31 * result + ord(c)) & 0xFFFFFFFF
+
+        return result - (1 << 32) if result & 0x80000000 else result
+
     @staticmethod
     @bind_native("java/lang/String", "split(Ljava/lang/String;)[Ljava/lang/String;")
     def split(method, stack, string, at):
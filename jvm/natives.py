@@ -8,6 +8,8 @@ import typing
 import simplejson
 
 import jvm.api
+import jvm.util
+from jvm.JavaExceptionStack import StackCollectingException
 
 
 class UnimplementedNative:
@@ -45,6 +47,13 @@ class NativeMethod(jvm.api.AbstractMethod):
         self.cls = cls
         self.name = name
         self.signature = signature
+
+        try:
+            self.method_descriptor = jvm.util.MethodDescriptor.get(signature)
+        except StackCollectingException:
+            # Some headers contain placeholder signatures, these fail when the method gets invoked
+            self.method_descriptor = None
+
         self.underlying = underlying
         self.access = access
         self.bound = False
@@ -117,6 +126,9 @@ class NativeClass(jvm.api.AbstractJavaClass):
         if name+signature not in self.methods or force:
             self.methods[name+signature] = method
 
+            if manager.vm is not None:
+                manager.vm.invalidate_method_caches()
+
     def is_subclass_of(self, class_name: str) -> bool:
         return self.name == class_name and any(cls.is_subclass_of(class_name) for cls in self.parents)
 
@@ -2,6 +2,7 @@ import struct
 import typing
 
 import jvm.api
+from jvm.JavaExceptionStack import StackCollectingException
 
 
 U1 = struct.Struct("!B")
@@ -57,6 +58,67 @@ def pop_struct(s: struct.Struct, data: bytearray):
     return s.unpack(pop_sized(s.size, data))
 
 
+class ClassFileReader:
+    """
+    Cursor based reader for class file data
+    Backed by a memoryview, so reading never copies or shifts the underlying buffer (in contrast to the pop_*
+    helpers above, which need to move the whole remaining buffer on each read)
+
+    Sub-sections (e.g. attribute bodies) are handed out as memoryview slices sharing the same buffer
+    """
+
+    __slots__ = ("view", "offset")
+
+    def __init__(self, data: typing.Union[bytes, bytearray, memoryview], offset: int = 0):
+        view = data if isinstance(data, memoryview) else memoryview(data)
+        self.view = view if view.format == "B" else view.cast("B")
+        self.offset = offset
+
+    def __len__(self):
+        return len(self.view) - self.offset
+
+    def read_u1(self) -> int:
+        value = self.view[self.offset]
+        self.offset += 1
+        return value
+
+    def read_u2(self) -> int:
+        value = U2.unpack_from(self.view, self.offset)[0]
+        self.offset += 2
+        return value
+
+    def read_u2_s(self) -> int:
+        value = U2_S.unpack_from(self.view, self.offset)[0]
+        self.offset += 2
+        return value
+
+    def read_u4(self) -> int:
+        value = U4.unpack_from(self.view, self.offset)[0]
+        self.offset += 4
+        return value
+
+    def read_u4_s(self) -> int:
+        value = U4_S.unpack_from(self.view, self.offset)[0]
+        self.offset += 4
+        return value
+
+    def read_struct(self, s: struct.Struct) -> tuple:
+        value = s.unpack_from(self.view, self.offset)
+        self.offset += s.size
+        return value
+
+    def read_sized(self, size: int) -> memoryview:
+        if self.offset + size > len(self.view):
+            raise ValueError(f"cannot read {size} bytes at offset {self.offset}, only {len(self)} remaining")
+
+        value = self.view[self.offset:self.offset + size]
+        self.offset += size
+        return value
+
+    def read_utf8(self, size: int) -> str:
+        return str(self.read_sized(size), "utf-8", "ignore")
+
+
 async def decode_cp_constant(const, version=None, vm=None):
     """
     Helper code for decoding an arbitrary constant pool entry down to a "primitive"
@@ -81,43 +143,126 @@ async def decode_cp_constant(const, version=None, vm=None):
     raise NotImplementedError(const)
 
 
-def get_arg_parts_of(
-    method,
-) -> typing.Iterator[str]:
+class MethodDescriptor:
+    """
+    Pre-parsed method descriptor (e.g. "(IJLjava/lang/String;)V"), interned per descriptor string
+    Use MethodDescriptor.get() for looking up the shared instance, or get_method_descriptor() for a method object
+
+    Holds everything the invoke instructions need to know, so no string parsing happens at invoke time:
+    - arg_parts: (type, is wide) for each argument, wide (long & double) ones take two local variable slots
+    - arg_count: argument count; as each value is one entry on the runtime stack, also the pop count for arguments
+    - wide_positions: the indices of the wide arguments
+    - wide_insert_positions: where Runtime.parse_args_from_stack() inserts the padding for the second slot of
+        wide arguments into the (reversed) popped argument list
+    - slot_count: local variable slots used by the arguments
+    - return_type: the return type, "V" for void
+    """
+
+    __slots__ = (
+        "signature",
+        "arg_parts",
+        "arg_types",
+        "arg_count",
+        "pop_count",
+        "wide_positions",
+        "wide_insert_positions",
+        "slot_count",
+        "return_type",
+    )
+
+    CACHE: typing.Dict[str, "MethodDescriptor"] = {}
+
+    @classmethod
+    def get(cls, signature: str) -> "MethodDescriptor":
+        descriptor = cls.CACHE.get(signature)
+
+        if descriptor is None:
+            descriptor = cls.CACHE[signature] = cls(signature)
+
+        return descriptor
+
+    def __init__(self, signature: str):
+        if not signature.startswith("(") or ")" not in signature:
+            raise StackCollectingException(f"invalid signature: {signature}")
+
+        self.signature = signature
+
+        v, self.return_type = signature[1:].split(")", 1)
+        parts = []
+        i = 0
+        start = 0
+
+        try:
+            while i < len(v):
+                is_array = False
+
+                if v[i] == "[":
+                    is_array = True
+
+                if v[i] == "L":
+                    i = v.index(";", i) + 1
+                    parts.append((v[start:i], False))
+                else:
+                    i += 1
+                    if not is_array:
+                        parts.append((v[start:i], v[i - 1] in "DJ"))
+
+                if not is_array:
+                    start = i
+        except ValueError:
+            raise StackCollectingException(f"cannot parse argument list {signature}") from None
+
+        self.arg_parts: typing.Tuple[typing.Tuple[str, bool], ...] = tuple(parts)
+        self.arg_types = tuple(part for part, _ in parts)
+        self.arg_count = self.pop_count = len(parts)
+        self.wide_positions = tuple(i for i, (_, wide) in enumerate(parts) if wide)
+        self.wide_insert_positions = tuple(
+            position + offset - 1 for offset, position in enumerate(self.wide_positions)
+        )
+        self.slot_count = self.arg_count + len(self.wide_positions)
+
+    def __repr__(self):
+        return f"MethodDescriptor({self.signature})"
+
+
+def get_method_descriptor(method) -> MethodDescriptor:
+    """
+    Looks up the MethodDescriptor for a method (using its attached descriptor when possible) or a signature string
+    """
+
+    if isinstance(method, str):
+        return MethodDescriptor.get(method)
+
+    descriptor = getattr(method, "method_descriptor", None)
+    if descriptor is not None:
+        return descriptor
+
     if hasattr(method, "signature"):
         signature = method.signature
     elif hasattr(method, "native_signature"):
         signature = method.native_signature
-    elif isinstance(method, str):
-        signature = method
     else:
         raise ValueError(method)
 
-    if not signature.startswith("("):
-        raise RuntimeError
+    if signature is None:
+        raise RuntimeError(method)
 
-    v = signature.removeprefix("(").split(")")[0]
-    i = 0
-    start = 0
+    descriptor = MethodDescriptor.get(signature)
 
     try:
-        while i < len(v):
-            is_array = False
+        method.method_descriptor = descriptor
+    except AttributeError:
+        pass
 
-            if v[i] == "[":
-                is_array = True
+    return descriptor
 
-            if v[i] == "L":
-                i = v.index(";", i) + 1
-                yield v[start:i], False
-            else:
-                i += 1
-                if not is_array:
-                    yield v[start:i], v[i - 1] in "DJ"
 
-            if not is_array:
-                start = i
-    except:
-        raise RuntimeError(f"cannot parse argument list {signature}")
+def get_arg_parts_of(
+    method,
+) -> typing.Iterator[str]:
+    try:
+        return iter(get_method_descriptor(method).arg_parts)
+    except StackCollectingException as e:
+        raise RuntimeError(e.text) from None
 
 
@@ -0,0 +1,82 @@
+"""
+Benchmark for the class file decoder
+
+Synthesizes class files of increasing size and measures JavaBytecodeClass.from_bytes() on them.
+The time per KB should stay (roughly) constant, as the decoder must scale linear in the class size.
+
+Run from the repository root via "python tests/benchmarks/class_file_reader.py"
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from jvm.Java import JavaBytecodeClass
+from jvm.JavaVM import JavaVM
+from jvm.util import U2, U4
+
+
+def create_class_file(method_count: int) -> bytes:
+    """
+    Creates a class file named "Benchmark" with method_count methods, each one only returning
+    """
+
+    cp = bytearray()
+    cp += b"\x01" + U2.pack(9) + b"Benchmark"  # 1
+    cp += b"\x07" + U2.pack(1)  # 2
+    cp += b"\x01" + U2.pack(16) + b"java/lang/Object"  # 3
+    cp += b"\x07" + U2.pack(3)  # 4
+    cp += b"\x01" + U2.pack(4) + b"Code"  # 5
+    cp += b"\x01" + U2.pack(3) + b"()V"  # 6
+
+    methods = bytearray()
+    for i in range(method_count):
+        name = f"method{i}".encode("utf-8")
+        cp += b"\x01" + U2.pack(len(name)) + name  # 7 + i
+
+        code = U2.pack(0) + U2.pack(1) + U4.pack(1) + b"\xB1" + U2.pack(0) + U2.pack(0)
+        methods += U2.pack(0x0009) + U2.pack(7 + i) + U2.pack(6) + U2.pack(1)
+        methods += U2.pack(5) + U4.pack(len(code)) + code
+
+    data = bytearray()
+    data += U4.pack(0xCAFEBABE) + U2.pack(0) + U2.pack(52)
+    data += U2.pack(7 + method_count) + cp
+    data += U2.pack(0x0021) + U2.pack(2) + U2.pack(4)
+    data += U2.pack(0)  # interfaces
+    data += U2.pack(0)  # fields
+    data += U2.pack(method_count) + methods
+    data += U2.pack(0)  # attributes
+    return bytes(data)
+
+
+async def measure(data: bytes, vm: JavaVM, repeat: int = 3) -> float:
+    best = None
+
+    for _ in range(repeat):
+        cls = JavaBytecodeClass()
+        cls.vm = vm
+
+        start = time.perf_counter()
+        await cls.from_bytes(data)
+        duration = time.perf_counter() - start
+
+        best = duration if best is None else min(best, duration)
+
+    return best
+
+
+async def main():
+    vm = JavaVM()
+
+    print(f"{'size (KB)':>10} {'time (ms)':>10} {'ms / KB':>10}")
+    for method_count in (1000, 2000, 4000, 8000, 16000):
+        data = create_class_file(method_count)
+        duration = await measure(data, vm)
+        size = len(data) / 1024
+        print(f"{size:>10.1f} {duration * 1000:>10.2f} {duration * 1000 / size:>10.4f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
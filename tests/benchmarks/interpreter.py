@@ -0,0 +1,113 @@
+"""
+Benchmark for the bytecode interpreter loop
+
+Synthesizes a class with a static method "sum(I)I" summing up 0 to n-1 in a plain loop
+(only local variable, arithmetic and jump instructions) and measures the instructions per second
+of Runtime.run_method() on it, first in the bytecode interpreter without and with superinstructions
+(see BytecodeRepr.fuse_instructions()), then compiled by each compilation backend (see jvm.api.PY_COMPILATION_BACKEND).
+
+Run from the repository root via "python tests/benchmarks/interpreter.py"
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+import jvm.api
+from jvm.Java import JavaBytecodeClass
+from jvm.JavaVM import JavaVM
+from jvm.Runtime import Runtime
+from jvm.util import U2, U4
+
+
+# int sum(int n) { int s = 0; for (int i = 0; i < n; i++) s += i; return s; }
+CODE = bytes(
+    [
+        0x03,  # 0: iconst_0
+        0x3C,  # 1: istore_1
+        0x03,  # 2: iconst_0
+        0x3D,  # 3: istore_2
+        0x1C,  # 4: iload_2
+        0x1A,  # 5: iload_0
+        0xA2, 0x00, 0x0D,  # 6: if_icmpge 19
+        0x1B,  # 9: iload_1
+        0x1C,  # 10: iload_2
+        0x60,  # 11: iadd
+        0x3C,  # 12: istore_1
+        0x84, 0x02, 0x01,  # 13: iinc 2 1
+        0xA7, 0xFF, 0xF4,  # 16: goto 4
+        0x1B,  # 19: iload_1
+        0xAC,  # 20: ireturn
+    ]
+)
+
+# Instructions executed per loop iteration
+LOOP_INSTRUCTIONS = 9
+
+
+def create_class_file() -> bytes:
+    cp = bytearray()
+    cp += b"\x01" + U2.pack(9) + b"Benchmark"  # 1
+    cp += b"\x07" + U2.pack(1)  # 2
+    cp += b"\x01" + U2.pack(16) + b"java/lang/Object"  # 3
+    cp += b"\x07" + U2.pack(3)  # 4
+    cp += b"\x01" + U2.pack(4) + b"Code"  # 5
+    cp += b"\x01" + U2.pack(4) + b"(I)I"  # 6
+    cp += b"\x01" + U2.pack(3) + b"sum"  # 7
+
+    code = U2.pack(2) + U2.pack(3) + U4.pack(len(CODE)) + CODE + U2.pack(0) + U2.pack(0)
+    method = U2.pack(0x0009) + U2.pack(7) + U2.pack(6) + U2.pack(1)
+    method += U2.pack(5) + U4.pack(len(code)) + code
+
+    data = bytearray()
+    data += U4.pack(0xCAFEBABE) + U2.pack(0) + U2.pack(52)
+    data += U2.pack(8) + cp
+    data += U2.pack(0x0021) + U2.pack(2) + U2.pack(4)
+    data += U2.pack(0)  # interfaces
+    data += U2.pack(0)  # fields
+    data += U2.pack(1) + method
+    data += U2.pack(0)  # attributes
+    return bytes(data)
+
+
+async def main():
+    vm = JavaVM()
+    cls = JavaBytecodeClass()
+    cls.vm = vm
+    await cls.from_bytes(create_class_file())
+
+    method = await cls.get_method("sum", "(I)I")
+    runtime = Runtime()
+
+    # Keep the automatic compilation out of the interpreter measurement
+    jvm.api.PY_COMPILATION_THRESHOLD = 0
+
+    print(f"{'mode':>11} {'n':>8} {'time (ms)':>10} {'instr / s':>12}")
+    for mode in ("unfused", "interpreter", "bytecode", "source"):
+        if mode in ("unfused", "interpreter"):
+            jvm.api.FUSE_INSTRUCTIONS = mode != "unfused"
+            method.code_repr = None
+            await method.ensure_code_repr()
+
+        else:
+            jvm.api.PY_COMPILATION_BACKEND = mode
+            await method.code_repr.compile_to_python()
+            assert method.code_repr.python_function is not None
+
+        for n in (1000, 10000, 100000):
+            assert await runtime.run_method(method, n) == sum(range(n))
+
+            best = None
+            for _ in range(3):
+                start = time.perf_counter()
+                await runtime.run_method(method, n)
+                duration = time.perf_counter() - start
+                best = duration if best is None else min(best, duration)
+
+            print(f"{mode:>11} {n:>8} {best * 1000:>10.2f} {n * LOOP_INSTRUCTIONS / best:>12.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
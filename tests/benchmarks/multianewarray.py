@@ -0,0 +1,55 @@
+"""
+Benchmark for the multianewarray allocation
+
+Compares MultiANewArray.create() with the previous allocation (copy.deepcopy of the inner level
+for each outer entry) on typical array shapes, like 3D world buffers.
+
+Run from the repository root via "python tests/benchmarks/multianewarray.py"
+"""
+import copy
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from jvm.Instructions import MultiANewArray
+
+
+# (array class name, sizes of the allocated dimensions)
+SHAPES = [
+    ("[[I", (64, 64)),
+    ("[[[I", (16, 256, 16)),
+    ("[[[B", (16, 16, 16)),
+    ("[[[I", (16, 256)),
+    ("[[Ljava/lang/Object;", (128, 128)),
+]
+
+
+def deepcopy_allocation(sizes):
+    """
+    The previous implementation, with the sizes popped from the stack (innermost first)
+    """
+
+    dimensions = list(reversed(sizes))
+    data = [None] * dimensions.pop(0)
+
+    for e in dimensions:
+        data = [copy.deepcopy(data) for _ in range(e)]
+
+    return data
+
+
+def main():
+    print(f"{'array':>22} {'sizes':>14} {'deepcopy (ms)':>14} {'create (ms)':>12} {'speedup':>8}")
+
+    for class_name, sizes in SHAPES:
+        runs = 5
+        old = min(timeit.repeat(lambda: deepcopy_allocation(sizes), number=runs, repeat=3)) / runs
+        new = min(timeit.repeat(lambda: MultiANewArray.create(class_name, *sizes), number=runs, repeat=3)) / runs
+
+        print(f"{class_name:>22} {'x'.join(map(str, sizes)):>14} {old * 1000:>14.3f} {new * 1000:>12.3f} {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Statistics of adjacent instruction pairs in real class files
+
+Decodes all methods of the given .class files and .jar archives (without optimising them) and prints
+the most common pairs of directly following instructions, the candidates for superinstructions
+(see jvm.Instructions.Superinstruction and BytecodeRepr.fuse_instructions()).
+
+Run from the repository root via "python tests/benchmarks/opcode_pairs.py <class file or jar>..."
+"""
+import asyncio
+import collections
+import os
+import sys
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from jvm.Java import JavaBytecodeClass
+from jvm.JavaVM import JavaVM
+from jvm.JavaExceptionStack import StackCollectingException
+from jvm.Runtime import BytecodeRepr
+
+# How many pairs to print
+TOP_PAIRS = 40
+
+
+def iterate_class_files(paths):
+    for path in paths:
+        if path.endswith(".jar") or path.endswith(".zip"):
+            with zipfile.ZipFile(path) as archive:
+                for name in archive.namelist():
+                    if name.endswith(".class"):
+                        yield name, archive.read(name)
+
+        else:
+            with open(path, mode="rb") as f:
+                yield path, f.read()
+
+
+async def count_pairs(vm: JavaVM, data: bytes, pairs: collections.Counter) -> int:
+    cls = JavaBytecodeClass()
+    cls.vm = vm
+    await cls.from_bytes(data)
+
+    count = 0
+    for method in cls.methods.values():
+        if "Code" not in method.attributes:
+            continue
+
+        code = BytecodeRepr(method.attributes["Code"][0])
+        instructions = [e[0].__name__ for e in code.decoded_code if e is not None]
+        pairs.update(zip(instructions, instructions[1:]))
+        count += 1
+
+    return count
+
+
+async def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        return
+
+    vm = JavaVM()
+    pairs = collections.Counter()
+    methods = 0
+
+    for name, data in iterate_class_files(sys.argv[1:]):
+        try:
+            methods += await count_pairs(vm, data, pairs)
+        except StackCollectingException as e:
+            print(f"skipping {name}: {e}")
+
+    total = sum(pairs.values())
+    print(f"{methods} methods, {total} instruction pairs")
+
+    for (first, second), count in pairs.most_common(TOP_PAIRS):
+        print(f"{first:>24} {second:<24} {count:>8} {count / total * 100:>6.2f}%")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
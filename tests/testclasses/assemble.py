@@ -0,0 +1,411 @@
+"""
+Assembler for the hand-written test class files in this directory
+
+There is no java compiler in the build environment, so the test classes are assembled from the code below.
+Each class builder documents the java source its bytecode follows; the code is laid out like javac output,
+except that constructors do not call the (native) super constructors.
+
+Run from the repository root via "python tests/testclasses/assemble.py" to re-create the class files
+"""
+import os
+import struct
+import sys
+import typing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from jvm.util import U2, U4
+
+# Class file version 49 (java 5), so no StackMapTable attributes are needed
+MAJOR_VERSION = 49
+
+ACC_PUBLIC = 0x0001
+ACC_STATIC = 0x0008
+ACC_SUPER = 0x0020
+
+
+class CodeBuilder:
+    """
+    Builder for the body of a Code attribute, with jumps, switches and exception table entries
+    referencing labels resolved when building
+    """
+
+    def __init__(self, cls: "ClassFileBuilder", max_stack: int, max_locals: int):
+        self.cls = cls
+        self.max_stack = max_stack
+        self.max_locals = max_locals
+
+        self.code = bytearray()
+        self.labels: typing.Dict[str, int] = {}
+
+        # (position of the offset, position of the instruction, label, offset size)
+        self.fixups: typing.List[typing.Tuple[int, int, str, int]] = []
+
+        # (start label, end label, handler label, catch class name or None for catching everything)
+        self.exception_table: typing.List[typing.Tuple[str, str, str, typing.Optional[str]]] = []
+
+    def emit(self, *data: typing.Union[int, bytes]) -> "CodeBuilder":
+        for e in data:
+            if isinstance(e, int):
+                self.code.append(e)
+            else:
+                self.code += e
+
+        return self
+
+    def label(self, name: str) -> "CodeBuilder":
+        self.labels[name] = len(self.code)
+        return self
+
+    def jump(self, opcode: int, label: str) -> "CodeBuilder":
+        self.fixups.append((len(self.code) + 1, len(self.code), label, 2))
+        return self.emit(opcode, 0, 0)
+
+    def invoke(self, opcode: int, cls: str, name: str, descriptor: str) -> "CodeBuilder":
+        return self.emit(opcode, U2.pack(self.cls.method_ref(cls, name, descriptor)))
+
+    def throw_new(self, cls: str) -> "CodeBuilder":
+        # new <cls>; dup; invokespecial <cls>.<init>()V; athrow
+        self.emit(0xBB, U2.pack(self.cls.class_ref(cls)), 0x59)
+        return self.invoke(0xB7, cls, "<init>", "()V").emit(0xBF)
+
+    def ldc_string(self, value: str) -> "CodeBuilder":
+        return self.emit(0x12, self.cls.string(value))
+
+    def lookup_switch(self, default: str, pairs: typing.Dict[int, str]) -> "CodeBuilder":
+        start = len(self.code)
+        self.emit(0xAB, bytes(3 - start % 4))
+
+        self.fixups.append((len(self.code), start, default, 4))
+        self.emit(bytes(4), U4.pack(len(pairs)))
+
+        for key in sorted(pairs.keys()):
+            self.emit(struct.pack(">i", key))
+            self.fixups.append((len(self.code), start, pairs[key], 4))
+            self.emit(bytes(4))
+
+        return self
+
+    def table_switch(self, default: str, low: int, labels: typing.List[str]) -> "CodeBuilder":
+        start = len(self.code)
+        self.emit(0xAA, bytes(3 - start % 4))
+
+        self.fixups.append((len(self.code), start, default, 4))
+        self.emit(bytes(4), struct.pack(">ii", low, low + len(labels) - 1))
+
+        for label in labels:
+            self.fixups.append((len(self.code), start, label, 4))
+            self.emit(bytes(4))
+
+        return self
+
+    def catch(self, start: str, end: str, handler: str, cls: typing.Optional[str]) -> "CodeBuilder":
+        self.exception_table.append((start, end, handler, cls))
+        return self
+
+    def build(self) -> bytes:
+        code = bytearray(self.code)
+
+        for position, instruction, label, size in self.fixups:
+            code[position: position + size] = struct.pack(">h" if size == 2 else ">i", self.labels[label] - instruction)
+
+        data = U2.pack(self.max_stack) + U2.pack(self.max_locals) + U4.pack(len(code)) + code
+        data += U2.pack(len(self.exception_table))
+
+        for start, end, handler, cls in self.exception_table:
+            data += U2.pack(self.labels[start]) + U2.pack(self.labels[end]) + U2.pack(self.labels[handler])
+            data += U2.pack(self.cls.class_ref(cls) if cls is not None else 0)
+
+        return data + U2.pack(0)
+
+
+class ClassFileBuilder:
+    def __init__(self, name: str, parent: str = "java/lang/Object"):
+        self.name = name
+        self.cp: typing.List[bytes] = []
+        self.cp_lookup: typing.Dict[bytes, int] = {}
+
+        self.this = self.class_ref(name)
+        self.parent = self.class_ref(parent)
+
+        self.methods: typing.List[bytes] = []
+
+    def add(self, entry: bytes) -> int:
+        if entry not in self.cp_lookup:
+            self.cp.append(entry)
+            self.cp_lookup[entry] = len(self.cp)
+
+        return self.cp_lookup[entry]
+
+    def utf8(self, value: str) -> int:
+        data = value.encode("utf-8")
+        return self.add(b"\x01" + U2.pack(len(data)) + data)
+
+    def class_ref(self, name: str) -> int:
+        return self.add(b"\x07" + U2.pack(self.utf8(name)))
+
+    def string(self, value: str) -> int:
+        return self.add(b"\x08" + U2.pack(self.utf8(value)))
+
+    def method_ref(self, cls: str, name: str, descriptor: str) -> int:
+        name_and_type = self.add(b"\x0C" + U2.pack(self.utf8(name)) + U2.pack(self.utf8(descriptor)))
+        return self.add(b"\x0A" + U2.pack(self.class_ref(cls)) + U2.pack(name_and_type))
+
+    def code(self, max_stack: int, max_locals: int) -> CodeBuilder:
+        return CodeBuilder(self, max_stack, max_locals)
+
+    def add_method(self, access: int, name: str, descriptor: str, code: CodeBuilder):
+        body = code.build()
+        self.methods.append(
+            U2.pack(access) + U2.pack(self.utf8(name)) + U2.pack(self.utf8(descriptor))
+            + U2.pack(1) + U2.pack(self.utf8("Code")) + U4.pack(len(body)) + body
+        )
+
+    def add_empty_constructor(self):
+        self.add_method(ACC_PUBLIC, "<init>", "()V", self.code(0, 1).emit(0xB1))
+
+    def build(self) -> bytes:
+        data = U4.pack(0xCAFEBABE) + U2.pack(0) + U2.pack(MAJOR_VERSION)
+        data += U2.pack(len(self.cp) + 1) + b"".join(self.cp)
+        data += U2.pack(ACC_PUBLIC | ACC_SUPER) + U2.pack(self.this) + U2.pack(self.parent)
+        data += U2.pack(0)  # interfaces
+        data += U2.pack(0)  # fields
+        data += U2.pack(len(self.methods)) + b"".join(self.methods)
+        data += U2.pack(0)  # attributes
+        return data
+
+
+def build_exception_test() -> typing.Dict[str, bytes]:
+    """
+    public class ExceptionTest {
+        public static class Failure extends RuntimeException {}
+
+        public static int check(int x) { if (x < 0) throw new Failure(); return x; }
+
+        public static int half(int x) { return x / 2; }
+
+        public static int localCatch(int x) {
+            try { if (x < 0) throw new Failure(); return 1; } catch (Failure e) { return 2; }
+        }
+
+        public static int callerCatch(int x) {
+            try { return half(check(x)); } catch (RuntimeException e) { return -1; }
+        }
+
+        public static int wrongCatch(int x) {
+            try { return check(x); } catch (IllegalStateException e) { return -1; }
+        }
+
+        public static int catchAll(int x) {
+            try { return check(x); } catch (<any> e) { return -1; }
+        }
+
+        public static int nested(int x) {
+            try {
+                try { return check(x); } catch (IllegalStateException e) { return -1; }
+            } catch (Failure e) { return -2; }
+        }
+
+        public static int rethrow(int x) {
+            try { return check(x); } catch (Failure e) { throw e; }
+        }
+
+        public static int rethrowCaught(int x) {
+            try { return rethrow(x); } catch (Failure e) { return -3; }
+        }
+
+        public static int countFailures(int n) {
+            int count = 0;
+            for (int i = 0 - n; i < n; i++) {
+                try { check(i); } catch (Failure e) { count++; }
+            }
+            return count;
+        }
+
+        // Overlapping (not nested) ranges, which javac does not emit:
+        // [a, c) catches Failure, [b, end) catches RuntimeException and comes first in the table
+        public static int overlapping(int x) {
+            a: check(x);
+            b: check(x - 1);
+            c: check(x - 2);
+            end: return 0;
+            // handlers: RuntimeException -> return 2, Failure -> return 1
+        }
+    }
+    """
+
+    name = "ExceptionTest"
+    failure = "ExceptionTest$Failure"
+    check = (0xB8, name, "check", "(I)I")
+
+    failure_cls = ClassFileBuilder(failure, "java/lang/RuntimeException")
+    failure_cls.add_empty_constructor()
+
+    cls = ClassFileBuilder(name)
+    cls.add_empty_constructor()
+
+    cls.add_method(ACC_PUBLIC | ACC_STATIC, "check", "(I)I", (
+        cls.code(2, 1)
+        .emit(0x1A).jump(0x9C, "ok")  # iload_0; ifge ok
+        .throw_new(failure)
+        .label("ok").emit(0x1A, 0xAC)  # iload_0; ireturn
+    ))
+
+    cls.add_method(ACC_PUBLIC | ACC_STATIC, "half", "(I)I", cls.code(2, 1).emit(0x1A, 0x05, 0x6C, 0xAC))
+
+    cls.add_method(ACC_PUBLIC | ACC_STATIC, "localCatch", "(I)I", (
+        cls.code(2, 2)
+        .label("start").emit(0x1A).jump(0x9C, "ok")  # iload_0; ifge ok
+        .throw_new(failure)
+        .label("ok").emit(0x04, 0xAC)  # iconst_1; ireturn
+        .label("end").label("handler").emit(0x4B, 0x05, 0xAC)  # astore_1; iconst_2; ireturn
+        .catch("start", "end", "handler", failure)
+    ))
+
+    cls.add_method(ACC_PUBLIC | ACC_STATIC, "callerCatch", "(I)I", (
+        cls.code(1, 2)
+        .label("start").emit(0x1A).invoke(*check).invoke(0xB8, name, "half", "(I)I").emit(0xAC)
+        .label("end").label("handler").emit(0x4C, 0x02, 0xAC)  # astore_1; iconst_m1; ireturn
+        .catch("start", "end", "handler", "java/lang/RuntimeException")
+    ))
+
+    cls.add_method(ACC_PUBLIC | ACC_STATIC, "wrongCatch", "(I)I", (
+        cls.code(1, 2)
+        .label("start").emit(0x1A).invoke(*check).emit(0xAC)
+        .label("end").label("handler").emit(0x4C, 0x02, 0xAC)
+        .catch("start", "end", "handler", "java/lang/IllegalStateException")
+    ))
+
+    cls.add_method(ACC_PUBLIC | ACC_STATIC, "catchAll", "(I)I", (
+        cls.code(1, 2)
+        .label("start").emit(0x1A).invoke(*check).emit(0xAC)
+        .label("end").label("handler").emit(0x4C, 0x02, 0xAC)
+        .catch("start", "end", "handler", None)
+    ))
+
+    cls.add_method(ACC_PUBLIC | ACC_STATIC, "nested", "(I)I", (
+        cls.code(1, 2)
+        .label("start").emit(0x1A).invoke(*check).emit(0xAC)
+        .label("inner_end").label("inner_handler").emit(0x4C, 0x02, 0xAC)  # astore_1; iconst_m1; ireturn
+        .label("end").label("handler").emit(0x4C, 0x10, -2 & 0xFF, 0xAC)  # astore_1; bipush -2; ireturn
+        .catch("start", "inner_end", "inner_handler", "java/lang/IllegalStateException")
+        .catch("start", "end", "handler", failure)
+    ))
+
+    cls.add_method(ACC_PUBLIC | ACC_STATIC, "rethrow", "(I)I", (
+        cls.code(1, 2)
+        .label("start").emit(0x1A).invoke(*check).emit(0xAC)
+        .label("end").label("handler").emit(0x4C, 0x2B, 0xBF)  # astore_1; aload_1; athrow
+        .catch("start", "end", "handler", failure)
+    ))
+
+    cls.add_method(ACC_PUBLIC | ACC_STATIC, "rethrowCaught", "(I)I", (
+        cls.code(1, 2)
+        .label("start").emit(0x1A).invoke(0xB8, name, "rethrow", "(I)I").emit(0xAC)
+        .label("end").label("handler").emit(0x4C, 0x10, -3 & 0xFF, 0xAC)
+        .catch("start", "end", "handler", failure)
+    ))
+
+    cls.add_method(ACC_PUBLIC | ACC_STATIC, "countFailures", "(I)I", (
+        cls.code(2, 4)
+        .emit(0x03, 0x3C)  # iconst_0; istore_1
+        .emit(0x03, 0x1A, 0x64, 0x3D)  # iconst_0; iload_0; isub; istore_2
+        .label("loop").emit(0x1C, 0x1A).jump(0xA2, "exit")  # iload_2; iload_0; if_icmpge exit
+        .label("start").emit(0x1C).invoke(*check).emit(0x57)  # iload_2; invokestatic check; pop
+        .label("end").jump(0xA7, "next")
+        .label("handler").emit(0x4E, 0x84, 1, 1)  # astore_3; iinc 1 1
+        .label("next").emit(0x84, 2, 1).jump(0xA7, "loop")  # iinc 2 1; goto loop
+        .label("exit").emit(0x1B, 0xAC)  # iload_1; ireturn
+        .catch("start", "end", "handler", failure)
+    ))
+
+    cls.add_method(ACC_PUBLIC | ACC_STATIC, "overlapping", "(I)I", (
+        cls.code(2, 2)
+        .label("a").emit(0x1A).invoke(*check).emit(0x57)  # iload_0; invokestatic check; pop
+        .label("b").emit(0x1A, 0x04, 0x64).invoke(*check).emit(0x57)  # iload_0; iconst_1; isub; ...
+        .label("c").emit(0x1A, 0x05, 0x64).invoke(*check).emit(0x57)
+        .label("end").emit(0x03, 0xAC)  # iconst_0; ireturn
+        .label("runtime_handler").emit(0x4C, 0x05, 0xAC)  # astore_1; iconst_2; ireturn
+        .label("failure_handler").emit(0x4C, 0x04, 0xAC)  # astore_1; iconst_1; ireturn
+        .catch("b", "end", "runtime_handler", "java/lang/RuntimeException")
+        .catch("a", "c", "failure_handler", failure)
+    ))
+
+    return {name: cls.build(), failure: failure_cls.build()}
+
+
+def build_switch_test() -> typing.Dict[str, bytes]:
+    """
+    public class SwitchTest {
+        // "Aa" and "BB" share the hash code 2112
+        public static int stringSwitch(String s) {
+            switch (s) {
+                case "Aa": return 10;
+                case "BB": return 20;
+                case "c": return 30;
+                default: return 0;
+            }
+        }
+
+        // javac emits a tableswitch for these keys, the lookupswitch is assembled directly
+        public static int denseSwitch(int x) {
+            switch (x) { case 1: return 10; case 2: return 20; case 3: return 30; case 5: return 50; default: return 0; }
+        }
+
+        public static int sparseSwitch(int x) {
+            switch (x) { case -1000: return 10; case 1: return 20; case 1000: return 30; default: return 0; }
+        }
+    }
+    """
+
+    name = "SwitchTest"
+    string = "java/lang/String"
+
+    cls = ClassFileBuilder(name)
+    cls.add_empty_constructor()
+
+    def equals_block(code: CodeBuilder, value: str, index: int, next_label: str) -> CodeBuilder:
+        # aload_1; ldc <value>; invokevirtual String.equals(); ifeq <next_label>; iconst_<index>; istore_2
+        code.emit(0x2B).ldc_string(value).invoke(0xB6, string, "equals", "(Ljava/lang/Object;)Z")
+        return code.jump(0x99, next_label).emit(0x03 + index, 0x3D)
+
+    code = cls.code(2, 3)
+    code.emit(0x2A, 0x4C, 0x02, 0x3D)  # aload_0; astore_1; iconst_m1; istore_2
+    code.emit(0x2B).invoke(0xB6, string, "hashCode", "()I")  # aload_1; invokevirtual String.hashCode()
+    code.lookup_switch("select", {2112: "hash_2112", 99: "hash_99"})
+    code.label("hash_2112")
+    equals_block(code, "BB", 1, "hash_2112_next").jump(0xA7, "select")
+    code.label("hash_2112_next")
+    equals_block(code, "Aa", 0, "select").jump(0xA7, "select")
+    code.label("hash_99")
+    equals_block(code, "c", 2, "select")
+    code.label("select").emit(0x1C).table_switch("default", 0, ["case_0", "case_1", "case_2"])  # iload_2
+    for label, value in (("case_0", 10), ("case_1", 20), ("case_2", 30), ("default", 0)):
+        code.label(label).emit(0x10, value, 0xAC)  # bipush <value>; ireturn
+    cls.add_method(ACC_PUBLIC | ACC_STATIC, "stringSwitch", "(Ljava/lang/String;)I", code)
+
+    for method, cases in (("denseSwitch", {1: 10, 2: 20, 3: 30, 5: 50}), ("sparseSwitch", {-1000: 10, 1: 20, 1000: 30})):
+        code = cls.code(1, 1)
+        code.emit(0x1A).lookup_switch("default", {key: f"case_{key}" for key in cases})  # iload_0
+        for key, value in cases.items():
+            code.label(f"case_{key}").emit(0x10, value, 0xAC)
+        code.label("default").emit(0x03, 0xAC)  # iconst_0; ireturn
+        cls.add_method(ACC_PUBLIC | ACC_STATIC, method, "(I)I", code)
+
+    return {name: cls.build()}
+
+
+BUILDERS = [build_exception_test, build_switch_test]
+
+
+def main():
+    directory = os.path.dirname(os.path.abspath(__file__))
+
+    for builder in BUILDERS:
+        for name, data in builder().items():
+            with open(os.path.join(directory, name + ".class"), mode="wb") as f:
+                f.write(data)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Checks the exception handler dispatch on ExceptionTest (see build_exception_test() in assemble.py)
+
+Each method is run in the interpreter without and with superinstructions, and with all methods compiled
+where the compilation backends support them (methods with exception handlers always stay interpreted)
+"""
+import os
+import sys
+
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+import jvm.api
+from jvm.ClassAdressing import DirectoryFileSource
+from jvm.JavaExceptionStack import StackCollectingException
+from jvm.JavaVM import JavaVM
+from jvm.Runtime import Runtime
+
+vm = JavaVM()
+
+local = os.path.dirname(__file__)
+vm.add_accessor(DirectoryFileSource(local))
+
+import jvm.natives as natives
+natives.manager.vm = vm
+natives.manager.load_files()
+
+# Raised and not caught
+FAILURE = "ExceptionTest$Failure"
+
+# method name -> [(argument, expected result or FAILURE)]
+CASES = {
+    "check": [(1, 1), (-1, FAILURE)],
+    "localCatch": [(0, 1), (-1, 2)],
+    "callerCatch": [(8, 4), (-1, -1)],
+    "wrongCatch": [(3, 3), (-1, FAILURE)],
+    "catchAll": [(3, 3), (-1, -1)],
+    "nested": [(3, 3), (-1, -2)],
+    "rethrow": [(3, 3), (-1, FAILURE)],
+    "rethrowCaught": [(3, 3), (-1, -3)],
+    "countFailures": [(0, 0), (5, 5)],
+    "overlapping": [(-1, 1), (0, 2), (1, 2), (2, 0)],
+}
+
+
+async def run_cases(cls, mode: str):
+    runtime = Runtime()
+
+    for name, cases in CASES.items():
+        method = await cls.get_method(name, "(I)I")
+
+        for argument, expected in cases:
+            try:
+                result = await runtime.run_method(method, argument)
+            except StackCollectingException as e:
+                if e.base is None:
+                    raise
+
+                result = e.base.get_real_class().name
+
+            assert result == expected, f"{mode}: {name}({argument}) returned {result}, expected {expected}"
+
+    print(f"{mode}: ok")
+
+
+async def main():
+    cls = await vm.get_class("ExceptionTest")
+    await cls.prepare_use()
+
+    # Compilation is triggered explicitly below
+    jvm.api.PY_COMPILATION_THRESHOLD = 0
+
+    for mode in ("unfused", "interpreter", "bytecode", "source"):
+        if mode in ("unfused", "interpreter"):
+            jvm.api.FUSE_INSTRUCTIONS = mode != "unfused"
+
+            for method in cls.methods.values():
+                method.code_repr = None
+                await method.ensure_code_repr()
+                method.code_repr.python_function = None
+
+        else:
+            jvm.api.PY_COMPILATION_BACKEND = mode
+
+            for method in cls.methods.values():
+                await method.code_repr.compile_to_python()
+
+            # The plain arithmetic callee of callerCatch() must be compiled for checking calls into compiled code
+            assert (await cls.get_method("half", "(I)I")).code_repr.python_function is not None, mode
+
+        await run_cases(cls, mode)
+
+
+try:
+    asyncio.get_event_loop().run_until_complete(main())
+except StackCollectingException as e:
+    print("[FATAL] Error occurred!")
+    print(e.format_exception())
+    raise
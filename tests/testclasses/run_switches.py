@@ -0,0 +1,84 @@
+"""
+Checks the lookupswitch dispatch on SwitchTest (see build_switch_test() in assemble.py)
+
+The string switch must be recognised (see LookupSwitch.optimiser_iteration()), the dense switch must use a dense
+table and the sparse one must not; each method is run in the interpreter without and with superinstructions
+"""
+import os
+import sys
+
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+import jvm.api
+from jvm.ClassAdressing import DirectoryFileSource
+from jvm.Instructions import LookupSwitch
+from jvm.JavaExceptionStack import StackCollectingException
+from jvm.JavaVM import JavaVM
+from jvm.Runtime import Runtime
+
+vm = JavaVM()
+
+local = os.path.dirname(__file__)
+vm.add_accessor(DirectoryFileSource(local))
+
+import jvm.natives as natives
+natives.manager.vm = vm
+natives.manager.load_files()
+
+# (method name, signature) -> [(argument, expected result)]
+CASES = {
+    ("stringSwitch", "(Ljava/lang/String;)I"): [
+        ("Aa", 10), ("BB", 20), ("c", 30),
+        # "C#" has the hash code of "Aa" and "BB", "Ab" and "zz" are no case at all
+        ("C#", 0), ("Ab", 0), ("zz", 0), ("", 0),
+    ],
+    ("denseSwitch", "(I)I"): [
+        (1, 10), (2, 20), (3, 30), (4, 0), (5, 50),
+        (0, 0), (6, 0), (-100, 0), (2 ** 31 - 1, 0), (-2 ** 31, 0),
+    ],
+    ("sparseSwitch", "(I)I"): [(-1000, 10), (1, 20), (1000, 30), (0, 0), (999, 0), (-2 ** 31, 0)],
+}
+
+
+def get_lookup_switch(method):
+    switches = [e for e in method.code_repr.decoded_code if e is not None and e[0] is LookupSwitch]
+    assert len(switches) == 1, method
+    return switches[0][1]
+
+
+async def main():
+    cls = await vm.get_class("SwitchTest")
+    await cls.prepare_use()
+
+    jvm.api.PY_COMPILATION_THRESHOLD = 0
+    runtime = Runtime()
+
+    for mode in ("unfused", "interpreter"):
+        jvm.api.FUSE_INSTRUCTIONS = mode != "unfused"
+
+        for method in cls.methods.values():
+            method.code_repr = None
+            await method.ensure_code_repr()
+
+        assert get_lookup_switch(await cls.get_method("stringSwitch", "(Ljava/lang/String;)I"))[4] is not None, mode
+        assert get_lookup_switch(await cls.get_method("denseSwitch", "(I)I"))[3] is not None, mode
+        assert get_lookup_switch(await cls.get_method("sparseSwitch", "(I)I"))[3] is None, mode
+
+        for (name, signature), cases in CASES.items():
+            method = await cls.get_method(name, signature)
+
+            for argument, expected in cases:
+                result = await runtime.run_method(method, argument)
+                assert result == expected, f"{mode}: {name}({argument!r}) returned {result}, expected {expected}"
+
+        print(f"{mode}: ok")
+
+
+try:
+    asyncio.get_event_loop().run_until_complete(main())
+except StackCollectingException as e:
+    print("[FATAL] Error occurred!")
+    print(e.format_exception())
+    raise